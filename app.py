@@ -1,19 +1,236 @@
-from flask import Flask, request, jsonify
+import atexit
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import requests
-from battle_logic import BattleLogic
+from battle_batch import BattleBatch, parse_ndjson
+from rule_registry import RuleRegistry
+from type_rules import StandardTypeRule, EventTypeRule
 from pokemon_data_factory import PokemonFactory
-# Base URL for the PokeAPI
-POKEAPI_URL = "https://pokeapi.co/api/v2/pokemon/"
+from pokemon_cache import PokemonCache
+from single_flight import SingleFlight
+from pokeapi_client import PokeAPIClient
+from circuit_breaker import CircuitBreaker, TokenBucket
+from pokedex_snapshot import open_snapshot
+from scoreboard_store import create_scoreboard_store
+from metrics import MetricsRegistry, RequestProfiler
+from tournament import MAX_TRIALS, SimulationQueueFull, TournamentSimulator, create_simulation_jobs
+from prefetcher import AccessLog, Prefetcher, parse_id_list
+from battle_log import BattleLog, LogTail
+from battle_stats import BattleStats
+from response_cache import ChangeNotifier, ResponseCache, etag_matches
+from broadcaster import Broadcaster, sse_frame
+import json_codec
+from json_codec import FastJSONProvider
+# Base URL for the PokeAPI (overridable, e.g. to point at a local stub)
+POKEAPI_URL = os.environ.get("POKEAPI_URL", "https://pokeapi.co/api/v2/pokemon/")
 
 # Flask instance creation
 # __name__ argument helps Flask to know where to find resources like templates.
 app = Flask(__name__)
+# jsonify and request.get_json use orjson when it is installed
+app.json = FastJSONProvider(app)
 
-# The /battle endpoint should accept only POST requests
-# In real applications, this would be replaced by a Database or Cache (Redis).
-GLOBAL_SCOREBOARD = {}
-# We initialize the battle logic outside the endpoint (OCP applied)
-BATTLE_SYSTEM = BattleLogic()  # Uses the default StandardTypeRule
+# One scoreboard per game, keyed by the game ID returned by /start.
+# Set SCOREBOARD_DB_PATH to share the games between processes through SQLite.
+SCOREBOARD_STORE = create_scoreboard_store(os.environ.get("SCOREBOARD_DB_PATH"))
+# Serialized /scoreboard bodies, reused until the game's version changes
+SCOREBOARD_RESPONSES = ResponseCache(
+    lambda payload: json_codec.dumps(payload, sort_keys=True))
+# Wakes up long-polling /scoreboard requests (?wait=) when a game changes.
+# Changes made by other processes are only seen when the waiters recheck,
+# every SCOREBOARD_POLL_INTERVAL seconds.
+SCOREBOARD_CHANGES = ChangeNotifier()
+SCOREBOARD_MAX_WAIT = float(os.environ.get("SCOREBOARD_MAX_WAIT", "30"))
+SCOREBOARD_POLL_INTERVAL = float(os.environ.get("SCOREBOARD_POLL_INTERVAL", "1"))
+# Pushes every scoreboard change to GET /scoreboard/stream subscribers;
+# publishing also signals SCOREBOARD_CHANGES, which wakes the long polls
+SCOREBOARD_EVENTS = Broadcaster(
+    history=int(os.environ.get("SCOREBOARD_STREAM_HISTORY", "1024")),
+    keepalive=float(os.environ.get("SCOREBOARD_STREAM_KEEPALIVE", "15")),
+    notifier=SCOREBOARD_CHANGES)
+# We compile the rule sets outside the endpoints (OCP applied): each one gets
+# its BattleLogic and precomputed matchup index once, and requests pick one
+# by name. With MATCHUP_INDEX_DIR set the indexes are kept on disk and only
+# rebuilt when their rules change.
+RULE_REGISTRY = RuleRegistry(default="standard",
+                             index_dir=os.environ.get("MATCHUP_INDEX_DIR"))
+RULE_REGISTRY.register("standard", StandardTypeRule())
+RULE_REGISTRY.register("event", EventTypeRule())
+# Extra rule sets from JSON/YAML files, reloaded when the files change
+# (by a watcher thread, see start_background_work)
+if os.environ.get("RULESETS_DIR"):
+    RULE_REGISTRY.load_directory(os.environ["RULESETS_DIR"])
+# Concurrent misses for the same Pokémon share one upstream fetch. With
+# SINGLE_FLIGHT_LOCK_DIR set, worker processes also wait for each other
+# (together with POKEMON_CACHE_PATH, the others then read the shared tier).
+SINGLE_FLIGHT = SingleFlight(lock_dir=os.environ.get("SINGLE_FLIGHT_LOCK_DIR"))
+# Species data almost never changes, so lookups are cached between battles.
+# Set POKEMON_CACHE_PATH to a SQLite file to keep the cache across restarts.
+POKEMON_CACHE = PokemonCache(
+    max_size=2048,
+    ttl=24 * 60 * 60,
+    negative_ttl=10 * 60,
+    disk_path=os.environ.get("POKEMON_CACHE_PATH"),
+    single_flight=SINGLE_FLIGHT,
+    # Expired data is still better than a 503 while PokeAPI is down
+    stale_ttl=float(os.environ.get("POKEMON_CACHE_STALE_TTL", str(7 * 24 * 60 * 60)))
+)
+# Identifies this process in the events it logs; a forked worker gets its own
+# (see after_fork)
+PROCESS_ID = uuid.uuid4().hex
+# Append-only history of games and battles (GET /history, battle_log.py replay).
+# With BATTLE_LOG_SHARED set, worker processes append to the same directory.
+BATTLE_LOG = None
+BATTLE_LOG_TAIL = None
+if os.environ.get("BATTLE_LOG_DIR"):
+    BATTLE_LOG = BattleLog(
+        os.environ["BATTLE_LOG_DIR"],
+        max_segment_bytes=int(os.environ.get("BATTLE_LOG_SEGMENT_MB", "16")) * 1024 * 1024,
+        fsync=os.environ.get("BATTLE_LOG_FSYNC") in ('1', 'true'),
+        shared=os.environ.get("BATTLE_LOG_SHARED") in ('1', 'true'))
+    BATTLE_LOG_TAIL = LogTail(BATTLE_LOG.directory)
+# Win/loss counters and leaderboards, rebuilt from the battle log at startup.
+# In shared mode each worker then follows the log for the battles the other
+# workers play, every BATTLE_LOG_FOLLOW_INTERVAL seconds.
+BATTLE_STATS = BattleStats()
+if BATTLE_LOG_TAIL is not None:
+    BATTLE_STATS.load_events(BATTLE_LOG_TAIL.follow())
+BATTLE_LOG_FOLLOW_INTERVAL = float(os.environ.get("BATTLE_LOG_FOLLOW_INTERVAL", "0.5"))
+LOG_FOLLOWER = None  # (stop event, thread) while following the log
+# Lookups per Pokémon, persisted so the next start knows what to warm up
+ACCESS_LOG = None
+if os.environ.get("WARMUP_ACCESS_LOG"):
+    ACCESS_LOG = AccessLog(os.environ["WARMUP_ACCESS_LOG"])
+# Optional offline Pokédex (see pokedex_snapshot.py); IDs it doesn't have
+# are fetched from PokeAPI as usual.
+POKEDEX_SNAPSHOT = open_snapshot(os.environ.get("POKEDEX_SNAPSHOT_PATH"))
+# One pooled session shared by every request (keep-alive, timeouts, retries),
+# rate limited and behind a circuit breaker so an outage isn't amplified
+POKEAPI_CLIENT = PokeAPIClient(
+    POKEAPI_URL,
+    timeout=float(os.environ.get("POKEAPI_TIMEOUT", "5")),
+    retries=int(os.environ.get("POKEAPI_RETRIES", "2")),
+    rate_limiter=TokenBucket(
+        rate=float(os.environ.get("POKEAPI_RATE_LIMIT", "50")),
+        burst=int(os.environ.get("POKEAPI_RATE_BURST", "100")),
+        max_wait=float(os.environ.get("POKEAPI_RATE_MAX_WAIT", "1"))
+    ),
+    circuit_breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("POKEAPI_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.environ.get("POKEAPI_BREAKER_RESET", "30"))
+    )
+)
+# Background tournament simulations (each one runs on a process pool);
+# past SIMULATION_MAX_PENDING queued or running jobs, POST /simulations is a 429.
+# Set SIMULATION_DB_PATH to share the jobs between processes through SQLite
+# (one simulation runs at a time across all of them).
+SIMULATION_JOBS = create_simulation_jobs(
+    os.environ.get("SIMULATION_DB_PATH"),
+    processes=int(os.environ.get("SIMULATION_PROCESSES", "0")) or None,
+    max_pending=int(os.environ.get("SIMULATION_MAX_PENDING", "8")))
+# Threads used to look up both combatants at the same time
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=16,
+                                    thread_name_prefix="pokeapi-fetch")
+
+# Instrumentation, exposed on /metrics in the Prometheus text format
+METRICS = MetricsRegistry()
+REQUEST_SECONDS = METRICS.histogram(
+    "http_request_duration_seconds", "Time spent serving a request, by endpoint.")
+HTTP_RESPONSES = METRICS.counter(
+    "http_responses_total", "Responses sent, by endpoint and status code.")
+IN_FLIGHT = METRICS.gauge(
+    "http_requests_in_flight", "Requests currently being served.")
+STAGE_SECONDS = METRICS.histogram(
+    "battle_stage_seconds",
+    "Time spent in each stage of a battle (fetch, create_data, determine_winner, serialize).")
+# Samples per-function timings for a window of requests, on demand
+PROFILER = RequestProfiler()
+
+
+def collect_cache_and_upstream_metrics():
+    """Exports the counters the cache and the PokeAPI client keep themselves."""
+    cache = POKEMON_CACHE.stats()
+    upstream = POKEAPI_CLIENT.stats()
+    coalescing = SINGLE_FLIGHT.stats()
+    breaker = POKEAPI_CLIENT.circuit_breaker.stats()
+    limiter = POKEAPI_CLIENT.rate_limiter.stats()
+    responses = SCOREBOARD_RESPONSES.stats()
+    stream = SCOREBOARD_EVENTS.stats()
+    return [
+        ("pokemon_cache_lookups_total", "counter", "Pokémon cache lookups, by result.",
+         {(("result", "hit"),): cache["hits"], (("result", "miss"),): cache["misses"]}),
+        ("pokemon_cache_evictions_total", "counter", "Entries evicted from the Pokémon cache.",
+         {(): cache["evictions"]}),
+        ("pokemon_cache_size", "gauge", "Entries in the in-memory Pokémon cache.",
+         {(): cache["size"]}),
+        ("pokeapi_responses_total", "counter", "PokeAPI responses, by final status code.",
+         {(("status", code),): count for code, count in upstream["status_codes"].items()}),
+        ("pokeapi_retries_total", "counter", "PokeAPI requests retried.",
+         {(): upstream["retries"]}),
+        ("pokeapi_errors_total", "counter", "PokeAPI calls that failed without a response.",
+         {(): upstream["errors"]}),
+        ("pokemon_lookups_coalesced_total", "counter",
+         "Cache misses that waited for a lookup already in flight.",
+         {(): coalescing["shared"]}),
+        ("pokemon_cache_stale_hits_total", "counter",
+         "Expired Pokémon data served because reloading it failed.",
+         {(): cache["stale_hits"]}),
+        ("pokeapi_circuit_state", "gauge", "PokeAPI circuit breaker state (1 = current).",
+         {(("state", state),): int(breaker["state"] == state)
+          for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN,
+                        CircuitBreaker.HALF_OPEN)}),
+        ("pokeapi_rejected_total", "counter", "PokeAPI calls not made, by reason.",
+         {(("reason", "circuit_open"),): breaker["rejected"],
+          (("reason", "rate_limited"),): limiter["rejected"]}),
+        ("scoreboard_response_cache_total", "counter",
+         "Scoreboard responses served from the serialized cache, by result.",
+         {(("result", "hit"),): responses["hits"], (("result", "miss"),): responses["misses"]}),
+        ("scoreboard_stream_subscribers", "gauge", "Open /scoreboard/stream connections.",
+         {(): stream["subscribers"]}),
+        ("scoreboard_stream_events_total", "counter", "Scoreboard events published.",
+         {(): stream["published"]}),
+        ("scoreboard_stream_lagged_total", "counter",
+         "Times a stream subscriber fell behind and was sent a snapshot instead.",
+         {(): stream["lagged"]}),
+        ("json_backend_info", "gauge", "JSON encoder in use (1 = current).",
+         {(("backend", json_codec.BACKEND),): 1}),
+    ]
+
+
+METRICS.add_collector(collect_cache_and_upstream_metrics)
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    IN_FLIGHT.inc()
+    g.profile = PROFILER.begin_request()
+
+
+@app.after_request
+def count_response(response):
+    HTTP_RESPONSES.inc(endpoint=request_endpoint_label(), status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Runs after streamed responses are fully sent, too
+    PROFILER.end_request(g.pop('profile', None))
+    started = g.pop('request_started', None)
+    if started is not None:
+        IN_FLIGHT.dec()
+        REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                endpoint=request_endpoint_label())
+
+
+def request_endpoint_label():
+    return request.url_rule.rule if request.url_rule else "unmatched"
 
 
 @app.route('/start', methods=['POST'])
@@ -21,116 +238,701 @@ def start_game():
     """
     Endpoint to start the game, registering the names of both players.
     """
-    global GLOBAL_SCOREBOARD
+    payload, status = start_game_result(request.get_json())
+    return jsonify(payload), status
+
+
+@app.route('/battle', methods=['POST'])
+def battle():
+    """Receives the Pokemon ids, calls PokeAPI and starts the battle."""
+
+    # 1. Get the JSON data from the request
     data = request.get_json()
 
+    # Validation: The game must have been started
+    game_id = data.get('game_id') if isinstance(data, dict) else None
+    game_id, scoreboard, error = find_game(game_id)
+    if error:
+        return jsonify(error[0]), error[1]
+    # 2. Validate the Pokémon ids and the rule set
+    pokemon_ids, error = battle_ids_or_error(data)
+    if error:
+        return jsonify(error[0]), error[1]
+    rule_set, error = find_rule_set(data.get('ruleset'))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    # 3. Fetch Pokemon data from PokeAPI
+    try:
+        pokemon1_data, pokemon2_data = get_pokemon_pair(*pokemon_ids)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        payload, status = fetch_error_result(e)
+        return jsonify(payload), status, retry_after_headers(payload)
+
+    # 4. Battle logic and scoreboard update
+    payload = settle_battle(game_id, scoreboard, rule_set,
+                            pokemon1_data, pokemon2_data, pokemon_ids)
+    with STAGE_SECONDS.time(stage="serialize"):
+        return jsonify(payload)
+
+
+@app.route('/battles', methods=['POST'])
+def battles():
+    """
+    Runs many battles in one request, for tournament brackets.
+    Accepts a JSON array of {"pokemon1", "pokemon2"} objects, or one object
+    per line with Content-Type application/x-ndjson. Results are streamed
+    back as NDJSON in input order, followed by a summary line; the wins of
+    the whole batch are added to the scoreboard in one update.
+    Pass ?game_id= to pick the game (default: the latest one), ?ruleset=
+    to pick the rules and ?narrative=1 to include the result lines of
+    every battle.
+    """
+    game_id, scoreboard, error = find_game(request.args.get('game_id'))
+    if error:
+        return jsonify(error[0]), error[1]
+    rule_set, error = find_rule_set(request.args.get('ruleset'))
+    if error:
+        return jsonify(error[0]), error[1]
+
+    if request.mimetype == 'application/x-ndjson':
+        pairs = parse_ndjson(request.stream)
+    else:
+        pairs = request.get_json(silent=True)
+        if not isinstance(pairs, list):
+            return jsonify({"error": "Invalid requisition.",
+                            "message": "The request body should be a JSON array of battles "
+                                       "or an NDJSON stream (application/x-ndjson)."}), 400
+
+    batch = BattleBatch(
+        rule_set.battle_system,
+        get_pokemon_data,
+        FETCH_EXECUTOR,
+        (scoreboard['player1_name'], scoreboard['player2_name']),
+        narrative=request.args.get('narrative') in ('1', 'true'),
+        matchup_index=rule_set.matchup_index,
+        on_battle=lambda *battle: record_battle(
+            game_id, rule_set.name, batch.player_names, *battle)
+    )
+
+    def apply_batch_scores():
+        scoreboard = SCOREBOARD_STORE.add_scores(
+            game_id, batch.player1_wins, batch.player2_wins)
+        if batch.player1_wins or batch.player2_wins:
+            publish_scoreboard(game_id)
+        return scoreboard
+
+    def generate():
+        try:
+            for result in batch.run(pairs):
+                yield json_codec.dumps(result) + b"\n"
+        except BaseException:
+            # Client went away or a lookup failed: the battles played so far
+            # are already in the stats and the history, so score them too
+            apply_batch_scores()
+            raise
+        scoreboard = apply_batch_scores()
+        yield json_codec.dumps({"summary": {
+            "player1_wins": batch.player1_wins,
+            "player2_wins": batch.player2_wins,
+            "ties": batch.ties,
+            "errors": batch.errors,
+            "game_id": game_id,
+            "scoreboard": scoreboard
+        }}) + b"\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson')
+
+
+@app.route('/matchup/<int:pokemon1_id>/<int:pokemon2_id>', methods=['GET'])
+def matchup(pokemon1_id, pokemon2_id):
+    """
+    Answers who would win a battle from the precomputed matchup index,
+    without playing it (the scoreboard isn't changed). Accepts ?ruleset=.
+    """
+    if pokemon1_id <= 0 or pokemon2_id <= 0:
+        return jsonify({"error": "Invalid requisition.",
+                        "message": "Pokémon ids should be positive integers."}), 400
+    rule_set, error = find_rule_set(request.args.get('ruleset'))
+    if error:
+        return jsonify(error[0]), error[1]
+    try:
+        pokemon1_data, pokemon2_data = get_pokemon_pair(pokemon1_id, pokemon2_id)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        payload, status = fetch_error_result(e)
+        return jsonify(payload), status, retry_after_headers(payload)
+
+    result = rule_set.matchup_index.evaluate(
+        rule_set.battle_system, pokemon1_data, pokemon2_data)
+    winner = None
+    if result.winner == 1:
+        winner = pokemon1_data.name
+    elif result.winner == 2:
+        winner = pokemon2_data.name
+
+    return jsonify({
+        "pokemon1": pokemon1_data.name,
+        "pokemon2": pokemon2_data.name,
+        "p1_score": result.p1_score,
+        "p2_score": result.p2_score,
+        "winner": winner,
+        "ruleset": rule_set.name
+    })
+
+
+@app.route('/rulesets', methods=['GET'])
+def list_rule_sets():
+    """Lists the rule sets a request can pick with 'ruleset'."""
+    return jsonify({
+        "default": RULE_REGISTRY.default,
+        "rulesets": {name: RULE_REGISTRY.get(name).fingerprint
+                     for name in RULE_REGISTRY.names()}
+    })
+
+
+@app.route('/simulations', methods=['POST'])
+def start_simulation():
+    """
+    Queues a Monte Carlo tournament simulation and returns its job (202).
+    Poll GET /simulations/<id> for progress and the result.
+    """
+    payload, status = submit_simulation_result(request.get_json(silent=True))
+    headers = {"Location": f"/simulations/{payload['id']}"} if status == 202 else {}
+    return jsonify(payload), status, headers
+
+
+@app.route('/simulations/<job_id>', methods=['GET'])
+def get_simulation(job_id):
+    job = SIMULATION_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Simulation not found."}), 404
+    return jsonify(job)
+
+
+@app.route('/history', methods=['GET'])
+def history():
+    """
+    Streams the battle log as NDJSON, oldest first, from ?offset= (default
+    0), at most ?limit= events (default 100), optionally for one ?game_id=.
+    The last line is {"next_offset": n}: pass it as offset for the next page.
+    """
+    if BATTLE_LOG is None:
+        return jsonify({"error": "Battle history is disabled.",
+                        "message": "Set BATTLE_LOG_DIR to record it."}), 404
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        offset = limit = -1
+    if offset < 0 or not 1 <= limit <= 10000:
+        return jsonify({"error": "Invalid requisition.",
+                        "message": "'offset' should be >= 0 and 'limit' between 1 and 10000."}), 400
+
+    end_offset = BATTLE_LOG.next_offset
+    events = BATTLE_LOG.read(offset, limit, request.args.get('game_id'))
+
+    def generate():
+        returned = 0
+        next_offset = offset
+        for event in events:
+            returned += 1
+            next_offset = event["offset"] + 1
+            yield json_codec.dumps(event) + b"\n"
+        if returned < limit:
+            # Read up to the end of the log
+            next_offset = max(next_offset, end_offset)
+        yield json_codec.dumps({"next_offset": next_offset}) + b"\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson')
+
+
+@app.route('/leaderboard', methods=['GET'])
+def leaderboard():
+    """
+    Top entries by wins across all games: ?category=pokemon (default),
+    types or players, and ?limit= (default 10, at most 100).
+    """
+    payload, status = leaderboard_result(request.args.get('category', 'pokemon'),
+                                         request.args.get('limit', '10'))
+    return jsonify(payload), status
+
+
+@app.route('/stats/pokemon/<int:pokemon_id>', methods=['GET'])
+def pokemon_stats(pokemon_id):
+    payload, status = pokemon_stats_result(pokemon_id)
+    return jsonify(payload), status
+
+
+# Endpoint to view the scoreboard (?game_id=, default: the latest game)
+
+
+@app.route('/scoreboard', methods=['GET'])
+def get_scoreboard():
+    """
+    Answers with an ETag, and 304 without a body while If-None-Match
+    still matches. With ?wait=N such a request waits up to N seconds for
+    the scoreboard to change before answering 304 (long polling).
+    """
+    wait, error = long_poll_wait(request.args.get('wait'))
+    if error:
+        return jsonify(error[0]), error[1]
+    game_id = request.args.get('game_id')
+    if_none_match = request.headers.get('If-None-Match')
+
+    deadline = time.monotonic() + wait
+    while True:
+        sequence = SCOREBOARD_CHANGES.sequence
+        body, status, headers = scoreboard_response(game_id, if_none_match)
+        remaining = deadline - time.monotonic()
+        if status != 304 or remaining <= 0:
+            break
+        SCOREBOARD_CHANGES.wait(sequence, min(remaining, SCOREBOARD_POLL_INTERVAL))
+
+    if body is None:
+        return Response(status=304, headers=headers)
+    return Response(body, status, headers, mimetype='application/json')
+
+
+@app.route('/scoreboard/stream', methods=['GET'])
+def scoreboard_stream():
+    """
+    Server-Sent Events: a "scoreboard" event with the current scoreboard,
+    then one every time a battle or /start changes it. ?game_id= follows
+    one game; without it every game is followed (the first event is the
+    latest game). Reconnecting clients resume after Last-Event-ID.
+    """
+    game_id = request.args.get('game_id')
+    if game_id is not None:
+        _, _, error = find_game(game_id)
+        if error:
+            return jsonify(error[0]), error[1]
+    cursor = SCOREBOARD_EVENTS.cursor(request.headers.get('Last-Event-ID'))
+    events = SCOREBOARD_EVENTS.subscribe(game_id, cursor,
+                                         lambda: scoreboard_snapshot(game_id))
+    return Response(events, mimetype='text/event-stream', headers=SSE_HEADERS)
+
+
+# Endpoint to see how many lookups the cache saved us
+
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(POKEMON_CACHE.stats())
+
+
+@app.route('/upstream/status', methods=['GET'])
+def get_upstream_status():
+    payload, status = upstream_status_result()
+    return jsonify(payload), status
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness check: 503 until the cache warm-up has finished."""
+    payload, status = ready_result()
+    return jsonify(payload), status
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/debug/profile', methods=['POST'])
+def start_profile():
+    """
+    Profiles a window of the next requests, e.g. {"requests": 100,
+    "sample_rate": 0.1}; the timings are read back with GET /debug/profile.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    window = data.get('requests', 100) if isinstance(data, dict) else None
+    sample_rate = data.get('sample_rate', 1.0) if isinstance(data, dict) else None
+    if not isinstance(window, int) or window <= 0 or \
+            not isinstance(sample_rate, (int, float)) or not 0 < sample_rate <= 1:
+        return jsonify({"error": "Invalid requisition.",
+                        "message": "'requests' should be a positive integer and "
+                                   "'sample_rate' a number in (0, 1]."}), 400
+    PROFILER.start(window, sample_rate)
+    return jsonify(profile_report())
+
+
+@app.route('/debug/profile', methods=['GET'])
+def get_profile():
+    return jsonify(profile_report(request.args.get('limit', 30, type=int)))
+
+
+def start_game_result(data):
+    """
+    Validates the /start body and creates a new game with a 0-0 scoreboard.
+    Returns the (payload, status) of the response; shared by the WSGI and
+    ASGI apps so both answer with the same shapes.
+    """
     if not data or 'player1_name' not in data or 'player2_name' not in data:
-        return jsonify({
+        return {
             "error": "Invalid request",
             "message": "The request body must contain 'player1_name' and 'player2_name'."
-        }), 400
+        }, 400
 
     player1 = data.get('player1_name')
     player2 = data.get('player2_name')
 
-    GLOBAL_SCOREBOARD.clear()
     # Starts the scoreboard
-    GLOBAL_SCOREBOARD.update({
-        "player1_name": player1,
-        "player2_name": player2,
-        "player1_score": 0,
-        "player2_score": 0
-    })
+    game_id = SCOREBOARD_STORE.create_game(player1, player2)
+    publish_scoreboard(game_id)
+    if BATTLE_LOG is not None:
+        BATTLE_LOG.append({"type": "game_started", "game_id": game_id,
+                           "player1_name": player1, "player2_name": player2,
+                           "source": PROCESS_ID})
 
-    return jsonify({
+    return {
         "status": "Game started successfully!",
         "players": f"{player1} vs {player2}",
-        "scoreboard": GLOBAL_SCOREBOARD
-    })
+        "game_id": game_id,
+        "scoreboard": SCOREBOARD_STORE.get(game_id)
+    }, 200
 
 
-@app.route('/battle', methods=['POST'])
-def battle():
-    """Receives the Pokemon ids, calls PokeAPI and starts the battle."""
+def find_game(game_id=None):
+    """
+    Looks up the game a request refers to; without a game_id it is the
+    latest game started.
+    Returns (game_id, scoreboard, None) or (None, None, (payload, status)).
+    """
+    if game_id is None:
+        game_id = SCOREBOARD_STORE.latest_game_id()
+        if game_id is None:
+            return None, None, ({
+                "error": "Game not started",
+                "message": "Please call the /start endpoint first to register players."
+            }, 403)
+    if not isinstance(game_id, str):
+        return None, None, ({"error": "Invalid requisition.",
+                             "message": "'game_id' should be a string."}, 400)
 
-    global GLOBAL_SCOREBOARD
+    scoreboard = SCOREBOARD_STORE.get(game_id)
+    if scoreboard is None:
+        return None, None, ({
+            "error": "Game not found",
+            "message": f"There is no game with id '{game_id}'. Call /start to create one."
+        }, 404)
+    return game_id, scoreboard, None
 
-    # Validation: The game must have been started
-    if not GLOBAL_SCOREBOARD:
-        return jsonify({
-            "error": "Game not started",
-            "message": "Please call the /start endpoint first to register players."
-        }), 403
-    # 1. Get the JSON data from the request
-    data = request.get_json()
 
-    # 2. Basic validation of input data
+def find_rule_set(name=None):
+    """
+    Returns (rule_set, None) for the named rule set (default when None),
+    or (None, (payload, status)) when there is no such rule set.
+    """
+    rule_set = RULE_REGISTRY.get(name)
+    if rule_set is None:
+        return None, ({
+            "error": "Unknown rule set",
+            "message": f"'{name}' is not a rule set. Available: {', '.join(RULE_REGISTRY.names())}."
+        }, 400)
+    return rule_set, None
+
+
+def battle_ids_or_error(data):
+    """
+    Validates the /battle body.
+    Returns ((pokemon1_id, pokemon2_id), None) or (None, (payload, status)).
+    """
+    # Basic validation of input data
     if not data or 'pokemon1' not in data or 'pokemon2' not in data:
-        return jsonify({"error": "Invalid requisition.",
-                        "message": "The request body should be a JSON with 'pokemon1' and 'pokemon2'"}), 400
+        return None, ({"error": "Invalid requisition.",
+                       "message": "The request body should be a JSON with 'pokemon1' and 'pokemon2'"}, 400)
 
     pokemon1_id = data['pokemon1']
     pokemon2_id = data['pokemon2']
 
     # Data type validation
     if not isinstance(pokemon1_id, int) or not isinstance(pokemon2_id, int) or pokemon1_id <= 0 or pokemon2_id <= 0:
-        return jsonify({"error": "Invalid requisition.",
-                        "message": "'pokemon1' and 'pokemon2' should be positive integers."}), 400
+        return None, ({"error": "Invalid requisition.",
+                       "message": "'pokemon1' and 'pokemon2' should be positive integers."}, 400)
+
+    return (pokemon1_id, pokemon2_id), None
 
-    # 3. Fetch Pokemon data from PokeAPI
-    try:
-        pokemon1_data = get_pokemon_data(pokemon1_id)
-        pokemon2_data = get_pokemon_data(pokemon2_id)
 
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": "Error fetching data from PokeAPI.",
-                        "details": str(e)}), 503
+def submit_simulation_result(data):
+    """
+    Validates a simulation request and queues it.
+    Body: {"roster": [ids], "format", "trials", "ruleset", "seed"}.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('roster'), list):
+        return {"error": "Invalid requisition.",
+                "message": "The request body should be a JSON with a 'roster' list of Pokémon ids."}, 400
+    roster = data['roster']
+    if not all(isinstance(i, int) and i > 0 for i in roster):
+        return {"error": "Invalid requisition.",
+                "message": "'roster' should only contain positive integers."}, 400
+    trials = data.get('trials', 1000)
+    if not isinstance(trials, int) or not 1 <= trials <= MAX_TRIALS:
+        return {"error": "Invalid requisition.",
+                "message": f"'trials' should be an integer between 1 and {MAX_TRIALS}."}, 400
+    seed = data.get('seed')
+    if seed is not None and not isinstance(seed, int):
+        return {"error": "Invalid requisition.", "message": "'seed' should be an integer."}, 400
+    rule_set, error = find_rule_set(data.get('ruleset'))
+    if error:
+        return error
+    tournament_format = data.get('format', 'round_robin')
+    try:
+        # Validates the format, roster size and amount of work; the Pokémon
+        # are looked up by the job itself
+        TournamentSimulator.check(roster, tournament_format, trials)
     except ValueError as ve:
-        return jsonify({"error": str(ve)}), 404
+        return {"error": "Invalid requisition.", "message": str(ve)}, 400
+
+    def build_simulator():
+        unique_ids = list(dict.fromkeys(roster))
+        records = dict(zip(unique_ids, FETCH_EXECUTOR.map(get_pokemon_data, unique_ids)))
+        return TournamentSimulator(rule_set.battle_system, rule_set.matchup_index,
+                                   [records[i] for i in roster], roster, tournament_format)
+
+    try:
+        job = SIMULATION_JOBS.submit(build_simulator, trials, seed)
+    except SimulationQueueFull as e:
+        return {"error": "Too many simulations.",
+                "message": f"{e} Try again once one is done."}, 429
+    job["format"] = tournament_format
+    job["ruleset"] = rule_set.name
+    return job, 202
+
+
+def profile_report(limit=30):
+    """
+    The profiler's report. Each worker process profiles its own requests,
+    so the report names the one that answered.
+    """
+    return dict(PROFILER.report(limit=limit), worker=os.getpid())
+
+
+def fetch_error_result(error):
+    """Maps a lookup failure to the (payload, status) of the response."""
+    if isinstance(error, requests.exceptions.RequestException):
+        payload = {"error": "Error fetching data from PokeAPI.",
+                   "details": str(error)}
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            payload["retry_after"] = math.ceil(retry_after)
+        return payload, 503
+    return {"error": str(error)}, 404
 
+
+def retry_after_headers(payload):
+    """Retry-After header for a 503 caused by the breaker or rate limiter."""
+    if "retry_after" in payload:
+        return {"Retry-After": str(payload["retry_after"])}
+    return {}
+
+
+def upstream_status_result():
+    """State of the PokeAPI circuit breaker, rate limiter and call counters."""
+    return {
+        "circuit_breaker": POKEAPI_CLIENT.circuit_breaker.stats(),
+        "rate_limiter": POKEAPI_CLIENT.rate_limiter.stats(),
+        "calls": POKEAPI_CLIENT.stats(),
+    }, 200
+
+
+def settle_battle(game_id, scoreboard, rule_set, pokemon1_data, pokemon2_data,
+                  pokemon_ids=(None, None)):
+    """
+    Runs the battle logic with the rule set, updates the game's scoreboard,
+    records the battle and returns the payload.
+    """
     # 1. Get pokemon names for the response
-    p1_pokemon_name = pokemon1_data['name']
-    p2_pokemon_name = pokemon2_data['name']
-
-    # 4. Battle logic
-    results_list = BATTLE_SYSTEM.determine_winner(
-        p1_name=p1_pokemon_name,
-        p1_types=pokemon1_data['types'],
-        p2_name=p2_pokemon_name,
-        p2_types=pokemon2_data['types']
-    )
+    p1_pokemon_name = pokemon1_data.name
+    p2_pokemon_name = pokemon2_data.name
+
+    with STAGE_SECONDS.time(stage="determine_winner"):
+        result = rule_set.matchup_index.evaluate(
+            rule_set.battle_system, pokemon1_data, pokemon2_data)
+        results_list = result.narrative()
 
     # Logic to extract the winner and update the scoreboard
-    final_result_line = results_list[-1]
     winner_name = "Nobody (tie)"  # Default value in case of tie
 
-    # The name of the winning Pokémon is in the result line (Ex: "Winner: Squirtle...")
-    if p1_pokemon_name.capitalize() in final_result_line:
+    if result.winner == 1:
         # Pokémon 1 won, so Player 1 scores.
-        GLOBAL_SCOREBOARD['player1_score'] += 1
-        winner_name = GLOBAL_SCOREBOARD['player1_name']
-    elif p2_pokemon_name.capitalize() in final_result_line:
+        scoreboard = SCOREBOARD_STORE.record_win(game_id, 1)
+        winner_name = scoreboard['player1_name']
+    elif result.winner == 2:
         # Pokémon 2 won, so Player 2 scores.
-        GLOBAL_SCOREBOARD['player2_score'] += 1
-        winner_name = GLOBAL_SCOREBOARD['player2_name']
+        scoreboard = SCOREBOARD_STORE.record_win(game_id, 2)
+        winner_name = scoreboard['player2_name']
+    if result.winner:
+        publish_scoreboard(game_id)
+    record_battle(game_id, rule_set.name,
+                  (scoreboard['player1_name'], scoreboard['player2_name']),
+                  *pokemon_ids, pokemon1_data, pokemon2_data,
+                  result.p1_score, result.p2_score, result.winner)
 
     # Final return, including updated scoreboard
-    return jsonify({
-        "pokemon1": pokemon1_data['name'],
-        "pokemon2": pokemon2_data['name'],
+    return {
+        "pokemon1": p1_pokemon_name,
+        "pokemon2": p2_pokemon_name,
         "results": results_list,
         "round_winner": winner_name,
-        "scoreboard": GLOBAL_SCOREBOARD
+        "game_id": game_id,
+        "scoreboard": scoreboard
+    }
+
+
+def record_battle(game_id, rule_set_name, player_names, pokemon1_id, pokemon2_id,
+                  pokemon1_data, pokemon2_data, p1_score, p2_score, winner):
+    """
+    Counts a played battle in the stats and appends it to the history
+    (winner: 1, 2 or 0 for a tie).
+    """
+    BATTLE_STATS.record(pokemon1_id, (pokemon1_data.name, pokemon1_data.types),
+                        pokemon2_id, (pokemon2_data.name, pokemon2_data.types),
+                        winner, player_names)
+    if BATTLE_LOG is None:
+        return
+    BATTLE_LOG.append({
+        "type": "battle",
+        "game_id": game_id,
+        "ruleset": rule_set_name,
+        "player1_name": player_names[0],
+        "player2_name": player_names[1],
+        "pokemon1_id": pokemon1_id,
+        "pokemon2_id": pokemon2_id,
+        "pokemon1": pokemon1_data.name,
+        "pokemon2": pokemon2_data.name,
+        "pokemon1_types": list(pokemon1_data.types),
+        "pokemon2_types": list(pokemon2_data.types),
+        "p1_score": p1_score,
+        "p2_score": p2_score,
+        "winner": winner,
+        "source": PROCESS_ID,
     })
 
-# Endpoint to view the scoreboard
 
+def follow_battle_log() -> int:
+    """
+    Applies the events other processes logged since the last call: counts
+    their battles in the stats and pushes their games' scoreboards (read
+    from the shared store) to this process's subscribers. Returns how many.
+    """
+    game_ids = {}
+
+    def others_events():
+        # Streamed from the log, however far behind this process is
+        for event in BATTLE_LOG_TAIL.follow():
+            if event.get("source") != PROCESS_ID:
+                game_ids[event["game_id"]] = game_ids.get(event["game_id"], 0) + 1
+                yield event
+
+    BATTLE_STATS.load_events(others_events())
+    for game_id in game_ids:
+        publish_scoreboard(game_id)
+    return sum(game_ids.values())
+
+
+def leaderboard_result(category, limit):
+    if category not in BattleStats.CATEGORIES:
+        return {"error": "Invalid requisition.",
+                "message": f"'category' should be one of: {', '.join(BattleStats.CATEGORIES)}."}, 400
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = None
+    if limit is None or not 1 <= limit <= 100:
+        return {"error": "Invalid requisition.",
+                "message": "'limit' should be an integer between 1 and 100."}, 400
+    return {"category": category, "battles": BATTLE_STATS.battles,
+            "leaderboard": BATTLE_STATS.leaderboard(category, limit)}, 200
+
+
+def pokemon_stats_result(pokemon_id):
+    stats = BATTLE_STATS.pokemon(pokemon_id)
+    if stats is None:
+        return {"error": f"No battles recorded for Pokemon with id {pokemon_id}."}, 404
+    return stats, 200
 
-@app.route('/scoreboard', methods=['GET'])
-def get_scoreboard():
-    if not GLOBAL_SCOREBOARD:
-        return jsonify({"message": "No game started."}), 200
-    return jsonify(GLOBAL_SCOREBOARD)
+
+def scoreboard_result(game_id=None):
+    """Returns the (payload, status) of the /scoreboard response."""
+    game_id, scoreboard, error = find_game(game_id)
+    if error:
+        if error[1] == 403:
+            return {"message": "No game started."}, 200
+        return error
+    return scoreboard, 200
+
+
+def scoreboard_response(game_id=None, if_none_match=None):
+    """
+    The /scoreboard response as (body, status, headers), the body being
+    serialized JSON, or None for a 304 when If-None-Match has the ETag.
+    The body is built once per version of the game's scoreboard.
+    """
+    resolved_id = game_id
+    if resolved_id is None:
+        resolved_id = SCOREBOARD_STORE.latest_game_id()
+    version = None if resolved_id is None else SCOREBOARD_STORE.version(resolved_id)
+    if version is None:
+        payload, status = scoreboard_result(game_id)
+        return SCOREBOARD_RESPONSES.serialize(payload), status, {}
+
+    cached = SCOREBOARD_RESPONSES.get(
+        resolved_id, version, lambda: SCOREBOARD_STORE.get_versioned(resolved_id))
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return None, 304, headers
+    return cached.body, 200, headers
+
+
+# Sent with every event stream (X-Accel-Buffering stops nginx buffering it)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def scoreboard_event(game_id, scoreboard, version) -> dict:
+    """
+    Data of a "scoreboard" event. Events of a game can arrive out of
+    order, so clients keep the one with the highest version.
+    """
+    return {"game_id": game_id, "version": version, "scoreboard": scoreboard}
+
+
+def publish_scoreboard(game_id):
+    """Pushes the game's scoreboard to the stream subscribers and the long polls."""
+    scoreboard, version = SCOREBOARD_STORE.get_versioned(game_id)
+    if scoreboard is not None:
+        SCOREBOARD_EVENTS.publish(game_id, "scoreboard",
+                                  scoreboard_event(game_id, scoreboard, version))
+
+
+def scoreboard_snapshot(game_id=None) -> bytes:
+    """The current scoreboard as an event (empty when there is no game)."""
+    if game_id is None:
+        game_id = SCOREBOARD_STORE.latest_game_id()
+        if game_id is None:
+            return b""
+    scoreboard, version = SCOREBOARD_STORE.get_versioned(game_id)
+    if scoreboard is None:
+        return b""
+    return sse_frame("scoreboard", scoreboard_event(game_id, scoreboard, version))
+
+
+def long_poll_wait(value):
+    """Parses ?wait= into (seconds, None) or (None, (payload, status))."""
+    if value is None:
+        return 0.0, None
+    try:
+        wait = float(value)
+    except ValueError:
+        wait = -1
+    if not 0 <= wait <= SCOREBOARD_MAX_WAIT:
+        return None, ({"error": "Invalid requisition.",
+                       "message": f"'wait' should be a number of seconds between 0 "
+                                  f"and {SCOREBOARD_MAX_WAIT:g}."}, 400)
+    return wait, None
 
 
 def extract_types(pokemon_data):
@@ -149,29 +951,84 @@ def extract_types(pokemon_data):
 
 
 def fetch_pokemon_json(pokemon_id):
-    """"Make the API call to PokeAPI and return JSON data."""
-    url = f"{POKEAPI_URL}{pokemon_id}/"  # Creates the URL: https://pokeapi.co/api/v2/pokemon/{id}
-    response = requests.get(url)
-
-    # Check if the response was successful
-    if response.status_code == 200:
-        pokemon_data = response.json()
-        return pokemon_data
-    elif response.status_code == 404:
-        raise ValueError(f"Pokemon with id {pokemon_id} not found.")
-    else:
-        response.raise_for_status()  # Raise an error for other bad responses
+    """"Make the API call to PokeAPI and return the JSON data the factory needs."""
+    return POKEAPI_CLIENT.fetch_pokemon_json(pokemon_id, PokemonFactory.FIELDS)
 
 
-def get_pokemon_data(pokemon_id):
+def load_pokemon_data(pokemon_id):
     """
     Orchestrates the search and creation of the simplified data object.
     """
+    # 0. The offline snapshot answers without parsing or network
+    if POKEDEX_SNAPSHOT is not None:
+        pokemon_data = POKEDEX_SNAPSHOT.get(pokemon_id)
+        if pokemon_data is not None:
+            return pokemon_data
+
     # 1. Fetches the raw data (responsibility of the fetch function)
-    raw_data = fetch_pokemon_json(pokemon_id)
+    with STAGE_SECONDS.time(stage="fetch"):
+        raw_data = fetch_pokemon_json(pokemon_id)
 
     # 2. Creates the simplified data object (Factory's responsibility)
-    return PokemonFactory.create_data(raw_data)  # type: ignore
+    with STAGE_SECONDS.time(stage="create_data"):
+        return PokemonFactory.create_data(raw_data)
+
+
+def get_pokemon_data(pokemon_id):
+    """
+    Returns the simplified data object, going upstream only on a cache miss.
+    """
+    if ACCESS_LOG is not None:
+        ACCESS_LOG.record(pokemon_id)
+    return POKEMON_CACHE.get_or_load(pokemon_id, load_pokemon_data)
+
+
+def warmup_ids():
+    """
+    Pokémon to load before taking traffic: the WARMUP_TOP most requested
+    ones from the access log, then the WARMUP_IDS list (e.g. "1-151").
+    """
+    ids = []
+    if ACCESS_LOG is not None:
+        ids.extend(ACCESS_LOG.top(int(os.environ.get("WARMUP_TOP", "500"))))
+    ids.extend(parse_id_list(os.environ.get("WARMUP_IDS")))
+    return ids
+
+
+# Warm-up runs in the background; GET /ready answers 503 until it is done.
+# Its lookups bypass get_pokemon_data so they don't count as accesses.
+WARMUP = Prefetcher(
+    lambda pokemon_id: POKEMON_CACHE.get_or_load(pokemon_id, load_pokemon_data),
+    warmup_ids(),
+    concurrency=int(os.environ.get("WARMUP_CONCURRENCY", "8")),
+    timeout=float(os.environ.get("WARMUP_TIMEOUT", "120"))
+).start()
+
+
+def ready_result():
+    """(payload, status) for the load balancer's readiness check."""
+    status = WARMUP.status()
+    return {"ready": status["ready"], "warmup": status}, 200 if status["ready"] else 503
+
+
+def get_pokemon_pair(pokemon1_id, pokemon2_id):
+    """
+    Looks up both combatants concurrently.
+    The second lookup runs on the calling thread while the first one runs
+    on FETCH_EXECUTOR; errors from either side are raised to the caller.
+    """
+    if pokemon1_id == pokemon2_id:
+        pokemon_data = get_pokemon_data(pokemon1_id)
+        return pokemon_data, pokemon_data
+
+    future = FETCH_EXECUTOR.submit(get_pokemon_data, pokemon1_id)
+    try:
+        pokemon2_data = get_pokemon_data(pokemon2_id)
+    finally:
+        # Always wait, so a failure on this side doesn't leave work behind
+        pokemon1_data = future.result()
+    return pokemon1_data, pokemon2_data
+
 
 # A simple route to test if the server is running
 
@@ -181,6 +1038,78 @@ def home():
     return "Hello, World!"
 
 
+def start_background_work():
+    """
+    Starts the background threads: the rule set watcher, the battle log
+    writer and follower and the access log flushes. Runs on import; a
+    preforking server stops them before fork() and starts them again in
+    each worker (see server.py).
+    """
+    global LOG_FOLLOWER
+    if os.environ.get("RULESETS_DIR"):
+        RULE_REGISTRY.start_watching(
+            float(os.environ.get("RULESETS_RELOAD_INTERVAL", "2")))
+    if BATTLE_LOG is not None:
+        BATTLE_LOG.start()
+        if BATTLE_LOG.shared and LOG_FOLLOWER is None:
+            stop = threading.Event()
+            LOG_FOLLOWER = (stop, threading.Thread(
+                target=run_log_follower, args=(stop,), name="battle-log-follower",
+                daemon=True))
+            LOG_FOLLOWER[1].start()
+    if ACCESS_LOG is not None:
+        ACCESS_LOG.start_flushing()
+
+
+def stop_background_work():
+    """Stops the threads started above and writes what they buffer."""
+    global LOG_FOLLOWER
+    RULE_REGISTRY.stop_watching()
+    if LOG_FOLLOWER is not None:
+        LOG_FOLLOWER[0].set()
+        LOG_FOLLOWER[1].join()
+        LOG_FOLLOWER = None
+    if BATTLE_LOG is not None:
+        BATTLE_LOG.close()
+    if ACCESS_LOG is not None:
+        ACCESS_LOG.stop_flushing()
+
+
+def run_log_follower(stop):
+    while not stop.wait(BATTLE_LOG_FOLLOW_INTERVAL):
+        try:
+            follow_battle_log()
+        except Exception:
+            app.logger.exception("Could not follow the battle log")
+
+
+def before_fork():
+    """
+    Releases what a forked worker must not inherit: the SQLite connections,
+    the PokeAPI client's sockets and the fetch threads. Call it with the
+    background work stopped; after_fork sets the worker up.
+    """
+    SCOREBOARD_STORE.close()
+    SIMULATION_JOBS.close()
+    POKEMON_CACHE.close()
+    POKEAPI_CLIENT.close()
+    FETCH_EXECUTOR.shutdown()
+
+
+def after_fork():
+    """Gives a forked worker its own ID, connections and fetch threads."""
+    global PROCESS_ID, FETCH_EXECUTOR
+    PROCESS_ID = uuid.uuid4().hex
+    SINGLE_FLIGHT.after_fork()
+    POKEMON_CACHE.open()
+    FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=16,
+                                        thread_name_prefix="pokeapi-fetch")
+
+
+start_background_work()
+atexit.register(stop_background_work)
+
+
 # Run the app
 if __name__ == '__main__':
     app.run(debug=True)
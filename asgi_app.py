@@ -0,0 +1,256 @@
+# Asyncio-native serving mode for the battle API.
+# Run it with any ASGI server, alongside (or instead of) the WSGI `app`:
+#
+#     uvicorn asgi_app:app
+#
+# The endpoints answer with the same shapes as app.py and share its state
+# (scoreboard, rule sets and Pokémon cache); only the upstream lookups differ,
+# going through a non-blocking client so one process can keep hundreds of
+# PokeAPI requests in flight. Calls into the scoreboard store, the battle log
+# and the Pokémon cache's SQLite tier run in worker threads, so they never
+# block the event loop.
+import asyncio
+import time
+from urllib.parse import parse_qs
+
+import requests
+
+import app as wsgi
+import json_codec
+from pokeapi_client import AsyncPokeAPIClient
+from pokemon_data_factory import PokemonFactory
+
+ASYNC_POKEAPI_CLIENT = AsyncPokeAPIClient(wsgi.POKEAPI_CLIENT)
+
+
+async def get_pokemon_data(pokemon_id):
+    """
+    Returns the simplified data object, going upstream only on a cache miss.
+    """
+    if wsgi.ACCESS_LOG is not None:
+        wsgi.ACCESS_LOG.record(pokemon_id)
+    return await wsgi.POKEMON_CACHE.get_or_load_async(pokemon_id, load_pokemon_data)
+
+
+async def load_pokemon_data(pokemon_id):
+    if wsgi.POKEDEX_SNAPSHOT is not None:
+        pokemon_data = wsgi.POKEDEX_SNAPSHOT.get(pokemon_id)
+        if pokemon_data is not None:
+            return pokemon_data
+    with wsgi.STAGE_SECONDS.time(stage="fetch"):
+        raw_data = await ASYNC_POKEAPI_CLIENT.fetch_pokemon_json(
+            pokemon_id, PokemonFactory.FIELDS)
+    with wsgi.STAGE_SECONDS.time(stage="create_data"):
+        return PokemonFactory.create_data(raw_data)
+
+
+async def get_pokemon_pair(pokemon1_id, pokemon2_id):
+    """Looks up both combatants concurrently on the event loop."""
+    if pokemon1_id == pokemon2_id:
+        pokemon_data = await get_pokemon_data(pokemon1_id)
+        return pokemon_data, pokemon_data
+    # Wait for both lookups even when one fails, then raise the first error
+    results = await asyncio.gather(get_pokemon_data(pokemon1_id),
+                                   get_pokemon_data(pokemon2_id),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def start_game(data, query):
+    return await asyncio.to_thread(wsgi.start_game_result, data)
+
+
+async def battle(data, query):
+    """Receives the Pokemon ids, calls PokeAPI and starts the battle."""
+    game_id = data.get('game_id') if isinstance(data, dict) else None
+    game_id, scoreboard, error = await asyncio.to_thread(wsgi.find_game, game_id)
+    if error:
+        return error
+    pokemon_ids, error = wsgi.battle_ids_or_error(data)
+    if error:
+        return error
+    rule_set, error = wsgi.find_rule_set(data.get('ruleset'))
+    if error:
+        return error
+
+    try:
+        pokemon1_data, pokemon2_data = await get_pokemon_pair(*pokemon_ids)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return wsgi.fetch_error_result(e)
+
+    payload = await asyncio.to_thread(wsgi.settle_battle, game_id, scoreboard, rule_set,
+                                      pokemon1_data, pokemon2_data, pokemon_ids)
+    return payload, 200
+
+
+async def get_scoreboard(scope, query, receive, send):
+    """Same as the WSGI /scoreboard, waiting for changes on the event loop."""
+    wait, error = wsgi.long_poll_wait(query.get('wait'))
+    if error:
+        await send_json(send, *error)
+        return
+    game_id = query.get('game_id')
+    if_none_match = request_header(scope, b'if-none-match')
+
+    deadline = time.monotonic() + wait
+    while True:
+        sequence = wsgi.SCOREBOARD_CHANGES.sequence
+        body, status, headers = await asyncio.to_thread(
+            wsgi.scoreboard_response, game_id, if_none_match)
+        remaining = deadline - time.monotonic()
+        if status != 304 or remaining <= 0:
+            break
+        await wsgi.SCOREBOARD_CHANGES.wait_async(
+            sequence, min(remaining, wsgi.SCOREBOARD_POLL_INTERVAL))
+    await send_body(send, body or b'', status, headers)
+
+
+async def scoreboard_stream(scope, query, receive, send):
+    """
+    Same as the WSGI /scoreboard/stream. A subscriber is one task parked
+    on the broadcaster's shared future, so a process can hold many idle
+    connections; the stream stops when the client disconnects.
+    """
+    game_id = query.get('game_id')
+    if game_id is not None:
+        _, _, error = await asyncio.to_thread(wsgi.find_game, game_id)
+        if error:
+            await send_json(send, *error)
+            return
+    cursor = wsgi.SCOREBOARD_EVENTS.cursor(request_header(scope, b'last-event-id'))
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream')] +
+                   [(name.lower().encode('ascii'), value.encode('ascii'))
+                    for name, value in wsgi.SSE_HEADERS.items()],
+    })
+
+    async def stream():
+        async for chunk in wsgi.SCOREBOARD_EVENTS.subscribe_async(
+                game_id, cursor, lambda: wsgi.scoreboard_snapshot(game_id)):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(stream()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def get_upstream_status(data, query):
+    return wsgi.upstream_status_result()
+
+
+async def leaderboard(data, query):
+    return wsgi.leaderboard_result(query.get('category', 'pokemon'), query.get('limit', '10'))
+
+
+async def ready(data, query):
+    return wsgi.ready_result()
+
+
+# (method, path) -> handler(data, query) returning (payload, status)
+ROUTES = {
+    ('POST', '/start'): start_game,
+    ('POST', '/battle'): battle,
+    ('GET', '/upstream/status'): get_upstream_status,
+    ('GET', '/ready'): ready,
+    ('GET', '/leaderboard'): leaderboard,
+}
+# (method, path) -> handler(scope, query, receive, send) that sends its own response
+RAW_ROUTES = {
+    ('GET', '/scoreboard'): get_scoreboard,
+    ('GET', '/scoreboard/stream'): scoreboard_stream,
+}
+
+
+async def app(scope, receive, send):
+    """ASGI entry point."""
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    query = {key: values[-1] for key, values in
+             parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+    raw_handler = RAW_ROUTES.get((scope['method'], scope['path']))
+    if raw_handler is not None:
+        await raw_handler(scope, query, receive, send)
+        return
+
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None:
+        allowed = [method for method, path in list(ROUTES) + list(RAW_ROUTES)
+                   if path == scope['path']]
+        if allowed:
+            await send_json(send, {"error": "Method not allowed"}, 405)
+        else:
+            await send_json(send, {"error": "Not found"}, 404)
+        return
+
+    data = None
+    if scope['method'] == 'POST':
+        body = await read_body(receive)
+        try:
+            data = json_codec.loads(body) if body else None
+        except ValueError:
+            data = None
+
+    payload, status = await handler(data, query)
+    await send_json(send, payload, status, wsgi.retry_after_headers(payload))
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+def request_header(scope, name: bytes):
+    """The value of a request header (name in lower case), or None."""
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def send_json(send, payload, status, headers=None):
+    await send_body(send, json_codec.dumps(payload, sort_keys=True), status, headers)
+
+
+async def send_body(send, body, status, headers=None):
+    """Sends an already serialized JSON body."""
+    extra_headers = [(name.lower().encode('ascii'), value.encode('ascii'))
+                     for name, value in (headers or {}).items()]
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('ascii'))] + extra_headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await ASYNC_POKEAPI_CLIENT.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,173 @@
+from itertools import islice
+
+import requests
+
+import json_codec
+from battle_logic import BattleResult
+
+
+def parse_ndjson(stream):
+    """
+    Yields one object per non-empty line of an NDJSON byte stream.
+    Lines that aren't valid JSON are yielded as None, so the caller can
+    report them at the right position.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json_codec.loads(line)
+        except ValueError:
+            yield None
+
+
+def validate_pair(pair):
+    """
+    Applies the same input rules as /battle to one batch entry.
+    Returns (pokemon1_id, pokemon2_id) or raises ValueError.
+    """
+    if not isinstance(pair, dict) or 'pokemon1' not in pair or 'pokemon2' not in pair:
+        raise ValueError(
+            "Each battle should be a JSON object with 'pokemon1' and 'pokemon2'")
+    pokemon1_id = pair['pokemon1']
+    pokemon2_id = pair['pokemon2']
+    if not isinstance(pokemon1_id, int) or not isinstance(pokemon2_id, int) or pokemon1_id <= 0 or pokemon2_id <= 0:
+        raise ValueError("'pokemon1' and 'pokemon2' should be positive integers.")
+    return pokemon1_id, pokemon2_id
+
+
+class BattleBatch:
+    """
+    Scores a (possibly huge) sequence of battles in fixed-size chunks.
+    Each distinct Pokémon ID is looked up once per batch, all IDs new to a
+    chunk are fetched concurrently, and only one chunk of pairs is held in
+    memory at a time. Wins are tallied so the caller can apply them to the
+    scoreboard in a single update.
+    """
+
+    def __init__(self, battle_system, lookup, executor, player_names,
+                 chunk_size: int = 1000, narrative: bool = False,
+                 matchup_index=None, on_battle=None):
+        """
+        lookup: function pokemon_id -> Pokemon record (e.g. get_pokemon_data).
+        player_names: (player1_name, player2_name) used for 'round_winner'.
+        narrative: also include the result lines of each battle.
+        matchup_index: optional MatchupIndex built for battle_system's rules.
+        on_battle: optional callable(pokemon1_id, pokemon2_id, pokemon1_data,
+        pokemon2_data, p1_score, p2_score, winner) called for each battle
+        played, winner being 1, 2 or 0 for a tie.
+        """
+        self.battle_system = battle_system
+        self.matchup_index = matchup_index
+        self.lookup = lookup
+        self.on_battle = on_battle
+        self.executor = executor
+        self.player_names = player_names
+        self.chunk_size = chunk_size
+        self.narrative = narrative
+        self.player1_wins = 0
+        self.player2_wins = 0
+        self.ties = 0
+        self.errors = 0
+        # pokemon_id -> (data, type_ids) or the exception raised by lookup
+        self._resolved = {}
+
+    def run(self, pairs):
+        """Yields one result dict per input pair, in input order."""
+        index = 0
+        pairs = iter(pairs)
+        while True:
+            chunk = list(islice(pairs, self.chunk_size))
+            if not chunk:
+                return
+            for item in self._run_chunk(index, chunk):
+                yield item
+            index += len(chunk)
+
+    def _run_chunk(self, start, chunk):
+        validated = []
+        missing = set()
+        for pair in chunk:
+            try:
+                ids = validate_pair(pair)
+            except ValueError as ve:
+                validated.append(ve)
+                continue
+            validated.append(ids)
+            missing.update(i for i in ids if i not in self._resolved)
+
+        self._resolve(missing)
+
+        for offset, ids in enumerate(validated):
+            index = start + offset
+            if isinstance(ids, ValueError):
+                self.errors += 1
+                yield {"index": index, "status": 400, "error": str(ids)}
+                continue
+            yield self._battle(index, *ids)
+
+    def _resolve(self, pokemon_ids):
+        """Looks up every ID not seen yet in this batch, concurrently."""
+        pokemon_ids = sorted(pokemon_ids)
+        for pokemon_id, outcome in zip(
+                pokemon_ids, self.executor.map(self._safe_lookup, pokemon_ids)):
+            self._resolved[pokemon_id] = outcome
+
+    def _safe_lookup(self, pokemon_id):
+        try:
+            data = self.lookup(pokemon_id)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return e
+        return data, self.battle_system.record_type_ids(data)
+
+    def _battle(self, index, pokemon1_id, pokemon2_id):
+        for pokemon_id in (pokemon1_id, pokemon2_id):
+            outcome = self._resolved[pokemon_id]
+            if isinstance(outcome, ValueError):
+                self.errors += 1
+                return {"index": index, "status": 404, "error": str(outcome)}
+            if isinstance(outcome, Exception):
+                self.errors += 1
+                return {"index": index, "status": 503,
+                        "error": "Error fetching data from PokeAPI.",
+                        "details": str(outcome)}
+
+        pokemon1_data, pokemon1_ids = self._resolved[pokemon1_id]
+        pokemon2_data, pokemon2_ids = self._resolved[pokemon2_id]
+        scores = None
+        if self.matchup_index is not None:
+            scores = self.matchup_index.lookup_ids(pokemon1_ids, pokemon2_ids)
+        if scores is None:
+            scores = self.battle_system.score_ids(pokemon1_ids, pokemon2_ids)
+        p1_score, p2_score = scores
+
+        if p1_score > p2_score:
+            self.player1_wins += 1
+            round_winner = self.player_names[0]
+            winner = 1
+        elif p2_score > p1_score:
+            self.player2_wins += 1
+            round_winner = self.player_names[1]
+            winner = 2
+        else:
+            self.ties += 1
+            round_winner = "Nobody (tie)"
+            winner = 0
+        if self.on_battle is not None:
+            self.on_battle(pokemon1_id, pokemon2_id, pokemon1_data, pokemon2_data,
+                           p1_score, p2_score, winner)
+
+        result = {
+            "index": index,
+            "pokemon1": pokemon1_data.name,
+            "pokemon2": pokemon2_data.name,
+            "p1_score": p1_score,
+            "p2_score": p2_score,
+            "round_winner": round_winner,
+        }
+        if self.narrative:
+            result["results"] = BattleResult(
+                self.battle_system, pokemon1_data, pokemon2_data,
+                p1_score, p2_score).narrative()
+        return result
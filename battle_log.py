@@ -0,0 +1,388 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+import json_codec
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: shared mode is off
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".ndjson"
+# Held by the process writing to a shared log (see BattleLog's shared mode)
+WRITER_LOCK = "writer.lock"
+
+
+class BattleLog:
+    """
+    Append-only event log of games and battles, stored as NDJSON segments.
+    Every event gets the next offset (0, 1, 2, ...). append() only queues
+    the event; a background thread writes queued events in batches, so the
+    request thread never waits on the disk. A segment is closed once it
+    passes max_segment_bytes and the next one is named after its first
+    offset, e.g. 00000000000000004096.ndjson.
+    With shared=True several processes can append to the same directory:
+    offsets are then given out when a batch is written, while holding a
+    lock file, after catching up with what the other processes wrote.
+    """
+
+    def __init__(self, directory: str, max_segment_bytes: int = 16 * 1024 * 1024,
+                 flush_interval: float = 0.2, fsync: bool = False, shared: bool = False):
+        """
+        flush_interval: seconds between background writes.
+        fsync: also fsync after every batch (durable, but slower).
+        shared: other processes write to the directory too (POSIX only).
+        """
+        if shared and fcntl is None:
+            raise ValueError("A shared battle log needs fcntl (POSIX only).")
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.shared = shared
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()  # offsets and the pending queue
+        self._write_lock = threading.Lock()  # the segment files
+        self._pending = []
+        self._segment = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._next_offset = 0
+        self._stop = None
+        self._writer = None
+        self.start()
+
+    @property
+    def next_offset(self) -> int:
+        """Offset the next event will get (in shared mode: once written)."""
+        if not self.shared:
+            with self._lock:
+                return self._next_offset
+        self.flush()
+        with self._write_lock, self._writer_lock():
+            self._catch_up()
+            return self._next_offset
+
+    def start(self):
+        """Starts the background writer (again, after close())."""
+        with self._write_lock:
+            if self._writer is not None:
+                return
+            if not self.shared and self._segment is None:
+                # Events queued since close() already have their offsets
+                self._next_offset = max(self._next_offset, self._recover())
+            self._stop = threading.Event()
+            self._writer = threading.Thread(target=self._run, args=(self._stop,),
+                                            name="battle-log-writer", daemon=True)
+            self._writer.start()
+
+    def append(self, event: dict):
+        """
+        Queues an event (a new dict the caller won't change); returns its
+        offset, or None in shared mode, where it is only known once written.
+        """
+        with self._lock:
+            if self.shared:
+                offset = None
+            else:
+                offset = self._next_offset
+                self._next_offset += 1
+                event["offset"] = offset
+            event.setdefault("ts", time.time())
+            self._pending.append(event)
+        return offset
+
+    def flush(self):
+        """Writes every queued event now."""
+        with self._write_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if not events:
+                return
+            if not self.shared:
+                self._write(events)
+                return
+            with self._writer_lock():
+                self._catch_up()
+                for event in events:
+                    event["offset"] = self._next_offset
+                    self._next_offset += 1
+                self._write(events)
+
+    def read(self, offset: int = 0, limit: int = None, game_id=None):
+        """
+        Same as read_events on this log. Queued events are written first,
+        so a reader sees everything appended before the call.
+        """
+        self.flush()
+        return read_events(self.directory, offset, limit, game_id)
+
+    def close(self):
+        """Stops the writer, writes what is queued and closes the segment."""
+        with self._write_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._stop.set()
+            writer.join()
+        self.flush()
+        with self._write_lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+                self._segment_path = None
+
+    def _run(self, stop):
+        while not stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Could not write the battle log in %s", self.directory)
+
+    def _write(self, events):
+        lines = b"".join(json_codec.dumps(event) + b"\n" for event in events)
+        if self._segment is None or self._segment_size >= self.max_segment_bytes:
+            self._rotate(events[0]["offset"])
+        self._segment.write(lines)
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+        self._segment_size += len(lines)
+
+    def _rotate(self, first_offset):
+        if self._segment is not None:
+            self._segment.close()
+        path = os.path.join(self.directory, f"{first_offset:020d}{SEGMENT_SUFFIX}")
+        self._segment = open(path, "ab")
+        self._segment_path = path
+        self._segment_size = self._segment.tell()
+
+    def _recover(self) -> int:
+        """Reopens the last segment and returns the offset that comes next."""
+        segments = list_segments(self.directory)
+        if not segments:
+            return 0
+        first_offset, path = segments[-1]
+        return self._open_last(path, 0, first_offset)
+
+    def _catch_up(self):
+        """
+        Shared mode, with the lock file held: moves to the end of the last
+        segment, past the events the other processes wrote since our last
+        batch (only those are read).
+        """
+        segments = list_segments(self.directory)
+        if not segments:
+            self._next_offset = 0
+            return
+        first_offset, path = segments[-1]
+        if path != self._segment_path:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._next_offset = self._open_last(path, 0, first_offset)
+        elif os.path.getsize(path) != self._segment_size:
+            self._next_offset = self._open_last(path, self._segment_size,
+                                                self._next_offset)
+
+    def _open_last(self, path, position, next_offset) -> int:
+        """
+        Reads the last segment from byte `position` on, cuts off a torn
+        write at its end and opens it for appending; returns the next offset.
+        """
+        with open(path, "rb") as f:
+            f.seek(position)
+            valid_size = position
+            for line in f:
+                try:
+                    next_offset = json_codec.loads(line)["offset"] + 1
+                except (ValueError, KeyError):
+                    break  # A torn write at the end: cut it off
+                valid_size += len(line)
+        if os.path.getsize(path) != valid_size:
+            with open(path, "r+b") as f:
+                f.truncate(valid_size)
+        if self._segment is None:
+            self._segment = open(path, "ab")
+            self._segment_path = path
+        self._segment_size = valid_size
+        return next_offset
+
+    def _writer_lock(self):
+        return _FileLock(os.path.join(self.directory, WRITER_LOCK))
+
+
+class _FileLock:
+    """
+    Exclusive lock on a file, held by one process at a time. The file is
+    opened on every acquisition, since a lock taken through a descriptor
+    inherited across fork() would be shared with the parent.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class LogTail:
+    """
+    Follows a log directory written by other processes: each read()
+    returns the events written since the previous one, in order. Only
+    keeps its position (segment and byte), so polling is cheap however
+    long the log grows; a line still being written is left for later.
+    """
+
+    def __init__(self, directory: str, offset: int = 0):
+        self.directory = directory
+        self.offset = offset  # The next event to return
+        self._path = None
+        self._position = 0
+
+    def read(self, limit: int = None) -> list:
+        """The events written since the previous read, as a list (see follow)."""
+        return list(self.follow(limit))
+
+    def follow(self, limit: int = None):
+        """
+        Yields the events written since the previous read, in order, at most
+        `limit`, reading them one line at a time however many there are.
+        The position moves past each event as it is yielded.
+        """
+        segments = list_segments(self.directory)
+        if self._path is None:
+            # First read: the last segment beginning at or before the offset
+            for first_offset, path in segments:
+                if first_offset <= self.offset or self._path is None:
+                    self._path = path
+        paths = [path for _, path in segments]
+        if self._path not in paths:
+            return  # Nothing written yet (or the segment was removed)
+        for path in paths[paths.index(self._path):]:
+            if path != self._path:
+                self._path, self._position = path, 0
+            complete, count = yield from self._read_segment(path, limit)
+            if limit is not None:
+                limit -= count
+            if not complete or limit == 0:
+                return
+
+    def _read_segment(self, path, limit):
+        """
+        Yields the segment's new events; returns (False when it stopped
+        early, how many it yielded).
+        """
+        count = 0
+        with open(path, "rb") as f:
+            f.seek(self._position)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return False, count  # Being written right now
+                try:
+                    event = json_codec.loads(line)
+                except ValueError:
+                    return False, count  # Torn; the next writer cuts it off
+                self._position += len(line)
+                if event["offset"] < self.offset:
+                    continue
+                self.offset = event["offset"] + 1
+                count += 1
+                yield event
+                if limit is not None and count >= limit:
+                    return False, count
+        return True, count
+
+
+def list_segments(directory: str) -> list:
+    """(first offset, path) of every segment, oldest first."""
+    segments = []
+    for file_name in os.listdir(directory):
+        name, extension = os.path.splitext(file_name)
+        if extension == SEGMENT_SUFFIX and name.isdigit():
+            segments.append((int(name), os.path.join(directory, file_name)))
+    return sorted(segments)
+
+
+def read_events(directory: str, offset: int = 0, limit: int = None, game_id=None):
+    """
+    Yields the events from `offset` on, in order, up to `limit` events
+    (only the ones of game_id when given). Only reads, so it is safe on
+    the directory of a running server.
+    """
+    segments = list_segments(directory)
+    # Start at the last segment beginning at or before the offset
+    start = 0
+    for i, (first_offset, _) in enumerate(segments):
+        if first_offset <= offset:
+            start = i
+    returned = 0
+    for _, path in segments[start:]:
+        with open(path, "rb") as f:
+            for line in f:
+                if limit is not None and returned >= limit:
+                    return
+                try:
+                    event = json_codec.loads(line)
+                except ValueError:
+                    break  # Being written right now
+                if event["offset"] < offset:
+                    continue
+                if game_id is not None and event.get("game_id") != game_id:
+                    continue
+                returned += 1
+                yield event
+
+
+def replay(events, game_id=None) -> dict:
+    """
+    Rebuilds scoreboards from log events: {game_id: scoreboard}, with the
+    same shape as the scoreboard store's.
+    """
+    scoreboards = {}
+    for event in events:
+        if game_id is not None and event.get("game_id") != game_id:
+            continue
+        if event["type"] == "game_started":
+            scoreboards[event["game_id"]] = {
+                "player1_name": event["player1_name"],
+                "player2_name": event["player2_name"],
+                "player1_score": 0,
+                "player2_score": 0,
+            }
+        elif event["type"] == "battle":
+            scoreboard = scoreboards.get(event["game_id"])
+            if scoreboard is not None and event["winner"]:
+                scoreboard[f"player{event['winner']}_score"] += 1
+    return scoreboards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Rebuild scoreboards by replaying a battle log.")
+    parser.add_argument("directory", help="battle log directory (BATTLE_LOG_DIR)")
+    parser.add_argument("--game-id", help="only this game")
+    args = parser.parse_args(argv)
+
+    scoreboards = replay(read_events(args.directory, game_id=args.game_id), args.game_id)
+    print(json.dumps(scoreboards, indent=2))
+    return scoreboards
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,72 @@
+from pokemon_data_factory import Pokemon, TYPE_NAMES
 from type_rules import TypeAdvantageRule, StandardTypeRule
 
 
+class BattleResult:
+    """
+    Outcome of one matchup: the two Pokémon records and their scores.
+    The narrative lines are only built when narrative() is called, so
+    callers that just need the winner don't pay for string formatting.
+    """
+
+    __slots__ = ("pokemon1", "pokemon2", "p1_score", "p2_score", "_logic")
+
+    def __init__(self, logic, pokemon1: Pokemon, pokemon2: Pokemon,
+                 p1_score, p2_score):
+        self._logic = logic
+        self.pokemon1 = pokemon1
+        self.pokemon2 = pokemon2
+        self.p1_score = p1_score
+        self.p2_score = p2_score
+
+    @property
+    def winner(self) -> int:
+        """Returns 1 or 2 for the winning side, or 0 for a tie."""
+        if self.p1_score > self.p2_score:
+            return 1
+        if self.p2_score > self.p1_score:
+            return 2
+        return 0
+
+    def narrative(self) -> list:
+        """
+        Builds the human readable result lines (same text as determine_winner).
+        """
+        results = []
+        strength = self._logic.strength
+        p1_name = self.pokemon1.display_name
+        p2_name = self.pokemon2.display_name
+        p1_types = zip(self._logic.record_type_ids(self.pokemon1),
+                       self.pokemon1.type_display_names)
+        p2_types = list(zip(self._logic.record_type_ids(self.pokemon2),
+                            self.pokemon2.type_display_names))
+
+        for p1_id, p1_type in p1_types:
+            for p2_id, p2_type in p2_types:
+                if strength[p1_id] >> p2_id & 1:
+                    results.append(
+                        f"{p1_name}'s {p1_type} type is strong against {p2_name}'s {p2_type} type.")
+                elif strength[p2_id] >> p1_id & 1:
+                    results.append(
+                        f"{p2_name}'s {p2_type} type is strong against {p1_name}'s {p1_type} type.")
+
+        # If the results list is empty, it means there were no direct benefits.
+        if not results:
+            results.append(
+                "No type advantage found. It's a technical draw!")
+
+        winner = self.winner
+        if winner == 1:
+            results.append(f"Winner: {p1_name}.")
+        elif winner == 2:
+            results.append(f"Winner: {p2_name}.")
+        elif self.p1_score > 0:
+            results.append(
+                "It's a tie! Both Pokémon have the same number of advantages.")
+
+        return results
+
+
 class BattleLogic:
     """
     Core class for battle logic, injecting the rules.
@@ -11,52 +77,94 @@ class BattleLogic:
         """
         Optionally accepts a Rule Set.
         By default, it uses the StandardTypeRule.
+        The rules are compiled once here into an integer-indexed matrix.
+        """
+        self.rules = {attacking: list(defending) for attacking, defending
+                      in rule_set.get_advantages().items()}
+        self.type_index, self.strength = self.compile_rules(self.rules)
+        # Types outside the rule set share one id that beats nothing
+        self.unknown_type_id = len(self.type_index)
+        # Record type ids (see pokemon_data_factory.type_id) -> compiled ids
+        self._record_ids = {}
+
+    @staticmethod
+    def compile_rules(rules: dict):
+        """
+        Turns {attacking: [defending, ...]} into a type name -> id mapping and
+        a list of bitmasks, where bit d of strength[a] is set when type a is
+        strong against type d. The last mask belongs to unknown types.
         """
-        self.rules = rule_set.get_advantages()
+        type_index = {}
+        for attacking_type, defending_types in rules.items():
+            for type_name in (attacking_type, *defending_types):
+                type_index.setdefault(type_name, len(type_index))
+
+        strength = [0] * (len(type_index) + 1)
+        for attacking_type, defending_types in rules.items():
+            mask = 0
+            for defending_type in defending_types:
+                mask |= 1 << type_index[defending_type]
+            strength[type_index[attacking_type]] = mask
+        return type_index, strength
+
+    def type_ids(self, types) -> tuple:
+        """Maps type names to their compiled ids."""
+        unknown = self.unknown_type_id
+        return tuple(self.type_index.get(type_name, unknown) for type_name in types)
+
+    def record_type_ids(self, pokemon: Pokemon) -> tuple:
+        """
+        Compiled type ids of a Pokémon record. There are only a few hundred
+        type combinations, so each is translated once and then looked up.
+        """
+        ids = self._record_ids.get(pokemon.type_ids)
+        if ids is None:
+            ids = self.type_ids(TYPE_NAMES[i] for i in pokemon.type_ids)
+            self._record_ids[pokemon.type_ids] = ids
+        return ids
 
     def is_strong_against(self, attacking_type, defending_type):
         """
         Checks strength using the injected ruleset.
         """
-        if attacking_type in self.rules:
-            if defending_type in self.rules[attacking_type]:
-                return True
-        return False
+        attacking_id = self.type_index.get(attacking_type, self.unknown_type_id)
+        defending_id = self.type_index.get(defending_type, self.unknown_type_id)
+        return bool(self.strength[attacking_id] >> defending_id & 1)
 
-    def determine_winner(self, p1_name, p1_types, p2_name, p2_types):
+    def score_ids(self, p1_ids, p2_ids):
         """
-        Compares the types of both Pokémon and determines the winner.
-        The scoring logic remains the same, but now uses self.is_strong_against.
+        Scores a matchup from compiled type ids, returning (p1_score, p2_score).
+        When both types are strong against each other, only Pokémon 1 scores.
         """
-        results = []
+        strength = self.strength
         p1_score = 0
         p2_score = 0
-
-        # 1. Comparison: Pokémon 1 attacks Pokémon 2
-        for p1_type in p1_types:
-            for p2_type in p2_types:
-                if self.is_strong_against(p1_type, p2_type):
-                    results.append(
-                        f"{p1_name.capitalize()}'s {p1_type.capitalize()} type is strong against {p2_name.capitalize()}'s {p2_type.capitalize()} type.")
+        for p1_id in p1_ids:
+            p1_mask = strength[p1_id]
+            p1_bit = 1 << p1_id
+            for p2_id in p2_ids:
+                if p1_mask >> p2_id & 1:
                     p1_score += 1
-                elif self.is_strong_against(p2_type, p1_type):
-                    results.append(
-                        f"{p2_name.capitalize()}'s {p2_type.capitalize()} type is strong against {p1_name.capitalize()}'s {p1_type.capitalize()} type.")
+                elif strength[p2_id] & p1_bit:
                     p2_score += 1
+        return p1_score, p2_score
 
-        # If the results list is empty, it means there were no direct benefits.
-        if not results and p1_score == 0 and p2_score == 0:
-            results.append(
-                "No type advantage found. It's a technical draw!")
+    def score_matchup(self, p1_types, p2_types):
+        """Scores a matchup from type names, returning (p1_score, p2_score)."""
+        return self.score_ids(self.type_ids(p1_types), self.type_ids(p2_types))
 
-        if p1_score > p2_score:
-            results.append(
-                f"Winner: {p1_name.capitalize()}.")
-        elif p2_score > p1_score:
-            results.append(
-                f"Winner: {p2_name.capitalize()}.")
-        elif p1_score > 0 and p1_score == p2_score:
-            results.append(
-                f"It's a tie! Both Pokémon have the same number of advantages.")
+    def evaluate(self, pokemon1: Pokemon, pokemon2: Pokemon) -> BattleResult:
+        """
+        Scores two Pokémon records without building any narrative text.
+        """
+        p1_score, p2_score = self.score_ids(self.record_type_ids(pokemon1),
+                                            self.record_type_ids(pokemon2))
+        return BattleResult(self, pokemon1, pokemon2, p1_score, p2_score)
 
-        return results
+    def determine_winner(self, p1_name, p1_types, p2_name, p2_types):
+        """
+        Compares the types of both Pokémon and determines the winner.
+        Returns the list of result lines, the last one naming the winner.
+        """
+        return self.evaluate(Pokemon.create(p1_name, p1_types),
+                             Pokemon.create(p2_name, p2_types)).narrative()
@@ -0,0 +1,191 @@
+import bisect
+import threading
+
+
+class _ScoreCounts:
+    """
+    Fenwick tree of how many keys have each score (from 1 up), so the keys
+    scoring at most s are counted in O(log max score). Its size is a power
+    of two and doubles when a score goes past it.
+    """
+
+    def __init__(self):
+        self._tree = [0, 0]  # 1-based nodes; node i covers (i - (i & -i), i]
+
+    def add(self, score: int, delta: int):
+        while score >= len(self._tree):
+            # The new last node covers every score, the others none yet
+            size = len(self._tree) - 1
+            total = self._tree[size]
+            self._tree.extend([0] * size)
+            self._tree[2 * size] = total
+        while score < len(self._tree):
+            self._tree[score] += delta
+            score += score & -score
+
+    def at_most(self, score: int) -> int:
+        """Keys with a score between 1 and `score`."""
+        score = min(score, len(self._tree) - 1)
+        count = 0
+        while score > 0:
+            count += self._tree[score]
+            score -= score & -score
+        return count
+
+    def total(self) -> int:
+        return self._tree[len(self._tree) - 1]
+
+
+class RankIndex:
+    """
+    Keys ranked by a score that only ever goes up by one (a win count).
+    Keys are grouped in buckets by score, and the distinct scores are kept
+    sorted, so an increment moves one key between two buckets and the top
+    K is read from the highest buckets down, without sorting every key.
+    Among equal scores, the key that got there first is listed first, but
+    they share a rank: one more than the keys with a higher score, counted
+    in a Fenwick tree.
+    """
+
+    def __init__(self):
+        self._scores = {}  # key -> score
+        self._buckets = {}  # score -> {key: None}, in arrival order
+        self._distinct = []  # non-empty bucket scores, ascending
+        self._counts = _ScoreCounts()
+
+    def increment(self, key):
+        old = self._scores.get(key, 0)
+        new = old + 1
+        self._scores[key] = new
+        self._counts.add(new, 1)
+        if old:
+            self._counts.add(old, -1)
+            bucket = self._buckets[old]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[old]
+                del self._distinct[bisect.bisect_left(self._distinct, old)]
+        bucket = self._buckets.get(new)
+        if bucket is None:
+            bucket = self._buckets[new] = {}
+            bisect.insort(self._distinct, new)
+        bucket[key] = None
+
+    def add(self, key):
+        """Makes a key known with a score of 0 (not ranked until it scores)."""
+        self._scores.setdefault(key, 0)
+
+    def score(self, key) -> int:
+        return self._scores.get(key, 0)
+
+    def top(self, limit: int) -> list:
+        """The `limit` best (key, score) pairs, best first (see rank for ties)."""
+        top = []
+        for score in reversed(self._distinct):
+            for key in self._buckets[score]:
+                if len(top) == limit:
+                    return top
+                top.append((key, score))
+        return top
+
+    def rank(self, key):
+        """
+        1-based rank by score, or None: 1 + the keys with a higher score,
+        so keys with equal scores share it ("1224" ranking).
+        """
+        score = self._scores.get(key)
+        if not score:
+            return None
+        return 1 + self._counts.total() - self._counts.at_most(score)
+
+
+class BattleStats:
+    """
+    Win/loss/tie counters per Pokémon, per type and per player across all
+    games, updated as each battle is played. Each category has a RankIndex
+    on wins, so leaderboards and lookups never rescan past battles.
+    """
+
+    CATEGORIES = ("pokemon", "types", "players")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {category: {} for category in self.CATEGORIES}
+        self._ranks = {category: RankIndex() for category in self.CATEGORIES}
+        self._names = {}  # pokemon id -> name
+        self.battles = 0
+
+    def record(self, pokemon1_id, pokemon1, pokemon2_id, pokemon2, winner,
+               player_names=None):
+        """
+        Counts one battle. pokemon1 / pokemon2: (name, type names);
+        winner: 1, 2 or 0 for a tie; player_names: (player 1, player 2).
+        """
+        outcomes = ("ties", "ties") if winner == 0 else \
+            ("wins", "losses") if winner == 1 else ("losses", "wins")
+        with self._lock:
+            self.battles += 1
+            for pokemon_id, (name, types), outcome in zip(
+                    (pokemon1_id, pokemon2_id), (pokemon1, pokemon2), outcomes):
+                if pokemon_id is not None:
+                    self._names[pokemon_id] = name
+                    self._count("pokemon", pokemon_id, outcome)
+                for type_name in types:
+                    self._count("types", type_name, outcome)
+            if player_names is not None:
+                for player, outcome in zip(player_names, outcomes):
+                    self._count("players", player, outcome)
+
+    def load_events(self, events):
+        """Rebuilds the counters from battle log events (see battle_log.py)."""
+        players = {}
+        for event in events:
+            if event["type"] == "game_started":
+                players[event["game_id"]] = (event["player1_name"], event["player2_name"])
+            elif event["type"] == "battle":
+                # Newer battle events carry the names, so a reader that
+                # starts after the game_started event still has them
+                player_names = players.get(event["game_id"])
+                if "player1_name" in event:
+                    player_names = (event["player1_name"], event["player2_name"])
+                self.record(event.get("pokemon1_id"),
+                            (event["pokemon1"], event.get("pokemon1_types", [])),
+                            event.get("pokemon2_id"),
+                            (event["pokemon2"], event.get("pokemon2_types", [])),
+                            event["winner"], player_names)
+
+    def leaderboard(self, category: str, limit: int = 10) -> list:
+        """Top entries of a category by wins; tied entries share a rank."""
+        with self._lock:
+            ranks = self._ranks[category]
+            return [self._entry(category, key, ranks.rank(key))
+                    for key, _ in ranks.top(limit)]
+
+    def pokemon(self, pokemon_id):
+        """Counters and rank of one Pokémon, or None if it never battled."""
+        with self._lock:
+            if pokemon_id not in self._counters["pokemon"]:
+                return None
+            return self._entry("pokemon", pokemon_id,
+                               self._ranks["pokemon"].rank(pokemon_id))
+
+    def _count(self, category, key, outcome):
+        counters = self._counters[category].get(key)
+        if counters is None:
+            counters = self._counters[category][key] = {"wins": 0, "losses": 0, "ties": 0}
+            self._ranks[category].add(key)
+        counters[outcome] += 1
+        if outcome == "wins":
+            self._ranks[category].increment(key)
+
+    def _entry(self, category, key, rank) -> dict:
+        counters = self._counters[category][key]
+        battles = counters["wins"] + counters["losses"] + counters["ties"]
+        entry = {"rank": rank}
+        if category == "pokemon":
+            entry.update(pokemon_id=key, name=self._names.get(key))
+        else:
+            entry["name"] = key
+        entry.update(counters, battles=battles,
+                     win_rate=counters["wins"] / battles if battles else 0.0)
+        return entry
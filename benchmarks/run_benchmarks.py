@@ -0,0 +1,232 @@
+# Benchmarks for the battle hot path and the upstream fetch layer.
+# Run from the repository root:
+#
+#     python -m benchmarks.run_benchmarks --output bench.json
+#
+# Everything runs against a local stub PokeAPI, so numbers are comparable
+# between commits on the same machine.
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+import app as app_module
+import json_codec
+from benchmarks.stub_pokeapi import StubPokeAPI, stub_pokemon_json
+from pokemon_cache import PokemonCache
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def time_loop(function, iterations):
+    """Runs function iterations times and returns operations per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def bench_hot_path(iterations):
+    """Single-matchup throughput of the pure Python layers (no HTTP)."""
+    rule_set = app_module.RULE_REGISTRY.get()
+    battle_system = rule_set.battle_system
+    matchup_index = rule_set.matchup_index
+    p1 = ("charizard", ["fire", "flying"])
+    p2 = ("blastoise", ["water"])
+    raw_data = stub_pokemon_json(6, payload_kb=0)
+    p1_record = app_module.PokemonFactory.create_data({"name": p1[0], "types": [
+        {"type": {"name": t}} for t in p1[1]]})
+    p2_record = app_module.PokemonFactory.create_data({"name": p2[0], "types": [
+        {"type": {"name": t}} for t in p2[1]]})
+    p1_ids = battle_system.type_ids(p1[1])
+    p2_ids = battle_system.type_ids(p2[1])
+
+    return {
+        "determine_winner_ops": time_loop(
+            lambda: battle_system.determine_winner(p1[0], p1[1], p2[0], p2[1]), iterations),
+        "evaluate_ops": time_loop(
+            lambda: battle_system.evaluate(p1_record, p2_record).winner, iterations),
+        "narrative_ops": time_loop(
+            lambda: battle_system.evaluate(p1_record, p2_record).narrative(), iterations),
+        "score_ids_ops": time_loop(
+            lambda: battle_system.score_ids(p1_ids, p2_ids), iterations),
+        "matchup_index_ops": time_loop(
+            lambda: matchup_index.lookup_ids(p1_ids, p2_ids), iterations),
+        "create_data_ops": time_loop(
+            lambda: app_module.PokemonFactory.create_data(raw_data), iterations),
+    }
+
+
+def bench_parse(iterations, payload_kb):
+    """Parsing an upstream document of payload_kb: every field vs the factory's."""
+    raw = json.dumps(stub_pokemon_json(6, payload_kb)).encode()
+    fields = app_module.PokemonFactory.FIELDS
+    iterations = max(1, iterations // 100)  # Documents are big: fewer loops
+    return {
+        "backend": json_codec.BACKEND,
+        "document_bytes": len(raw),
+        "full_parse_ops": time_loop(lambda: json_codec.loads(raw), iterations),
+        "fields_parse_ops": time_loop(lambda: json_codec.loads_fields(raw, fields), iterations),
+    }
+
+
+def bench_memory(requests_count):
+    """Peak Python heap allocated while serving one /battle (test client)."""
+    client = app_module.app.test_client()
+    client.post('/start', json={"player1_name": "Ash", "player2_name": "Gary"})
+    # Warm up imports, caches and pools so only steady-state cost is measured
+    for i in range(5):
+        client.post('/battle', json={"pokemon1": 1 + i, "pokemon2": 2 + i})
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(requests_count):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            client.post('/battle', json={"pokemon1": 1 + i % 50, "pokemon2": 51 + i % 50})
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes_mean": statistics.mean(peaks),
+            "peak_bytes_max": max(peaks)}
+
+
+def bench_endpoint(base_url, concurrency, requests_count, id_range):
+    """Fires /battle requests from `concurrency` threads and measures latency."""
+    local = threading.local()
+    session_setup = requests.Session()
+    start = session_setup.post(f"{base_url}/start",
+                               json={"player1_name": "Ash", "player2_name": "Gary"})
+    game_id = start.json()["game_id"]
+
+    def one_request(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        body = {"pokemon1": 1 + i % id_range, "pokemon2": 1 + (i * 7 + 3) % id_range,
+                "game_id": game_id}
+        began = time.perf_counter()
+        response = session.post(f"{base_url}/battle", json=body)
+        return time.perf_counter() - began, response.status_code
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one_request, range(requests_count)))
+    elapsed = time.perf_counter() - began
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, status in outcomes if status != 200)
+    return {
+        "concurrency": concurrency,
+        "requests": requests_count,
+        "errors": errors,
+        "rps": requests_count / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    stub = StubPokeAPI(latency=args.upstream_latency_ms / 1000,
+                       payload_kb=args.payload_kb).start()
+    # Point the app at the stub, without the rate limit meant for the real
+    # PokeAPI; restored afterwards
+    original_url = app_module.POKEAPI_CLIENT.base_url
+    original_limiter = app_module.POKEAPI_CLIENT.rate_limiter
+    original_cache = app_module.POKEMON_CACHE
+    app_module.POKEAPI_CLIENT.base_url = stub.base_url
+    app_module.POKEAPI_CLIENT.rate_limiter = None
+    app_module.POKEMON_CACHE = PokemonCache(max_size=2048)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "settings": vars(args),
+    }
+    try:
+        report["hot_path"] = bench_hot_path(args.iterations)
+        report["parse"] = bench_parse(args.iterations, args.payload_kb)
+        report["memory_per_request"] = bench_memory(args.memory_requests)
+
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            report["endpoint"] = {}
+            for cache_mode in ("cold", "warm"):
+                levels = []
+                for concurrency in args.concurrency:
+                    # "cold": a zero-size cache sends every lookup upstream
+                    app_module.POKEMON_CACHE = PokemonCache(
+                        max_size=0 if cache_mode == "cold" else 2048)
+                    upstream_before = stub.requests
+                    level = bench_endpoint(base_url, concurrency, args.requests,
+                                           args.id_range)
+                    level["upstream_requests"] = stub.requests - upstream_before
+                    levels.append(level)
+                report["endpoint"][cache_mode] = levels
+        finally:
+            server.shutdown()
+    finally:
+        stub.stop()
+        app_module.POKEAPI_CLIENT.base_url = original_url
+        app_module.POKEAPI_CLIENT.rate_limiter = original_limiter
+        app_module.POKEMON_CACHE = original_cache
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the battle hot path and /battle end to end.")
+    parser.add_argument("--iterations", type=int, default=50000,
+                        help="loop count for the hot path benchmarks")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="/battle requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--memory-requests", type=int, default=50)
+    parser.add_argument("--id-range", type=int, default=151,
+                        help="Pokémon ids used by the load generator")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20.0)
+    parser.add_argument("--payload-kb", type=int, default=64,
+                        help="size of each stub PokeAPI document")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return report
+
+
+if __name__ == '__main__':
+    main()
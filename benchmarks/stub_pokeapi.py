@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Types handed out by the stub, picked from the Pokémon id
+STUB_TYPES = ["fire", "water", "grass", "electric", "ground", "flying",
+              "fighting", "fairy", "dark", "psychic", "normal", "poison",
+              "rock", "ghost", "steel", "bug"]
+
+
+def stub_pokemon_json(pokemon_id: int, payload_kb: int = 0) -> dict:
+    """
+    Builds a PokeAPI-like /pokemon/<id> document. payload_kb pads it with
+    fake moves, since the real documents are large.
+    """
+    types = [STUB_TYPES[pokemon_id % len(STUB_TYPES)]]
+    if pokemon_id % 3 == 0:
+        types.append(STUB_TYPES[(pokemon_id // 3) % len(STUB_TYPES)])
+    document = {
+        "id": pokemon_id,
+        "name": f"stubmon-{pokemon_id}",
+        "types": [{"slot": slot, "type": {"name": name, "url": "..."}}
+                  for slot, name in enumerate(dict.fromkeys(types), start=1)],
+        "moves": [],
+    }
+    move = {"move": {"name": "tackle", "url": "https://pokeapi.co/api/v2/move/33/"},
+            "version_group_details": []}
+    move_size = len(json.dumps(move))
+    document["moves"] = [move] * (payload_kb * 1024 // move_size)
+    # PokeAPI sends its keys sorted, so "name" and "types" come after "moves"
+    return dict(sorted(document.items()))
+
+
+class StubPokeAPI:
+    """
+    Local stand-in for PokeAPI with configurable latency and failures.
+    Serves /api/v2/pokemon/<id>/ for ids 1..max_id and 404 for the rest.
+    """
+
+    def __init__(self, latency: float = 0.0, payload_kb: int = 0,
+                 max_id: int = 1025, error_rate: float = 0.0,
+                 error_status: int = 503, retry_after: int = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        latency: seconds to wait before each response.
+        error_rate: fraction of requests answered with error_status
+        (with a Retry-After header when retry_after is set).
+        port: 0 picks a free port.
+        """
+        self.latency = latency
+        self.payload_kb = payload_kb
+        self.max_id = max_id
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v2/pokemon/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name="stub-pokeapi", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _next_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def _body(self, pokemon_id: int) -> bytes:
+        body = self._bodies.get(pokemon_id)
+        if body is None:
+            body = json.dumps(stub_pokemon_json(pokemon_id, self.payload_kb)).encode()
+            self._bodies[pokemon_id] = body
+        return body
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                count = stub._next_request()
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                parts = [p for p in self.path.split("/") if p]
+                pokemon_id = int(parts[-1]) if parts and parts[-1].isdigit() else 0
+                if stub.error_rate and (count * stub.error_rate) % 1 < stub.error_rate:
+                    headers = {}
+                    if stub.retry_after is not None:
+                        headers["Retry-After"] = str(stub.retry_after)
+                    self._send(stub.error_status, b'{"detail": "stub failure"}', headers)
+                elif 1 <= pokemon_id <= stub.max_id:
+                    self._send(200, stub._body(pokemon_id))
+                else:
+                    self._send(404, b"Not Found")
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+
+import json_codec
+from response_cache import ChangeNotifier
+
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+
+def sse_frame(event: str, data, event_id=None) -> bytes:
+    """Encodes one Server-Sent Event; data is serialized as JSON."""
+    head = f"event: {event}\ndata: " if event_id is None else \
+        f"id: {event_id}\nevent: {event}\ndata: "
+    return head.encode("utf-8") + json_codec.dumps(data, sort_keys=True) + b"\n\n"
+
+
+class Broadcaster:
+    """
+    Fans Server-Sent Events out to any number of subscribers.
+    publish() encodes an event once into a ring shared by everybody that
+    keeps the last `history` frames. A subscriber is only a cursor into the
+    ring, so an idle connection holds no queue of its own; one that falls
+    further behind than the ring skips the frames it lost and is sent a
+    fresh snapshot instead, so a slow consumer can't grow memory.
+    """
+
+    def __init__(self, history: int = 1024, keepalive: float = 15.0, notifier=None):
+        """
+        keepalive: seconds of silence before a comment frame is sent, so
+        proxies don't close idle connections.
+        notifier: ChangeNotifier to signal on publish (one is created by default).
+        """
+        self.history = history
+        self.keepalive = keepalive
+        self.notifier = notifier or ChangeNotifier()
+        self._frames = deque(maxlen=history)  # (sequence, topic, frame)
+        self._next_sequence = 0
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "subscribers": 0, "lagged": 0}
+        self.closed = False
+
+    def publish(self, topic, event: str, data) -> int:
+        """Queues an event for the subscribers of `topic` (and of every topic)."""
+        with self._lock:
+            sequence = self._next_sequence
+            self._next_sequence += 1
+            self._frames.append((sequence, topic, sse_frame(event, data, sequence)))
+            self._stats["published"] += 1
+        self.notifier.notify()
+        return sequence
+
+    def close(self):
+        """Ends every subscription (e.g. to drain a server before it stops)."""
+        self.closed = True
+        self.notifier.notify()
+
+    def cursor(self, last_event_id=None) -> int:
+        """
+        Where a new subscription starts: right after a Last-Event-ID the
+        client sent when reconnecting, else at the next event.
+        """
+        with self._lock:
+            if last_event_id is not None and str(last_event_id).isdigit():
+                after = int(last_event_id) + 1
+                if after <= self._next_sequence:  # Not from before a restart
+                    return after
+            return self._next_sequence
+
+    def read(self, cursor: int, topic=None):
+        """
+        Frames from `cursor` on, for `topic` (None: all topics).
+        Returns (frames, next cursor, lagged).
+        """
+        with self._lock:
+            if not self._frames or cursor >= self._next_sequence:
+                return [], self._next_sequence, False
+            oldest = self._frames[0][0]
+            lagged = cursor < oldest
+            if lagged:
+                self._stats["lagged"] += 1
+            start = max(cursor, oldest) - oldest
+            frames = [frame for _, frame_topic, frame in islice(self._frames, start, None)
+                      if topic is None or frame_topic == topic]
+            return frames, self._next_sequence, lagged
+
+    def subscribe(self, topic=None, cursor=None, snapshot=None):
+        """
+        Generator of the bytes to send to one subscriber, for threaded
+        servers. snapshot: optional function returning a frame of the
+        current state, sent first and again after lagging behind.
+        """
+        cursor = self.cursor() if cursor is None else cursor
+        self._count_subscriber(1)
+        try:
+            if snapshot is not None:
+                yield snapshot()
+            while not self.closed:
+                sequence = self.notifier.sequence
+                frames, cursor, lagged = self.read(cursor, topic)
+                if lagged and snapshot is not None:
+                    frames.append(snapshot())
+                if frames:
+                    yield b"".join(frames)
+                elif not self.notifier.wait(sequence, self.keepalive):
+                    yield KEEPALIVE_FRAME
+        finally:
+            self._count_subscriber(-1)
+
+    async def subscribe_async(self, topic=None, cursor=None, snapshot=None):
+        """
+        Same as subscribe, as an async generator for the ASGI app. snapshot
+        runs in a worker thread, since it usually reads a store.
+        """
+        cursor = self.cursor() if cursor is None else cursor
+        self._count_subscriber(1)
+        try:
+            if snapshot is not None:
+                yield await asyncio.to_thread(snapshot)
+            while not self.closed:
+                sequence = self.notifier.sequence
+                frames, cursor, lagged = self.read(cursor, topic)
+                if lagged and snapshot is not None:
+                    frames.append(await asyncio.to_thread(snapshot))
+                if frames:
+                    yield b"".join(frames)
+                elif not await self.notifier.wait_async(sequence, self.keepalive):
+                    yield KEEPALIVE_FRAME
+        finally:
+            self._count_subscriber(-1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, buffered=len(self._frames))
+
+    def _count_subscriber(self, change):
+        with self._lock:
+            self._stats["subscribers"] += change
@@ -0,0 +1,201 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+class UpstreamUnavailableError(requests.exceptions.RequestException):
+    """
+    Raised instead of calling the upstream API. It is a RequestException,
+    so callers already answer it like any other upstream failure (503).
+    retry_after: seconds until a new call may be allowed.
+    """
+
+    def __init__(self, message, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """The circuit breaker is open: the upstream isn't called at all."""
+
+
+class RateLimitedError(UpstreamUnavailableError):
+    """No rate-limit token would be available within the allowed wait."""
+
+
+def parse_retry_after(value, now: float = None):
+    """
+    Returns the seconds to wait from a Retry-After header (delay in seconds
+    or HTTP date), or None when it is missing or invalid.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+class TokenBucket:
+    """
+    Client-side rate limiter: `rate` calls per second on average, with
+    bursts of up to `burst` calls. A caller that finds the bucket empty
+    reserves the next token and waits for it, unless that would take more
+    than max_wait seconds.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_wait: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"granted": 0, "delayed": 0, "rejected": 0}
+
+    def reserve(self) -> float:
+        """
+        Takes one token and returns the seconds to wait before using it
+        (0 when one was available). Raises RateLimitedError instead when
+        the wait would exceed max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens go below zero for callers already waiting on a reservation
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > self.max_wait:
+                self._stats["rejected"] += 1
+                raise RateLimitedError(
+                    "Too many calls to PokeAPI; rate limit reached.", wait)
+            self._tokens -= 1
+            self._stats["granted"] += 1
+            if wait:
+                self._stats["delayed"] += 1
+            return wait
+
+    def acquire(self):
+        """Blocking form of reserve()."""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(rate=self.rate, burst=self.burst,
+                            tokens=round(max(self._tokens, 0.0), 3))
+        return snapshot
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+    closed: calls go through; failure_threshold consecutive failures open it.
+    open: calls fail fast with CircuitOpenError for reset_timeout seconds,
+    or for as long as the upstream's Retry-After asked.
+    half_open: afterwards, up to half_open_calls trial calls go through;
+    a success closes the circuit again and a failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_calls = 0
+        self._stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def before_call(self):
+        """Raises CircuitOpenError when the upstream must not be called now."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._trial_calls < self.half_open_calls:
+                self._trial_calls += 1
+                return
+            self._stats["rejected"] += 1
+            retry_after = max(self._open_until - now, 0.0)
+        raise CircuitOpenError("PokeAPI is unavailable; circuit breaker is open.",
+                               retry_after)
+
+    def cancel_call(self):
+        """Gives back a trial call that was allowed but never made."""
+        with self._lock:
+            if self._trial_calls:
+                self._trial_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_calls = 0
+
+    def record_failure(self, retry_after: float = None):
+        """
+        Counts a failed call. retry_after (from a Retry-After header) opens
+        the circuit right away for at least that long.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            state = self._current_state(now)
+            if (state == self.HALF_OPEN or retry_after is not None
+                    or self._failures >= self.failure_threshold):
+                self._open(now, max(self.reset_timeout, retry_after or 0.0))
+
+    def reset(self):
+        """Closes the circuit and forgets past failures."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_calls = 0
+            self._open_until = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            snapshot = dict(self._stats)
+            snapshot.update(
+                state=self._current_state(now),
+                consecutive_failures=self._failures,
+                retry_after=round(max(self._open_until - now, 0.0), 3),
+                failure_threshold=self.failure_threshold,
+                reset_timeout=self.reset_timeout,
+            )
+        return snapshot
+
+    def _open(self, now, duration):
+        if self._state != self.OPEN:
+            self._stats["opened"] += 1
+        self._state = self.OPEN
+        self._open_until = now + duration
+        self._trial_calls = 0
+
+    def _current_state(self, now) -> str:
+        if self._state == self.OPEN and now >= self._open_until:
+            self._state = self.HALF_OPEN
+        return self._state
@@ -0,0 +1,146 @@
+import json
+import re
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library is used instead
+    orjson = None
+
+# Name of the encoder in use, reported on /metrics
+BACKEND = "orjson" if orjson is not None else "json"
+
+if orjson is not None:
+    # Dates go to `default` as with the standard library (Flask's hook
+    # writes them as HTTP dates)
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    _SORTED_OPTIONS = _OPTIONS | orjson.OPT_SORT_KEYS
+
+_DECODER = json.JSONDecoder()
+# A JSON string, quotes included
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_WHITESPACE = " \t\n\r"
+
+
+def dumps(obj, sort_keys: bool = False, default=None) -> bytes:
+    """Serializes to compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default,
+                                option=_SORTED_OPTIONS if sort_keys else _OPTIONS)
+        except TypeError:
+            pass  # e.g. an integer beyond 64 bits: the standard library copes
+    return json.dumps(obj, sort_keys=sort_keys, default=default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """Parses JSON text or UTF-8 bytes; raises ValueError when it is invalid."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def loads_fields(data, fields, scan_limit: float = 0.25) -> dict:
+    """
+    Parses only the top-level `fields` of a JSON object (missing ones are
+    left out), without building the rest of the document.
+    The object is walked backwards from its end, one candidate key at a
+    time: with string literals stripped, counting brackets tells whether
+    a key is at the top level, and only its value is decoded. That is
+    cheap when the fields are near the end, as in PokeAPI documents
+    (their keys are sorted); past scan_limit of the document it falls
+    back to parsing everything.
+    """
+    text = data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data
+    found = _scan_fields(text, fields, len(text) * scan_limit)
+    if found is None:
+        document = loads(data)
+        if not isinstance(document, dict):
+            return {}
+        return {field: document[field] for field in fields if field in document}
+    return found
+
+
+def _scan_fields(text, fields, scan_limit):
+    """Returns {field: value}, or None to fall back to a full parse."""
+    if not text.lstrip(_WHITESPACE).startswith("{"):
+        return None
+    patterns = {field: f'"{field}"' for field in fields}
+    candidates = {field: text.rfind(pattern) for field, pattern in patterns.items()}
+    found = {}
+    # Containers open at `scanned_from`; every string between it and the
+    # end of the text is whole, since it only stops on the start of a key
+    depth = 0
+    scanned_from = len(text)
+    while len(found) < len(fields):
+        field = max((f for f in fields if f not in found), key=candidates.get)
+        position = candidates[field]
+        if position < 0:
+            break
+        if len(text) - position > scan_limit:
+            return None
+        candidates[field] = text.rfind(patterns[field], 0, position)
+        value_start = _key_value_start(text, position, len(patterns[field]))
+        if value_start is None:
+            continue
+        skeleton = _STRING.sub("", text[position:scanned_from])
+        depth += skeleton.count("}") + skeleton.count("]") - \
+            skeleton.count("{") - skeleton.count("[")
+        scanned_from = position
+        if depth == 1:
+            try:
+                found[field], _ = _DECODER.raw_decode(text, value_start)
+            except ValueError:
+                return None
+    return found
+
+
+def _key_value_start(text, position, length):
+    """
+    Where the value starts when the quoted name at `position` is an object
+    key, else None. In valid JSON a quote preceded by "{" or "," opens a
+    string, and a string followed by ":" is a key.
+    """
+    before = position - 1
+    while before >= 0 and text[before] in _WHITESPACE:
+        before -= 1
+    if before < 0 or text[before] not in "{,":
+        return None
+    after = position + length
+    while after < len(text) and text[after] in _WHITESPACE:
+        after += 1
+    if after == len(text) or text[after] != ":":
+        return None
+    after += 1
+    while after < len(text) and text[after] in _WHITESPACE:
+        after += 1
+    return after
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider built on dumps/loads above, so jsonify and
+    request.get_json use orjson when it is installed. Values orjson can't
+    encode go through Flask's usual hook (dates, UUIDs, dataclasses);
+    calls with json.dumps options and debug-mode indenting are left to
+    the default provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.sort_keys, self.default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            dumps(obj, self.sort_keys, self.default) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+from itertools import combinations
+
+from battle_logic import BattleLogic, BattleResult
+from pokemon_data_factory import Pokemon
+
+# Index layout (little endian):
+#   header  magic, version, rule fingerprint (sha256), type id count
+#   scores  combo_count * combo_count pairs of u8 (p1_score, p2_score),
+#           row = Pokémon 1's type combination, column = Pokémon 2's
+HEADER = struct.Struct("<4sH32sH")
+MAGIC = b"PKMI"
+VERSION = 1
+
+
+def rules_fingerprint(battle_system: BattleLogic) -> bytes:
+    """Hash of the compiled rule set; an index is only valid for the same hash."""
+    compiled = [sorted(battle_system.type_index.items()), battle_system.strength]
+    return hashlib.sha256(json.dumps(compiled).encode("utf-8")).digest()
+
+
+def type_combinations(type_count: int) -> list:
+    """Every single type and every unordered pair of two different types."""
+    type_ids = range(type_count)
+    return [(t,) for t in type_ids] + list(combinations(type_ids, 2))
+
+
+class MatchupIndex:
+    """
+    Precomputed scores for every pair of type combinations under one rule set.
+    A battle only depends on the two type lists, so this covers every species
+    pairing; answering a matchup is two dict lookups and one array read.
+    """
+
+    def __init__(self, fingerprint: bytes, type_count: int, scores: bytes):
+        """
+        type_count: number of compiled type ids, the unknown-type id included.
+        scores: combo_count * combo_count * 2 bytes, as laid out on disk.
+        """
+        self.fingerprint = fingerprint
+        self.type_count = type_count
+        self.scores = scores
+        self.combo_ids = {combo: i for i, combo in
+                          enumerate(type_combinations(type_count))}
+        self.combo_count = len(self.combo_ids)
+
+    @classmethod
+    def build(cls, battle_system: BattleLogic):
+        """
+        Scores all combination pairs with bitwise operations: a combination
+        is a bitmask of its types, so each side's score is a popcount.
+        """
+        strength = battle_system.strength
+        type_count = len(strength)
+        # weak_to[d]: mask of the types that are strong against type d
+        weak_to = [0] * type_count
+        for attacking_id, mask in enumerate(strength):
+            for defending_id in range(type_count):
+                if mask >> defending_id & 1:
+                    weak_to[defending_id] |= 1 << attacking_id
+
+        combos = type_combinations(type_count)
+        masks = [sum(1 << t for t in combo) for combo in combos]
+        scores = bytearray(len(combos) * len(combos) * 2)
+        position = 0
+        for p1_combo, p1_mask in zip(combos, masks):
+            for p2_combo, p2_mask in zip(combos, masks):
+                # Pokémon 1 scores for every (attacker, defender) it beats...
+                p1_score = sum(bin(strength[t] & p2_mask).count("1") for t in p1_combo)
+                # ...and Pokémon 2 only where Pokémon 1 didn't already score
+                p2_score = sum(bin(strength[t] & p1_mask & ~weak_to[t]).count("1")
+                               for t in p2_combo)
+                scores[position] = p1_score
+                scores[position + 1] = p2_score
+                position += 2
+        return cls(rules_fingerprint(battle_system), type_count, bytes(scores))
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, fingerprint, type_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} matchup index.")
+        return cls(fingerprint, type_count, data[HEADER.size:])
+
+    @classmethod
+    def load_or_build(cls, battle_system: BattleLogic, path: str = None):
+        """
+        Loads the index saved at path if it was built for this rule set;
+        otherwise builds it again (and saves it when a path is given).
+        """
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+            except (ValueError, struct.error):
+                index = None
+            if index is not None and index.matches(battle_system):
+                return index
+
+        index = cls.build(battle_system)
+        if path:
+            index.save(path)
+        return index
+
+    def save(self, path: str):
+        # Written next to the target first so readers never see half a file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.fingerprint, self.type_count))
+            f.write(self.scores)
+        os.replace(temp_path, path)
+
+    def matches(self, battle_system: BattleLogic) -> bool:
+        return self.fingerprint == rules_fingerprint(battle_system)
+
+    def combo_id(self, type_ids):
+        """
+        Returns the combination id of a tuple of compiled type ids, or None
+        when it isn't one type or two different types.
+        """
+        key = tuple(sorted(type_ids))
+        unknown = self.type_count - 1
+        if key == (unknown, unknown):
+            # Unknown types never score nor concede, so two count as one
+            key = (unknown,)
+        return self.combo_ids.get(key)
+
+    def lookup_ids(self, p1_ids, p2_ids):
+        """
+        Returns (p1_score, p2_score) for two tuples of compiled type ids, or
+        None when a side has no precomputed combination.
+        """
+        p1_combo = self.combo_id(p1_ids)
+        p2_combo = self.combo_id(p2_ids)
+        if p1_combo is None or p2_combo is None:
+            return None
+        position = (p1_combo * self.combo_count + p2_combo) * 2
+        return self.scores[position], self.scores[position + 1]
+
+    def evaluate(self, battle_system: BattleLogic, pokemon1: Pokemon,
+                 pokemon2: Pokemon) -> BattleResult:
+        """
+        Same as battle_system.evaluate, reading the scores from the index.
+        """
+        scores = self.lookup_ids(battle_system.record_type_ids(pokemon1),
+                                 battle_system.record_type_ids(pokemon2))
+        if scores is None:
+            return battle_system.evaluate(pokemon1, pokemon2)
+        return BattleResult(battle_system, pokemon1, pokemon2, *scores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Precompute every type matchup for the standard rule set.")
+    parser.add_argument("output", help="index file to write")
+    args = parser.parse_args(argv)
+
+    index = MatchupIndex.build(BattleLogic())
+    index.save(args.output)
+    print(f"Wrote {index.combo_count ** 2} matchups to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
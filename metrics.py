@@ -0,0 +1,235 @@
+import bisect
+import cProfile
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. requests in flight)."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    """Latency distribution with fixed buckets, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if position < len(self.buckets):
+                series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager observing the duration of its block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(_label_key(labels))
+        return series[-1] if series else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            series_items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", repr(bound)),), cumulative))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]))
+            samples.append((f"{self.name}_sum", key, series[-2]))
+            samples.append((f"{self.name}_count", key, series[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Holds the metrics and renders them in the Prometheus text format.
+    Collectors are callables run at scrape time, for values that already
+    live elsewhere (e.g. the cache's own counters); they return a list of
+    (name, kind, help, {label tuple: value}).
+    """
+
+    def __init__(self, prefix: str = "pokemon_battle_"):
+        self.prefix = prefix
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text) -> Counter:
+        return self._add(Counter(self.prefix + name, help_text))
+
+    def gauge(self, name, help_text) -> Gauge:
+        return self._add(Gauge(self.prefix + name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help_text, buckets))
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for collector in self._collectors:
+            for name, kind, help_text, values in collector():
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in values.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class RequestProfiler:
+    """
+    Runtime-switchable cProfile hook for a window of requests.
+    While a window is open, a sample of the requests (sample_rate) is
+    profiled, one at a time, and their per-function timings are merged.
+    When it is closed nothing is profiled, so it can stay wired in.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()  # one profiled request at a time
+        self._remaining = 0
+        self._sample_rate = 1.0
+        self._stats = None
+        self.profiled_requests = 0
+
+    @property
+    def active(self) -> bool:
+        return self._remaining > 0
+
+    def start(self, requests: int, sample_rate: float = 1.0):
+        """Profiles the next `requests` sampled requests, dropping older results."""
+        with self._lock:
+            self._remaining = requests
+            self._sample_rate = sample_rate
+            self._stats = None
+            self.profiled_requests = 0
+
+    def begin_request(self):
+        """Returns a running profile for this request, or None."""
+        if self._remaining <= 0 or random.random() >= self._sample_rate:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end_request(self, profile):
+        if profile is None:
+            return
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            if self._remaining <= 0:
+                return
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self._remaining -= 1
+            self.profiled_requests += 1
+
+    def report(self, limit: int = 30) -> dict:
+        """Top functions by cumulative time over the profiled requests."""
+        with self._lock:
+            functions = []
+            if self._stats is not None:
+                entries = self._stats.stats.items()
+                ranked = sorted(entries, key=lambda item: item[1][3], reverse=True)
+                for (file_name, line, function), (_, calls, total, cumulative, _) in ranked[:limit]:
+                    functions.append({
+                        "function": f"{file_name}:{line}({function})",
+                        "calls": calls,
+                        "total_seconds": total,
+                        "cumulative_seconds": cumulative,
+                    })
+            return {
+                "active": self.active,
+                "remaining_requests": self._remaining,
+                "profiled_requests": self.profiled_requests,
+                "functions": functions,
+            }
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import json_codec
+from circuit_breaker import parse_retry_after
+
+try:
+    import httpx
+except ImportError:  # Optional: only needed for the native async client
+    httpx = None
+
+
+class PokemonNotFound(ValueError):
+    """PokeAPI answered 404: the only failure the cache keeps as a negative entry."""
+
+
+class PokeAPIClient:
+    """
+    HTTP client for PokeAPI built on one pooled requests.Session.
+    Connections are kept alive between calls, every request has a timeout,
+    and transient failures (connection errors, 429 and 5xx) are retried a
+    bounded number of times with exponential backoff.
+    An optional rate limiter (TokenBucket) and circuit breaker
+    (CircuitBreaker) keep a struggling upstream from being flooded.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url: str, timeout: float = 5.0,
+                 connect_timeout: float = 3.05, retries: int = 2,
+                 backoff_factor: float = 0.2, pool_size: int = 20,
+                 rate_limiter=None, circuit_breaker=None):
+        """
+        timeout: seconds to wait for the response once connected.
+        connect_timeout: seconds to wait for the TCP/TLS handshake.
+        retries: extra attempts after the first one fails.
+        pool_size: keep-alive connections kept open to the upstream host.
+        rate_limiter: optional TokenBucket taken before every call.
+        circuit_breaker: optional CircuitBreaker. With one, 429 and
+        Retry-After aren't waited out inside the call (tying up the worker)
+        but open the circuit for the requested time instead.
+        """
+        self.base_url = base_url
+        self.timeout = (connect_timeout, timeout)
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.retry_statuses = self.RETRY_STATUSES
+        if circuit_breaker is not None:
+            self.retry_statuses = tuple(s for s in self.RETRY_STATUSES if s != 429)
+        self.session = requests.Session()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=circuit_breaker is None,
+            # Hands the last response back so raise_for_status reports it
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0}
+        self._status_codes = {}
+
+    def fetch_pokemon_json(self, pokemon_id, fields=None):
+        """
+        Make the API call to PokeAPI and return JSON data.
+        fields: top-level keys to parse (the rest of the document is
+        skipped, see json_codec.loads_fields); None parses everything.
+        """
+        url = f"{self.base_url}{pokemon_id}/"
+        wait = self.admit()
+        if wait:
+            time.sleep(wait)
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            self.record(error=True)
+            raise
+        retries = getattr(response.raw, "retries", None)
+        self.record(response.status_code,
+                    len(retries.history) if retries is not None else 0,
+                    retry_after=response.headers.get("Retry-After"))
+
+        if response.status_code == 200:
+            return parse_json(response.content, fields)
+        elif response.status_code == 404:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        else:
+            response.raise_for_status()  # Raise an error for other bad responses
+
+    def admit(self) -> float:
+        """
+        Checks the circuit breaker and takes a rate-limit token before a
+        call. Returns the seconds to wait before making it; raises an
+        UpstreamUnavailableError when the call must not be made.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call()
+        if self.rate_limiter is None:
+            return 0.0
+        try:
+            return self.rate_limiter.reserve()
+        except requests.exceptions.RequestException:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.cancel_call()
+            raise
+
+    def record(self, status_code: int = None, retries: int = 0,
+               error: bool = False, retry_after: str = None):
+        """
+        Counts one upstream call: its final status code, retries or failure,
+        and reports the outcome to the circuit breaker.
+        """
+        if self.circuit_breaker is not None:
+            if error or status_code == 429 or status_code >= 500:
+                self.circuit_breaker.record_failure(parse_retry_after(retry_after))
+            else:
+                self.circuit_breaker.record_success()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["retries"] += retries
+            if error:
+                self._stats["errors"] += 1
+            else:
+                self._status_codes[status_code] = self._status_codes.get(status_code, 0) + 1
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the upstream call counters."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+            snapshot["status_codes"] = dict(self._status_codes)
+        return snapshot
+
+    def close(self):
+        self.session.close()
+
+
+def parse_json(content: bytes, fields=None):
+    """
+    Parses a response body, only its top-level `fields` when given.
+    A truncated or garbled body is an upstream failure (InvalidJSONError, a
+    RequestException), not a ValueError that would read as "not found".
+    """
+    try:
+        if fields is None:
+            document = json_codec.loads(content)
+        else:
+            document = json_codec.loads_fields(content, fields)
+    except ValueError as e:
+        raise requests.exceptions.InvalidJSONError(
+            f"Malformed PokeAPI response: {e}") from e
+    if not isinstance(document, dict) or any(field not in document for field in fields or ()):
+        raise requests.exceptions.InvalidJSONError(
+            "Malformed PokeAPI response: not a Pokémon document.")
+    return document
+
+
+class AsyncPokeAPIClient:
+    """
+    Non-blocking counterpart of PokeAPIClient for the ASGI app.
+    Uses a pooled httpx.AsyncClient when httpx is installed; otherwise each
+    call runs the blocking client in a worker thread so the event loop is
+    never blocked. Failures are raised as requests exceptions, so callers
+    handle both clients the same way.
+    """
+
+    def __init__(self, sync_client: PokeAPIClient, pool_size: int = 100,
+                 transport=None):
+        """
+        sync_client: provides the base URL, timeouts and retry settings,
+        and is used directly when httpx isn't available.
+        transport: optional httpx transport (e.g. httpx.MockTransport in tests).
+        """
+        self.sync_client = sync_client
+        self.pool_size = pool_size
+        self.transport = transport
+        self._client = None
+
+    @property
+    def native(self) -> bool:
+        """True when requests go through httpx instead of worker threads."""
+        return httpx is not None
+
+    async def fetch_pokemon_json(self, pokemon_id, fields=None):
+        """Make the API call to PokeAPI and return JSON data (see PokeAPIClient)."""
+        if not self.native:
+            return await asyncio.to_thread(
+                self.sync_client.fetch_pokemon_json, pokemon_id, fields)
+
+        retry = self.sync_client.session.get_adapter(
+            self.sync_client.base_url).max_retries
+        url = f"{self.sync_client.base_url}{pokemon_id}/"
+        wait = self.sync_client.admit()
+        if wait:
+            await asyncio.sleep(wait)
+        for attempt in range(retry.total + 1):
+            try:
+                response = await self._get_client().get(url)
+            except httpx.HTTPError as e:
+                if attempt == retry.total:
+                    self.sync_client.record(retries=attempt, error=True)
+                    raise requests.exceptions.ConnectionError(str(e)) from e
+            else:
+                final = response.status_code not in self.sync_client.retry_statuses \
+                    or attempt == retry.total
+                if final:
+                    self.sync_client.record(response.status_code, attempt,
+                                            retry_after=response.headers.get("Retry-After"))
+                if response.status_code == 200:
+                    return parse_json(response.content, fields)
+                if response.status_code == 404:
+                    raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+                if final:
+                    raise requests.exceptions.HTTPError(
+                        f"{response.status_code} Error for url: {url}")
+                # Like urllib3: without a breaker, the upstream's Retry-After wins
+                retry_after = None
+                if retry.respect_retry_after_header and \
+                        response.status_code in retry.RETRY_AFTER_STATUS_CODES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    await asyncio.sleep(retry_after)
+                    continue
+            await asyncio.sleep(retry.backoff_factor * (2 ** attempt))
+
+    def _get_client(self):
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            connect_timeout, timeout = self.sync_client.timeout
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
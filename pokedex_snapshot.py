@@ -0,0 +1,170 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+
+from pokemon_data_factory import Pokemon, PokemonFactory, type_id
+
+# Snapshot layout (little endian):
+#   header   magic, version, type_count, record_count, types_size, names_size
+#   types    type_count entries of (u8 length, utf-8 name)
+#   records  record_count fixed-width records sorted by id:
+#            (u32 id, u32 name offset, u16 name length, u8 type 1, u8 type 2)
+#   names    utf-8 names, each distinct name stored once
+HEADER = struct.Struct("<4sHHIII")
+RECORD = struct.Struct("<IIHBB")
+MAGIC = b"PKDX"
+VERSION = 1
+NO_TYPE = 0xFF
+
+
+def build_snapshot(source_dir: str, output_path: str) -> int:
+    """
+    Builds a snapshot from a directory of PokeAPI /pokemon/<id> JSON dumps.
+    Only the id, name and types are kept. Returns the number of records.
+    """
+    type_index = {}
+    name_offsets = {}
+    names = bytearray()
+    records = []
+
+    for file_name in sorted(os.listdir(source_dir)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(source_dir, file_name), encoding="utf-8") as f:
+            raw_data = json.load(f)
+
+        pokemon_data = PokemonFactory.create_data(raw_data)
+        types = pokemon_data.types
+        if len(types) > 2:
+            raise ValueError(f"{file_name}: a Pokémon has at most two types.")
+        type_ids = [type_index.setdefault(t, len(type_index)) for t in types]
+        type_ids += [NO_TYPE] * (2 - len(type_ids))
+
+        name = pokemon_data.name.encode("utf-8")
+        if name not in name_offsets:
+            name_offsets[name] = len(names)
+            names += name
+        records.append((raw_data['id'], name_offsets[name], len(name), *type_ids))
+
+    if len(type_index) >= NO_TYPE:
+        raise ValueError("Too many distinct types for the snapshot format.")
+
+    types_blob = bytearray()
+    for type_name in type_index:
+        encoded = type_name.encode("utf-8")
+        types_blob += bytes([len(encoded)]) + encoded
+
+    records.sort()
+    with open(output_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(type_index), len(records),
+                            len(types_blob), len(names)))
+        f.write(types_blob)
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(names)
+    return len(records)
+
+
+class PokedexSnapshot:
+    """
+    Read-only, memory-mapped view of a snapshot built by build_snapshot.
+    Lookups binary-search the fixed-width records straight from the mapped
+    file: no JSON parsing, no network, and the pages are shared between
+    every process that maps the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, type_count, self.record_count, types_size, _ = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} Pokédex snapshot.")
+
+        # The type table is tiny, so it is decoded once
+        self.types = []
+        offset = HEADER.size
+        for _ in range(type_count):
+            length = self._map[offset]
+            self.types.append(self._map[offset + 1:offset + 1 + length].decode("utf-8"))
+            offset += 1 + length
+        # Snapshot type index -> process-wide record type id
+        self._type_ids = [type_id(type_name) for type_name in self.types]
+        self._records_offset = HEADER.size + types_size
+        self._names_offset = self._records_offset + self.record_count * RECORD.size
+
+    def __len__(self):
+        return self.record_count
+
+    def __contains__(self, pokemon_id):
+        return self._find(pokemon_id) is not None
+
+    def get(self, pokemon_id):
+        """
+        Returns the Pokemon record (as built by PokemonFactory.create_data)
+        or None if the ID isn't in the snapshot.
+        """
+        record = self._find(pokemon_id)
+        if record is None:
+            return None
+        _, name_offset, name_length, type1, type2 = record
+        start = self._names_offset + name_offset
+        name = self._map[start:start + name_length].decode("utf-8")
+        return Pokemon(name, name.capitalize(),
+                       tuple(self._type_ids[t] for t in (type1, type2) if t != NO_TYPE))
+
+    def ids(self):
+        """Yields every Pokémon ID in the snapshot, in ascending order."""
+        for index in range(self.record_count):
+            yield self._record(index)[0]
+
+    def close(self):
+        self._map.close()
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._map, self._records_offset + index * RECORD.size)
+
+    def _find(self, pokemon_id):
+        low, high = 0, self.record_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            record = self._record(middle)
+            if record[0] < pokemon_id:
+                low = middle + 1
+            elif record[0] > pokemon_id:
+                high = middle - 1
+            else:
+                return record
+        return None
+
+
+def open_snapshot(path: str = None):
+    """
+    Returns a PokedexSnapshot for path, or None when no snapshot is configured.
+    A configured path that doesn't exist is an error, not a silent fallback
+    to PokeAPI.
+    """
+    if not path:
+        return None
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Pokédex snapshot {path} (POKEDEX_SNAPSHOT_PATH) not found.")
+    return PokedexSnapshot(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build a compact Pokédex snapshot from PokeAPI JSON dumps.")
+    parser.add_argument("source_dir", help="directory of /pokemon/<id> JSON files")
+    parser.add_argument("output", help="snapshot file to write")
+    args = parser.parse_args(argv)
+
+    count = build_snapshot(args.source_dir, args.output)
+    print(f"Wrote {count} Pokémon to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from pokeapi_client import PokemonNotFound
+from pokemon_data_factory import Pokemon
+
+
+class PokemonCache:
+    """
+    Two-tier cache for the Pokemon records built by PokemonFactory.
+    The first tier is an in-process LRU with size and TTL eviction; the
+    optional second tier is a SQLite file that survives restarts.
+    Pokémon that PokeAPI reports as missing (404) are cached as negative
+    entries, so repeated lookups of a bad ID don't go upstream either.
+    Expired entries can be kept for stale_ttl more seconds and served when
+    reloading them fails (e.g. PokeAPI is down or the circuit is open).
+    """
+
+    # Marks a negative entry (the upstream answered 404 for this ID)
+    NOT_FOUND = object()
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600,
+                 negative_ttl: float = 300, disk_path: str = None,
+                 single_flight=None, stale_ttl: float = 0):
+        """
+        max_size: maximum number of entries kept in memory.
+        ttl / negative_ttl: lifetime in seconds of found / not-found entries.
+        disk_path: SQLite file for the persistent tier (None disables it).
+        single_flight: optional SingleFlight, so concurrent misses for the
+        same ID share one call to the loader.
+        stale_ttl: seconds an expired entry may still be served when the
+        loader fails with anything but PokemonNotFound (0 disables it).
+        """
+        self.single_flight = single_flight
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # pokemon_id -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "stale_hits": 0,
+        }
+        self.disk_path = disk_path
+        self._db = None
+        self.open()
+
+    def get_or_load(self, pokemon_id, loader):
+        """
+        Returns the cached data for pokemon_id, calling loader(pokemon_id)
+        on a miss. A PokemonNotFound raised by the loader is recorded as a
+        negative entry and raised again; other errors are never cached.
+        """
+        value = self.get(pokemon_id)
+        if value is None:
+            if self.single_flight is None:
+                value = self._load_and_store(pokemon_id, loader)
+            else:
+                value = self.single_flight.do(
+                    pokemon_id, lambda: self._load_and_store(pokemon_id, loader))
+
+        if value is self.NOT_FOUND:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        return value
+
+    async def get_or_load_async(self, pokemon_id, loader):
+        """
+        Same as get_or_load, for a loader that is a coroutine function.
+        Only the memory tier is read on the event loop; the SQLite tier is
+        read and written in worker threads.
+        """
+        value = self._memory_get(pokemon_id)
+        if value is None:
+            value = await self._off_loop(self._disk_tier_get, pokemon_id)
+        if value is None:
+            if self.single_flight is None:
+                value = await self._load_and_store_async(pokemon_id, loader)
+            else:
+                value = await self.single_flight.do_async(
+                    pokemon_id, lambda: self._load_and_store_async(pokemon_id, loader))
+
+        if value is self.NOT_FOUND:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        return value
+
+    def _load_and_store(self, pokemon_id, loader):
+        # Another process may have stored it while this one waited for a lock
+        value = self._recheck_disk(pokemon_id)
+        if value is not None:
+            return value
+        try:
+            value = loader(pokemon_id)
+        except PokemonNotFound:
+            value = self.NOT_FOUND
+        except Exception:
+            value = self._get_stale(pokemon_id)
+            if value is None:
+                raise
+            return value
+        self.set(pokemon_id, value)
+        return value
+
+    async def _load_and_store_async(self, pokemon_id, loader):
+        try:
+            value = await loader(pokemon_id)
+        except PokemonNotFound:
+            value = self.NOT_FOUND
+        except Exception:
+            value = await self._off_loop(self._get_stale, pokemon_id)
+            if value is None:
+                raise
+            return value
+        await self._off_loop(self.set, pokemon_id, value)
+        return value
+
+    async def _off_loop(self, function, *args):
+        """Calls function, in a worker thread when there is a SQLite tier."""
+        if self._db is None:
+            return function(*args)
+        return await asyncio.to_thread(function, *args)
+
+    def get(self, pokemon_id):
+        """
+        Returns the cached value (possibly NOT_FOUND) or None on a miss.
+        """
+        value = self._memory_get(pokemon_id)
+        if value is None:
+            value = self._disk_tier_get(pokemon_id)
+        return value
+
+    def _memory_get(self, pokemon_id):
+        """Reads the memory tier; None on a miss (not counted yet)."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(pokemon_id)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(pokemon_id)
+                    self._count_hit(value)
+                    return value
+                if not self._is_stale(expires_at, value, now):
+                    del self._entries[pokemon_id]
+                    self._stats["expirations"] += 1
+            return None
+
+    def _disk_tier_get(self, pokemon_id):
+        """Reads the SQLite tier after a memory miss, counting the miss if it misses too."""
+        with self._lock:
+            value = self._disk_get(pokemon_id, time.time())
+            if value is not None:
+                self._stats["disk_hits"] += 1
+                self._count_hit(value)
+                return value
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, pokemon_id, value):
+        """Stores a value (or NOT_FOUND) in every enabled tier."""
+        ttl = self.negative_ttl if value is self.NOT_FOUND else self.ttl
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._memory_set(pokemon_id, value, expires_at)
+            if self._db is not None:
+                payload = None if value is self.NOT_FOUND else json.dumps(value.to_dict())
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pokemon (id, payload, expires_at) "
+                    "VALUES (?, ?, ?)", (pokemon_id, payload, expires_at))
+                self._db.commit()
+
+    def clear(self):
+        """Empties both tiers and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            for key in self._stats:
+                self._stats[key] = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM pokemon")
+                self._db.commit()
+
+    def open(self):
+        """Connects to the SQLite tier, if any (again, after close())."""
+        with self._lock:
+            if not self.disk_path or self._db is not None:
+                return
+            db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            # WAL: worker processes sharing the file don't block each other's reads
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pokemon ("
+                "id INTEGER PRIMARY KEY, payload TEXT, expires_at REAL)")
+            db.commit()
+            self._db = db
+
+    def close(self):
+        """
+        Closes the SQLite tier (lookups use the memory tier only until
+        open()); call it before fork() and open() again in the child.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the hit/miss counters."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["size"] = len(self._entries)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_ratio"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count_hit(self, value):
+        self._stats["hits"] += 1
+        if value is self.NOT_FOUND:
+            self._stats["negative_hits"] += 1
+
+    def _memory_set(self, pokemon_id, value, expires_at):
+        self._entries[pokemon_id] = (expires_at, value)
+        self._entries.move_to_end(pokemon_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _is_stale(self, expires_at, value, now) -> bool:
+        """True for an expired entry that may still be served as stale data."""
+        return value is not self.NOT_FOUND and expires_at + self.stale_ttl > now
+
+    def _get_stale(self, pokemon_id):
+        """Returns a stale (expired but kept) value, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(pokemon_id)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, payload FROM pokemon WHERE id = ?",
+                    (pokemon_id,)).fetchone()
+                if row is not None and row[1] is not None:
+                    entry = (row[0], Pokemon.from_dict(json.loads(row[1])))
+            if entry is None or not self._is_stale(*entry, now):
+                return None
+            self._stats["stale_hits"] += 1
+            return entry[1]
+
+    def _recheck_disk(self, pokemon_id):
+        if self._db is None:
+            return None
+        with self._lock:
+            return self._disk_get(pokemon_id, time.time())
+
+    def _disk_get(self, pokemon_id, now):
+        """Reads from the SQLite tier, promoting live rows into memory."""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT payload, expires_at FROM pokemon WHERE id = ?",
+            (pokemon_id,)).fetchone()
+        if row is None:
+            return None
+        payload, expires_at = row
+        value = self.NOT_FOUND if payload is None else Pokemon.from_dict(json.loads(payload))
+        if expires_at <= now:
+            if not self._is_stale(expires_at, value, now):
+                self._db.execute("DELETE FROM pokemon WHERE id = ?", (pokemon_id,))
+                self._db.commit()
+            return None
+        self._memory_set(pokemon_id, value, expires_at)
+        return value
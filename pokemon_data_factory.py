@@ -1,10 +1,74 @@
+import sys
+import threading
+from typing import NamedTuple
+
+# Process-wide type table: every type name gets one small id the first time
+# it is seen. Records store ids, so the names live in memory only once.
+TYPE_IDS = {}  # type name -> id
+TYPE_NAMES = []  # id -> interned type name
+TYPE_DISPLAY_NAMES = []  # id -> capitalized type name
+_TYPE_LOCK = threading.Lock()
+
+
+def type_id(type_name: str) -> int:
+    """Returns the id of a type name, assigning the next one if it is new."""
+    found = TYPE_IDS.get(type_name)
+    if found is not None:
+        return found
+    with _TYPE_LOCK:
+        found = TYPE_IDS.get(type_name)
+        if found is None:
+            found = len(TYPE_NAMES)
+            TYPE_NAMES.append(sys.intern(type_name))
+            TYPE_DISPLAY_NAMES.append(type_name.capitalize())
+            TYPE_IDS[TYPE_NAMES[found]] = found
+        return found
+
+
+class Pokemon(NamedTuple):
+    """
+    Immutable simplified Pokémon data: the name, its display form and the
+    ids of its types (see type_id). Tuples are small and hashable, so caches
+    can hold many of them and the battle logic can key on type_ids.
+    """
+
+    name: str
+    display_name: str
+    type_ids: tuple
+
+    @classmethod
+    def create(cls, name, types):
+        """Builds a record from a name and a list of type names."""
+        return cls(name, name.capitalize() if name else name,
+                   tuple(type_id(type_name) for type_name in types))
+
+    @property
+    def types(self) -> tuple:
+        return tuple(TYPE_NAMES[i] for i in self.type_ids)
+
+    @property
+    def type_display_names(self) -> tuple:
+        return tuple(TYPE_DISPLAY_NAMES[i] for i in self.type_ids)
+
+    def to_dict(self) -> dict:
+        """Plain form used in JSON (e.g. the cache's SQLite tier)."""
+        return {'name': self.name, 'types': list(self.types)}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls.create(data.get('name'), data.get('types', []))
+
+
 class PokemonFactory:
     """
     Implements the Factory Method Pattern.
-    Its sole responsibility is to construct and return a simplified dictionary
-    of Pokémon data (applies the SRP).
+    Its sole responsibility is to construct and return a simplified
+    Pokémon record (applies the SRP).
     """
 
+    # The only top-level keys of a PokeAPI document create_data reads
+    FIELDS = ("name", "types")
+
     @staticmethod
     def extract_types(pokemon_data: dict) -> list:
         """
@@ -18,7 +82,7 @@ class PokemonFactory:
         return types_list
 
     @classmethod
-    def create_data(cls, pokemon_data: dict) -> dict:
+    def create_data(cls, pokemon_data: dict) -> Pokemon:
         """
         Factory method that creates and returns the simplified data object.
         """
@@ -26,8 +90,5 @@ class PokemonFactory:
         types = cls.extract_types(pokemon_data)
         name = pokemon_data.get('name')
 
-        # Returns a simplified dictionary
-        return {
-            'name': name,
-            'types': types
-        }
+        # Returns an immutable record
+        return Pokemon.create(name, types)
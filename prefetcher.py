@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import CircuitOpenError, UpstreamUnavailableError
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: flushes aren't locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def parse_id_list(value: str) -> list:
+    """Parses "1-151,250,380-381" into a list of IDs."""
+    ids = []
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            ids.extend(range(int(first), int(last) + 1))
+        else:
+            ids.append(int(part))
+    return ids
+
+
+class AccessLog:
+    """
+    Counts lookups per Pokémon ID and persists the totals to a JSON file,
+    so the next start knows which Pokémon are requested the most.
+    Counts are kept in memory and merged into the file by flush(), which
+    a daemon thread calls every flush_interval seconds. Merges hold a lock
+    file, so worker processes can share one log without losing counts.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 60.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._stop = None
+
+    def record(self, pokemon_id):
+        with self._lock:
+            self._pending[pokemon_id] += 1
+
+    def counts(self) -> Counter:
+        """Persisted counts plus the ones not flushed yet."""
+        counts = self._read()
+        with self._lock:
+            counts.update(self._pending)
+        return counts
+
+    def top(self, limit: int) -> list:
+        """The `limit` most requested IDs, most requested first."""
+        return [pokemon_id for pokemon_id, _ in self.counts().most_common(limit)]
+
+    def flush(self):
+        """Merges the pending counts into the file (written atomically)."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        with open(f"{self.path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            counts = self._read()
+            counts.update(pending)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({str(k): v for k, v in counts.items()}, f)
+            os.replace(temp_path, self.path)
+
+    def start_flushing(self):
+        """Flushes every flush_interval seconds in a daemon thread."""
+        if self._stop is not None:
+            return
+        self._stop = threading.Event()
+
+        def run():
+            while not self._stop.wait(self.flush_interval):
+                try:
+                    self.flush()
+                except OSError:
+                    logger.exception("Could not write %s", self.path)
+
+        threading.Thread(target=run, name="access-log-flush", daemon=True).start()
+
+    def stop_flushing(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        self.flush()
+
+    def _read(self) -> Counter:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return Counter({int(k): v for k, v in json.load(f).items()})
+        except FileNotFoundError:
+            return Counter()
+        except (OSError, ValueError):
+            logger.exception("Ignoring unreadable access log %s", self.path)
+            return Counter()
+
+
+class Prefetcher:
+    """
+    Loads a list of Pokémon into the cache before the instance takes
+    traffic, with at most `concurrency` lookups in flight.
+    Rate-limited lookups wait and try again; when the circuit breaker is
+    open the rest of the list is skipped, and after `timeout` seconds the
+    warm-up is reported as finished whatever is left, so a PokeAPI outage
+    can't keep the instance out of rotation.
+    """
+
+    def __init__(self, lookup, pokemon_ids, concurrency: int = 8,
+                 timeout: float = 120.0):
+        """lookup: function pokemon_id -> data that fills the cache (e.g. get_pokemon_data)."""
+        self.lookup = lookup
+        self.pokemon_ids = list(dict.fromkeys(pokemon_ids))
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._counts = {"loaded": 0, "not_found": 0, "failed": 0, "skipped": 0}
+        self._started_at = None
+        self._finished_at = None
+        self._abort = threading.Event()
+        self._timer = None
+        self._thread = None
+        self._finish_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.done.is_set()
+
+    def start(self):
+        """Runs the warm-up in a background thread; returns immediately."""
+        self._started_at = time.time()
+        if not self.pokemon_ids:
+            self._finish()
+            return self
+        self._timer = threading.Timer(self.timeout, self._finish)
+        self._timer.daemon = True
+        self._timer.start()
+        self._thread = threading.Thread(target=self.run, name="cache-warmup", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> bool:
+        """
+        Skips the lookups not started yet and waits up to `timeout` seconds
+        for the ones in flight. Returns False if they are still running.
+        """
+        self._abort.set()
+        self._finish()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def run(self):
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency,
+                                    thread_name_prefix="cache-warmup") as executor:
+                for _ in executor.map(self._load, self.pokemon_ids):
+                    pass
+        finally:
+            self._finish()
+
+    def status(self) -> dict:
+        with self._lock:
+            status = dict(self._counts)
+        status.update(
+            ready=self.ready,
+            total=len(self.pokemon_ids),
+            started_at=self._started_at,
+            finished_at=self._finished_at,
+        )
+        return status
+
+    def _load(self, pokemon_id):
+        outcome = "loaded"
+        while True:
+            if self._abort.is_set() or self.ready:
+                outcome = "skipped"
+                break
+            try:
+                self.lookup(pokemon_id)
+            except ValueError:
+                outcome = "not_found"
+            except CircuitOpenError:
+                logger.warning("PokeAPI circuit is open; skipping the rest of the warm-up")
+                self._abort.set()
+                outcome = "skipped"
+            except UpstreamUnavailableError as e:
+                # Rate limited: wait for a token rather than fail
+                time.sleep(e.retry_after or 0.1)
+                continue
+            except Exception:
+                logger.exception("Warm-up lookup of %s failed", pokemon_id)
+                outcome = "failed"
+            break
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def _finish(self):
+        # Called by the warm-up thread or by the timeout, whichever is first
+        with self._finish_lock:
+            if self.done.is_set():
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._finished_at = time.time()
+            self.done.set()
+        logger.info("Cache warm-up finished: %s", self.status())
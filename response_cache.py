@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def make_etag(key: str, version) -> str:
+    return f'"{key}-{version}"'
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Whether an If-None-Match header value lists the ETag (or is *)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in ("*", etag):
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Serialized bodies of read endpoints, so polling a resource that didn't
+    change doesn't serialize it again. Each entry is tagged with the
+    version of the state it was built from; a request that sees a newer
+    version builds a fresh body, so writers never have to invalidate
+    anything (and it stays correct when another process did the write).
+    Least recently used resources are dropped past max_entries.
+    """
+
+    def __init__(self, serialize, max_entries: int = 1024):
+        """serialize: function payload -> bytes used for the bodies."""
+        self.serialize = serialize
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> CachedResponse
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str, version, load) -> CachedResponse:
+        """
+        Returns the response of `key` built at `version`; on a miss calls
+        load() -> (payload, version) and caches what it returns.
+        """
+        etag = make_etag(key, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.etag == etag:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry
+            self._stats["misses"] += 1
+
+        payload, version = load()
+        entry = CachedResponse(make_etag(key, version), self.serialize(payload))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ChangeNotifier:
+    """
+    Lets threads and coroutines sleep until the next change. Writers call
+    notify(); a waiter reads `sequence`, checks the state, then waits for
+    the sequence to move on, so a change between the check and the wait
+    isn't missed. All coroutines of an event loop share one future, so an
+    idle waiter costs next to nothing and notify() wakes each loop once.
+    """
+
+    def __init__(self):
+        self.sequence = 0
+        self._condition = threading.Condition()
+        self._loop_futures = {}  # event loop -> future set by the next notify()
+
+    def notify(self):
+        with self._condition:
+            self.sequence += 1
+            self._condition.notify_all()
+            loop_futures, self._loop_futures = self._loop_futures, {}
+        for loop, future in loop_futures.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # That event loop is closed
+
+    def wait(self, sequence: int, timeout: float) -> bool:
+        """Blocks until the sequence differs from `sequence`; False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.sequence != sequence, timeout)
+
+    async def wait_async(self, sequence: int, timeout: float) -> bool:
+        """Same as wait, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if self.sequence != sequence:
+                return True
+            future = self._loop_futures.get(loop)
+            if future is None:
+                future = self._loop_futures[loop] = loop.create_future()
+        # asyncio.wait doesn't cancel the shared future on a timeout
+        done, _ = await asyncio.wait((future,), timeout=timeout)
+        return bool(done)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
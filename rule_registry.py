@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+
+from battle_logic import BattleLogic
+from matchup_index import MatchupIndex
+from type_rules import FileTypeRule, TypeAdvantageRule
+
+logger = logging.getLogger(__name__)
+
+RULE_FILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class RuleSet:
+    """
+    One named rule set, compiled once: its BattleLogic and MatchupIndex.
+    Never modified after construction; a reload builds a new RuleSet.
+    """
+
+    __slots__ = ("name", "battle_system", "matchup_index", "source", "mtime",
+                 "extends")
+
+    def __init__(self, name, battle_system: BattleLogic,
+                 matchup_index: MatchupIndex, source: str = None,
+                 mtime: float = None, extends: str = None):
+        self.name = name
+        self.battle_system = battle_system
+        self.matchup_index = matchup_index
+        self.source = source  # rule file path (None for built-in rules)
+        self.mtime = mtime
+        self.extends = extends  # rule set this one was built on, if any
+
+    @property
+    def fingerprint(self) -> str:
+        return self.matchup_index.fingerprint.hex()
+
+
+class RuleRegistry:
+    """
+    Precompiled rule sets by name, for per-request rule selection.
+    Rule sets come from code (register) or from a directory of JSON/YAML
+    files (load_directory). Changed files are recompiled off the request
+    path and swapped in atomically: readers always see a complete mapping.
+    """
+
+    def __init__(self, default: str = "standard", index_dir: str = None):
+        """
+        default: name of the rule set used when a request doesn't pick one.
+        index_dir: where to keep each rule set's matchup index on disk.
+        """
+        self.default = default
+        self.index_dir = index_dir
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self.rules_dir = None
+        self._rule_sets = {}
+        self._builtin = set()
+        self._lock = threading.Lock()  # serializes writers only
+        self._watcher = None
+
+    def register(self, name, rule_set: TypeAdvantageRule):
+        """Compiles and adds a built-in rule set."""
+        compiled = self._compile(name, rule_set)
+        with self._lock:
+            self._builtin.add(name)
+            self._swap({**self._rule_sets, name: compiled})
+        return compiled
+
+    def get(self, name=None) -> RuleSet:
+        """Returns the rule set called name (default one when None), or None."""
+        return self._rule_sets.get(self.default if name is None else name)
+
+    def names(self) -> list:
+        return sorted(self._rule_sets)
+
+    def load_directory(self, path: str):
+        """Loads every rule file in path; see reload()."""
+        self.rules_dir = path
+        self.reload()
+
+    def reload(self) -> list:
+        """
+        Recompiles the rule files that were added or changed since the last
+        call, and the files that extend them, and drops the ones that were
+        removed. A file that fails to load keeps its previous version.
+        Returns the names that changed.
+        """
+        if self.rules_dir is None:
+            return []
+        with self._lock:
+            rule_sets = dict(self._rule_sets)
+            files = {}
+            for file_name in sorted(os.listdir(self.rules_dir)):
+                name, extension = os.path.splitext(file_name)
+                if extension not in RULE_FILE_EXTENSIONS or name in self._builtin:
+                    continue
+                path = os.path.join(self.rules_dir, file_name)
+                files[name] = (path, os.path.getmtime(path))
+
+            changed = []
+            for name in list(rule_sets):
+                if name not in files and name not in self._builtin:
+                    del rule_sets[name]
+                    changed.append(name)
+
+            stale = {name for name, (path, mtime) in files.items()
+                     if (name not in rule_sets or rule_sets[name].source != path
+                         or rule_sets[name].mtime != mtime)}
+            # A file that extends a stale or removed rule set inherited its
+            # old rules, so it's recompiled too (and so on down the chain)
+            dependents = set(changed) | stale
+            while dependents:
+                dependents = {name for name in files
+                              if name not in stale and name in rule_sets
+                              and rule_sets[name].extends in dependents}
+                stale |= dependents
+
+            pending = sorted(stale)
+            while pending:
+                # Bases first, so their dependents inherit the new rules
+                ready = [name for name in pending if name not in rule_sets
+                         or rule_sets[name].extends not in pending]
+                name = (ready or pending)[0]
+                pending.remove(name)
+                path, mtime = files[name]
+                rule = FileTypeRule(
+                    path, {n: r.battle_system.rules for n, r in rule_sets.items()})
+                try:
+                    compiled = self._compile(name, rule, path, mtime)
+                except Exception:
+                    logger.exception("Could not load rule set %s", path)
+                    continue
+                compiled.extends = rule.extends
+                rule_sets[name] = compiled
+                changed.append(name)
+
+            if changed:
+                self._swap(rule_sets)
+                logger.info("Rule sets reloaded: %s", ", ".join(changed))
+            return changed
+
+    def start_watching(self, interval: float = 2.0):
+        """Polls the rules directory in a daemon thread and reloads on change."""
+        if self._watcher is not None:
+            return
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except OSError:
+                    logger.exception("Could not scan %s", self.rules_dir)
+
+        self._watcher = (stop, threading.Thread(
+            target=watch, name="rule-registry-watcher", daemon=True))
+        self._watcher[1].start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher[0].set()
+            self._watcher = None
+
+    def _swap(self, rule_sets):
+        # Rebinding one attribute is atomic, so readers need no lock
+        self._rule_sets = rule_sets
+
+    def _compile(self, name, rule_set, source=None, mtime=None) -> RuleSet:
+        battle_system = BattleLogic(rule_set=rule_set)
+        index_path = None
+        if self.index_dir:
+            index_path = os.path.join(self.index_dir, f"{name}.matchups")
+        matchup_index = MatchupIndex.load_or_build(battle_system, index_path)
+        return RuleSet(name, battle_system, matchup_index, source, mtime)
@@ -0,0 +1,253 @@
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+
+
+class ScoreboardStore:
+    """
+    Abstract base class for scoreboard backends.
+    Every game has its own scoreboard, keyed by a game ID, and scores are
+    only changed through atomic increments.
+    (OCP: new backends extend this class, the endpoints don't change)
+    """
+
+    def create_game(self, player1_name, player2_name) -> str:
+        """Starts a 0-0 scoreboard for both players and returns its game ID."""
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def get(self, game_id) -> dict:
+        """Returns a copy of the game's scoreboard, or None if it doesn't exist."""
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def add_scores(self, game_id, player1_points, player2_points) -> dict:
+        """
+        Atomically adds points to both players and returns the updated
+        scoreboard (None if the game doesn't exist).
+        """
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def get_versioned(self, game_id):
+        """
+        Returns (scoreboard, version) read together, or (None, None) if the
+        game doesn't exist. The version starts at 0 and goes up every time
+        the scores change, so (game_id, version) identifies a scoreboard.
+        """
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def version(self, game_id):
+        """Returns the game's current version, or None if it doesn't exist."""
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def latest_game_id(self):
+        """Returns the ID of the most recently started game, or None."""
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def reset(self):
+        """Removes every game."""
+        raise NotImplementedError(
+            "Subclasses must implement this method.")
+
+    def close(self):
+        """
+        Releases the backend's resources; it reconnects when used again.
+        Call it before fork() so a worker doesn't reuse the parent's handles.
+        """
+
+    def record_win(self, game_id, player: int) -> dict:
+        """Gives one point to player 1 or 2 and returns the updated scoreboard."""
+        if player == 1:
+            return self.add_scores(game_id, 1, 0)
+        return self.add_scores(game_id, 0, 1)
+
+    @staticmethod
+    def new_game_id() -> str:
+        return uuid.uuid4().hex
+
+
+class _Game:
+    __slots__ = ("lock", "scoreboard", "version")
+
+    def __init__(self, scoreboard):
+        self.lock = threading.Lock()
+        self.scoreboard = scoreboard
+        self.version = 0
+
+
+class InMemoryScoreboardStore(ScoreboardStore):
+    """
+    Keeps the games in process memory.
+    Each game has its own lock, so battles of different games never wait
+    on each other; the store-wide lock is only taken to add or find a game.
+    The oldest games are dropped once max_games is reached.
+    """
+
+    def __init__(self, max_games: int = 10000):
+        self.max_games = max_games
+        self._games = OrderedDict()  # game_id -> _Game, oldest first
+        self._lock = threading.Lock()
+
+    def create_game(self, player1_name, player2_name) -> str:
+        game_id = self.new_game_id()
+        game = _Game({
+            "player1_name": player1_name,
+            "player2_name": player2_name,
+            "player1_score": 0,
+            "player2_score": 0
+        })
+        with self._lock:
+            self._games[game_id] = game
+            while len(self._games) > self.max_games:
+                self._games.popitem(last=False)
+        return game_id
+
+    def get(self, game_id) -> dict:
+        game = self._games.get(game_id)
+        if game is None:
+            return None
+        with game.lock:
+            return dict(game.scoreboard)
+
+    def add_scores(self, game_id, player1_points, player2_points) -> dict:
+        game = self._games.get(game_id)
+        if game is None:
+            return None
+        with game.lock:
+            if player1_points or player2_points:
+                game.scoreboard["player1_score"] += player1_points
+                game.scoreboard["player2_score"] += player2_points
+                game.version += 1
+            return dict(game.scoreboard)
+
+    def get_versioned(self, game_id):
+        game = self._games.get(game_id)
+        if game is None:
+            return None, None
+        with game.lock:
+            return dict(game.scoreboard), game.version
+
+    def version(self, game_id):
+        game = self._games.get(game_id)
+        return None if game is None else game.version
+
+    def latest_game_id(self):
+        with self._lock:
+            return next(reversed(self._games), None)
+
+    def reset(self):
+        with self._lock:
+            self._games.clear()
+
+
+class SQLiteScoreboardStore(ScoreboardStore):
+    """
+    Keeps the games in a local SQLite database in WAL mode, so several
+    worker processes on the same machine share one set of scoreboards.
+    Each thread uses its own connection; increments are single UPDATE
+    statements, which SQLite applies atomically.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        db = self._connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "id TEXT UNIQUE NOT NULL, "
+            "player1_name TEXT, player2_name TEXT, "
+            "player1_score INTEGER NOT NULL DEFAULT 0, "
+            "player2_score INTEGER NOT NULL DEFAULT 0, "
+            "version INTEGER NOT NULL DEFAULT 0)")
+        columns = [row[1] for row in db.execute("PRAGMA table_info(games)")]
+        if "version" not in columns:
+            # Database created before scoreboards had versions
+            db.execute("ALTER TABLE games ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit mode: every statement is its own transaction
+            db = sqlite3.connect(self.path, timeout=self.timeout,
+                                 isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def create_game(self, player1_name, player2_name) -> str:
+        game_id = self.new_game_id()
+        self._connection().execute(
+            "INSERT INTO games (id, player1_name, player2_name) VALUES (?, ?, ?)",
+            (game_id, player1_name, player2_name))
+        return game_id
+
+    def get(self, game_id) -> dict:
+        row = self._connection().execute(
+            "SELECT player1_name, player2_name, player1_score, player2_score "
+            "FROM games WHERE id = ?", (game_id,)).fetchone()
+        return self._to_scoreboard(row)
+
+    def add_scores(self, game_id, player1_points, player2_points) -> dict:
+        if not player1_points and not player2_points:
+            return self.get(game_id)
+        row = self._connection().execute(
+            "UPDATE games SET player1_score = player1_score + ?, "
+            "player2_score = player2_score + ?, version = version + 1 WHERE id = ? "
+            "RETURNING player1_name, player2_name, player1_score, player2_score",
+            (player1_points, player2_points, game_id)).fetchone()
+        return self._to_scoreboard(row)
+
+    def get_versioned(self, game_id):
+        row = self._connection().execute(
+            "SELECT player1_name, player2_name, player1_score, player2_score, version "
+            "FROM games WHERE id = ?", (game_id,)).fetchone()
+        if row is None:
+            return None, None
+        return self._to_scoreboard(row), row[4]
+
+    def version(self, game_id):
+        row = self._connection().execute(
+            "SELECT version FROM games WHERE id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def latest_game_id(self):
+        row = self._connection().execute(
+            "SELECT id FROM games ORDER BY seq DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def reset(self):
+        self._connection().execute("DELETE FROM games")
+
+    def close(self):
+        # Only this thread's connection can be closed; the others are
+        # dropped, and every thread reconnects on its next call
+        db = getattr(self._local, "db", None)
+        self._local = threading.local()
+        if db is not None:
+            db.close()
+
+    @staticmethod
+    def _to_scoreboard(row):
+        if row is None:
+            return None
+        return {
+            "player1_name": row[0],
+            "player2_name": row[1],
+            "player1_score": row[2],
+            "player2_score": row[3]
+        }
+
+
+def create_scoreboard_store(path: str = None) -> ScoreboardStore:
+    """Returns the SQLite backend when a path is given, else the in-memory one."""
+    if path:
+        return SQLiteScoreboardStore(path)
+    return InMemoryScoreboardStore()
@@ -0,0 +1,413 @@
+# Production entry point: a preforking server for the WSGI app.
+#
+#     python server.py --workers 4 --threads 8 --bind 0.0.0.0:8000
+#
+# The master process imports the app once before forking: rule sets are
+# compiled, matchup indexes loaded and the cache warmed up a single time, and
+# the workers share those pages copy-on-write. Each worker serves requests on
+# a pool of threads; event streams and long polls, which stay open, move to
+# threads of their own so they never hold up the other requests. State that
+# must agree between workers lives in files under --state-dir (scoreboards,
+# simulation jobs and the Pokémon cache in SQLite, the battle log, lock
+# files), so every worker answers with the same scoreboards and jobs. The
+# profiler (/debug/profile) stays per worker.
+#
+# Signals to the master:
+#   TERM, INT  drain: workers stop accepting, finish their requests (up to
+#              --graceful-timeout seconds) and exit, then the master exits
+#   HUP        rolling restart: a new set of workers is forked (rule files are
+#              recompiled first), then the old ones are drained. Code changes
+#              need a full restart.
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger("server")
+
+HANDLED_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+# Seconds the master waits for the warm-up's lookups in flight and the other
+# threads to end before forking
+PRELOAD_THREAD_TIMEOUT = 30
+
+
+def shared_state_env(state_dir: str) -> dict:
+    """The app settings that put every shared piece of state under state_dir."""
+    return {
+        "SCOREBOARD_DB_PATH": os.path.join(state_dir, "scoreboards.sqlite"),
+        "SIMULATION_DB_PATH": os.path.join(state_dir, "simulations.sqlite"),
+        "POKEMON_CACHE_PATH": os.path.join(state_dir, "pokemon_cache.sqlite"),
+        "SINGLE_FLIGHT_LOCK_DIR": os.path.join(state_dir, "locks"),
+        "BATTLE_LOG_DIR": os.path.join(state_dir, "history"),
+        "WARMUP_ACCESS_LOG": os.path.join(state_dir, "access_counts.json"),
+        "MATCHUP_INDEX_DIR": os.path.join(state_dir, "matchups"),
+    }
+
+
+def parse_bind(value: str):
+    """Parses "host:port" (or ":port", "[::1]:port") into (host, port)."""
+    host, _, port = value.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def is_long_lived(path: str) -> bool:
+    """Requests that stay open until something changes: event streams and long polls."""
+    url = urlsplit(path)
+    return url.path == "/scoreboard/stream" or (
+        url.path == "/scoreboard" and "wait" in parse_qs(url.query))
+
+
+def open_listener(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """The listening socket, opened by the master and inherited by every worker."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    # Workers all wait on it: the ones that lose the race to accept() go back
+    # to waiting instead of blocking
+    listener.setblocking(False)
+    return listener
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Werkzeug's handler with keep-alive, closing idle connections after `timeout`."""
+
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.server.stopping.is_set():
+            self.close_connection = True
+
+    def run_wsgi(self):
+        if is_long_lived(self.path):
+            # The connection ends with the stream, so it doesn't go back to
+            # serving other requests on a stream thread
+            self.close_connection = True
+            if not self.server.detach():
+                self.send_error(503, "Too many open streams")
+                return
+        super().run_wsgi()
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    Werkzeug server for one worker process, handling requests on a fixed
+    pool of threads. A connection is only accepted while a thread is free,
+    so the others stay in the shared listen queue for another worker.
+    Event streams and long polls give their thread's place back to the pool
+    (see detach): up to stream_threads of them run on top of `threads`, and
+    the ones past that are answered with a 503.
+    """
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, app, listener: socket.socket, threads: int,
+                 stream_threads: int = 256):
+        host, port = listener.getsockname()[:2]
+        super().__init__(host, port, app, handler=RequestHandler, fd=listener.fileno())
+        self.socket.setblocking(False)
+        self.threads = threads
+        self.stream_threads = stream_threads
+        self.stopping = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=threads + stream_threads,
+                                            thread_name_prefix="http")
+        self._busy = 0
+        self._streams = 0
+        self._detached = threading.local()
+        self._idle = threading.Condition()
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        while not self.stopping.is_set():
+            with self._idle:
+                if not self._idle.wait_for(lambda: self._busy < self.threads,
+                                           poll_interval):
+                    continue
+            readable, _, _ = select.select([self.socket], [], [], poll_interval)
+            if not readable:
+                continue
+            try:
+                request, client_address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                continue  # Another worker got it
+            request.setblocking(True)
+            with self._idle:
+                self._busy += 1
+            self._executor.submit(self._handle, request, client_address)
+        # Only this worker's copy: the others keep accepting
+        self.socket.close()
+
+    def shutdown(self):
+        """Stops accepting connections; safe to call from a signal handler."""
+        self.stopping.set()
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Waits for the requests in flight to finish; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: self._busy == 0 and self._streams == 0, timeout)
+
+    def detach(self) -> bool:
+        """
+        Moves the calling request thread from the pool to the stream
+        threads, so the pool accepts another connection in its place.
+        False when all the stream threads are taken.
+        """
+        with self._idle:
+            if self._streams >= self.stream_threads:
+                return False
+            self._busy -= 1
+            self._streams += 1
+            self._detached.value = True
+            self._idle.notify_all()
+        return True
+
+    def _handle(self, request, client_address):
+        self._detached.value = False
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._idle:
+                if self._detached.value:
+                    self._streams -= 1
+                else:
+                    self._busy -= 1
+                self._idle.notify_all()
+
+
+def run_worker(application, listener, threads: int, stream_threads: int,
+               graceful_timeout: float):
+    """Body of a forked worker: serves until SIGTERM, then drains."""
+    server = PooledWSGIServer(application.app, listener, threads, stream_threads)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    # Ctrl-C reaches the whole process group: the master drains the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, HANDLED_SIGNALS)
+
+    application.after_fork()
+    application.start_background_work()
+    logger.info("Worker %s serving on %s threads", os.getpid(), threads)
+    server.serve_forever()
+
+    # Ends the event streams; long polls answer when their wait is over
+    application.SCOREBOARD_EVENTS.close()
+    if not server.wait_idle(graceful_timeout):
+        logger.warning("Worker %s stopping with requests still in flight", os.getpid())
+    application.stop_background_work()
+
+
+class Master:
+    """
+    Forks the workers from the preloaded app and keeps `workers` of them
+    running: replaces the ones that die, drains them all on SIGTERM and
+    replaces them all on SIGHUP.
+    """
+
+    def __init__(self, application, listener, workers: int, threads: int,
+                 stream_threads: int, graceful_timeout: float):
+        self.application = application
+        self.listener = listener
+        self.workers = workers
+        self.threads = threads
+        self.stream_threads = stream_threads
+        self.graceful_timeout = graceful_timeout
+        self.generation = 0
+        self._children = {}  # pid -> (generation, started at)
+        self._stop_requested = False
+        self._reload_requested = False
+        self._respawn_at = 0.0
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGHUP, self._request_reload)
+        self._spawn_missing()
+        while not self._stop_requested:
+            time.sleep(0.2)
+            self._reap()
+            if self._reload_requested:
+                self._reload_requested = False
+                self._reload()
+            self._spawn_missing()
+        self._stop_all()
+
+    def _spawn_missing(self):
+        current = sum(1 for generation, _ in self._children.values()
+                      if generation == self.generation)
+        if current < self.workers and time.monotonic() >= self._respawn_at:
+            for _ in range(self.workers - current):
+                self._spawn()
+
+    def _spawn(self):
+        # The child unblocks these once its own handlers are installed
+        signal.pthread_sigmask(signal.SIG_BLOCK, HANDLED_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.application, self.listener, self.threads,
+                           self.stream_threads, self.graceful_timeout)
+            except BaseException:
+                logger.exception("Worker %s failed", os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, HANDLED_SIGNALS)
+        self._children[pid] = (self.generation, time.monotonic())
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation, started_at = self._children.pop(pid, (None, 0.0))
+            if generation == self.generation and not self._stop_requested:
+                logger.warning("Worker %s exited (status %s); starting another",
+                               pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started_at < 1:
+                    # Dying on startup: don't fork in a tight loop
+                    self._respawn_at = time.monotonic() + 1
+
+    def _reload(self):
+        logger.info("Reloading: replacing %s workers", self.workers)
+        self.application.RULE_REGISTRY.reload()
+        gc.collect()
+        gc.freeze()
+        old = [pid for pid, (generation, _) in self._children.items()
+               if generation == self.generation]
+        self.generation += 1
+        self._spawn_missing()
+        self._signal(old, signal.SIGTERM)
+
+    def _stop_all(self):
+        logger.info("Draining %s workers", len(self._children))
+        self._signal(list(self._children), signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self._reap()
+        if self._children:
+            logger.warning("Killing %s workers that didn't stop", len(self._children))
+            self._signal(list(self._children), signal.SIGKILL)
+            for pid in list(self._children):
+                os.waitpid(pid, 0)
+                del self._children[pid]
+
+    def _signal(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _request_stop(self, signum, frame):
+        self._stop_requested = True
+
+    def _request_reload(self, signum, frame):
+        self._reload_requested = True
+
+
+def wait_for_threads(timeout: float) -> list:
+    """Joins the other threads before fork(); returns the names still running."""
+    deadline = time.monotonic() + timeout
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread():
+            thread.join(max(0.0, deadline - time.monotonic()))
+    return [thread.name for thread in threading.enumerate()
+            if thread is not threading.main_thread()]
+
+
+def preload_app(state_dir: str):
+    """
+    Imports the app with its shared state under state_dir (settings already
+    in the environment win) and readies it for fork().
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    for name, value in shared_state_env(state_dir).items():
+        os.environ.setdefault(name, value)
+    # Several processes append to one battle log
+    os.environ["BATTLE_LOG_SHARED"] = "1"
+
+    import app as application
+
+    # Workers start warm: wait for the cache warm-up (it has its own timeout),
+    # then for the lookups it still has in flight. A thread running at fork()
+    # lives on in no worker: its locks and single-flight calls would never
+    # be released there.
+    application.WARMUP.done.wait()
+    if not application.WARMUP.stop(PRELOAD_THREAD_TIMEOUT):
+        raise RuntimeError("The cache warm-up's lookups didn't finish; not forking.")
+    application.stop_background_work()
+    application.before_fork()
+    running = wait_for_threads(PRELOAD_THREAD_TIMEOUT)
+    if running:
+        raise RuntimeError(f"Threads still running before fork: {', '.join(running)}; "
+                           f"not forking.")
+    # Objects loaded so far are never collected, so the garbage collector
+    # doesn't write to (and un-share) the pages the workers inherit
+    gc.collect()
+    gc.freeze()
+    return application
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the battle API with worker processes.")
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:5000"),
+                        help="host:port to listen on (BIND)")
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WORKERS", os.cpu_count() or 1)),
+                        help="worker processes (WORKERS, default: one per CPU)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("THREADS", "8")),
+                        help="request threads per worker (THREADS)")
+    parser.add_argument("--stream-threads", type=int,
+                        default=int(os.environ.get("STREAM_THREADS", "256")),
+                        help="event streams and long polls per worker, on top of "
+                             "--threads (STREAM_THREADS)")
+    parser.add_argument("--state-dir", default=os.environ.get("STATE_DIR", "state"),
+                        help="directory of the state the workers share (STATE_DIR)")
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds a stopping worker waits for its requests")
+    args = parser.parse_args(argv)
+    if not hasattr(os, "fork"):
+        parser.error("server.py needs fork() (POSIX only); use app.py or an ASGI server.")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(process)d] %(levelname)s %(name)s: %(message)s")
+    listener = open_listener(*parse_bind(args.bind))
+    try:
+        application = preload_app(args.state_dir)
+    except RuntimeError as e:
+        logger.error("%s", e)
+        return 1
+    logger.info("Listening on %s with %s workers x %s threads",
+                args.bind, args.workers, args.threads)
+    Master(application, listener, args.workers, args.threads, args.stream_threads,
+           args.graceful_timeout).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: cross-process mode is off
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller (the
+    leader) runs the function, the others wait and get its result, or its
+    exception raised again. Once the call finishes, the next caller starts
+    a new one.
+    With lock_dir set, leaders also take a per-key lock file, so leaders in
+    other worker processes wait for each other; the function should then
+    re-check a shared store (e.g. the cache's SQLite tier) before doing the
+    work again.
+    """
+
+    def __init__(self, lock_dir: str = None):
+        if lock_dir and fcntl is None:
+            raise ValueError("Cross-process single-flight needs fcntl (POSIX only).")
+        self.lock_dir = lock_dir
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._async_calls = {}
+        self._stats = {"leaders": 0, "shared": 0}
+
+    def do(self, key, function):
+        """Runs function() once for all concurrent callers with this key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+            else:
+                self._stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_locked(key, function)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, coroutine_function):
+        """
+        Same as do(), for coroutines on one event loop. The call runs as its
+        own task, which every caller (the first one too) awaits through
+        shield(): a caller that is cancelled, e.g. because its client went
+        away, never cancels the call for the others.
+        """
+        task = self._async_calls.get(key)
+        if task is None:
+            self._stats["leaders"] += 1
+            task = asyncio.ensure_future(self._run_async(key, coroutine_function))
+            task.add_done_callback(_retrieve_exception)
+            self._async_calls[key] = task
+        else:
+            self._stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    async def _run_async(self, key, coroutine_function):
+        try:
+            return await coroutine_function()
+        finally:
+            del self._async_calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def after_fork(self):
+        """
+        Forgets the calls in flight: in a forked child their leaders don't
+        exist, so their followers would wait forever. The lock is replaced
+        too, in case it was held when the parent forked.
+        """
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def _run_locked(self, key, function):
+        if not self.lock_dir:
+            return function()
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        with open(path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return function()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _retrieve_exception(task):
+    # Marks the exception as retrieved when every caller was cancelled
+    if not task.cancelled():
+        task.exception()
@@ -1,7 +1,9 @@
 import pytest
 import requests_mock
 import json
-from app import app, POKEAPI_URL, GLOBAL_SCOREBOARD
+import os
+import threading
+from app import app, POKEAPI_URL, SCOREBOARD_STORE, POKEMON_CACHE, POKEAPI_CLIENT
 
 # Setting up the Flask fixture (preparation) for testing
 
@@ -10,13 +12,17 @@ from app import app, POKEAPI_URL, GLOBAL_SCOREBOARD
 def client():
     # Set Flask to test mode
     app.config['TESTING'] = True
-    GLOBAL_SCOREBOARD.clear()  # Clear the dictionary before each test
+    SCOREBOARD_STORE.reset()  # Remove every game before each test
+    POKEMON_CACHE.clear()  # Each test mocks its own PokeAPI responses
+    POKEAPI_CLIENT.circuit_breaker.reset()
     with app.test_client() as client:
         # We reset the scoreboard at the start of each test
         yield client
 
     # Ensures the scoreboard is cleared again after testing
-    GLOBAL_SCOREBOARD.clear()
+    SCOREBOARD_STORE.reset()
+    POKEMON_CACHE.clear()
+    POKEAPI_CLIENT.circuit_breaker.reset()
 
 
 # Mock data that the PokeAPI would return
@@ -172,3 +178,336 @@ def test_get_scoreboard(client):
     data = response.get_json()
     assert data["player1_name"] == "Ash"
     assert data["player1_score"] == 0
+
+
+def test_battle_uses_cache_for_repeated_pokemon(client, requests_mock):
+    """Tests whether a second battle with the same Pokémon skips PokeAPI."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+
+    battle_data = {"pokemon1": 6, "pokemon2": 9}
+    for _ in range(3):
+        response = client.post('/battle',
+                               data=json.dumps(battle_data),
+                               content_type='application/json')
+        assert response.status_code == 200
+
+    # Only the first battle went upstream
+    assert requests_mock.call_count == 2
+    stats = client.get('/cache/stats').get_json()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 4
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_malformed_upstream_body_is_not_cached_as_not_found(client, requests_mock):
+    """A garbled 200 is a 503, and the next lookup goes upstream again."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}6/", [{"content": b'{"name": "pika', "status_code": 200},
+                                            {"json": MOCK_CHARIZARD, "status_code": 200}])
+
+    battle = json.dumps({"pokemon1": 6, "pokemon2": 9})
+    response = client.post('/battle', data=battle, content_type='application/json')
+    assert response.status_code == 503
+    response = client.post('/battle', data=battle, content_type='application/json')
+    assert response.status_code == 200
+    assert response.get_json()["pokemon1"] == "charizard"
+    assert POKEMON_CACHE.stats()["negative_hits"] == 0
+
+
+def test_bulk_battles_json_array(client, requests_mock):
+    """Tests /battles with a JSON array: one fetch per distinct Pokémon."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9999/", status_code=404)
+
+    battles = [{"pokemon1": 9, "pokemon2": 6},
+               {"pokemon1": 6, "pokemon2": 9},
+               {"pokemon1": 9, "pokemon2": 6},
+               {"pokemon1": 6, "pokemon2": 9999},
+               {"pokemon1": "6", "pokemon2": 9}]
+    response = client.post('/battles', data=json.dumps(battles),
+                           content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = read_ndjson(response)
+    assert [line["round_winner"] for line in lines[:3]] == ["Ash", "Gary", "Ash"]
+    assert lines[3]["status"] == 404
+    assert lines[4]["status"] == 400
+    summary = lines[-1]["summary"]
+    assert summary["player1_wins"] == 2
+    assert summary["player2_wins"] == 1
+    assert summary["errors"] == 2
+    assert summary["scoreboard"]["player1_score"] == 2
+    assert requests_mock.call_count == 3
+
+
+def test_bulk_battles_ndjson_stream(client, requests_mock):
+    """Tests /battles with an NDJSON body and narrative lines."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+
+    body = '{"pokemon1": 6, "pokemon2": 9}\n\nnot json\n'
+    response = client.post('/battles?narrative=1', data=body,
+                           content_type='application/x-ndjson')
+
+    lines = read_ndjson(response)
+    assert "Winner: Blastoise." in lines[0]["results"][-1]
+    assert lines[1] == {"index": 1, "status": 400, "error": lines[1]["error"]}
+    assert client.get('/scoreboard').get_json()["player2_score"] == 1
+
+
+def test_bulk_battles_keep_scores_when_a_lookup_fails(client, requests_mock, monkeypatch):
+    """Battles played before an unexpected lookup error still count."""
+    import app as app_module
+    from battle_stats import BattleStats
+    monkeypatch.setattr(app_module, "BATTLE_STATS", BattleStats())
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+    get_pokemon_data = app_module.get_pokemon_data
+
+    def lookup(pokemon_id):
+        if pokemon_id == 25:
+            raise RuntimeError("corrupted cache entry")
+        return get_pokemon_data(pokemon_id)
+
+    monkeypatch.setattr(app_module, "get_pokemon_data", lookup)
+    # The first chunk of 1000 is played, the second one fails
+    battles = [{"pokemon1": 9, "pokemon2": 6}] * 1000 + [{"pokemon1": 25, "pokemon2": 6}]
+    response = client.post('/battles', data=json.dumps(battles),
+                           content_type='application/json')
+    with pytest.raises(RuntimeError):
+        response.get_data()
+
+    assert app_module.BATTLE_STATS.battles == 1000
+    assert client.get('/scoreboard').get_json()["player1_score"] == 1000
+
+
+def test_bulk_battles_requires_array(client):
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    response = client.post('/battles', data=json.dumps({"pokemon1": 6}),
+                           content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_battles_are_scored_per_game(client, requests_mock):
+    """Tests whether /battle and /scoreboard use the game_id from /start."""
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+    game1 = client.post('/start', data=json.dumps({"player1_name": "Ash",
+                        "player2_name": "Gary"}), content_type='application/json').get_json()["game_id"]
+    game2 = client.post('/start', data=json.dumps({"player1_name": "Misty",
+                        "player2_name": "Brock"}), content_type='application/json').get_json()["game_id"]
+
+    response = client.post('/battle',
+                           data=json.dumps({"pokemon1": 9, "pokemon2": 6, "game_id": game1}),
+                           content_type='application/json')
+    assert response.get_json()["round_winner"] == "Ash"
+
+    assert client.get(f'/scoreboard?game_id={game1}').get_json()["player1_score"] == 1
+    assert client.get(f'/scoreboard?game_id={game2}').get_json()["player1_score"] == 0
+    # Without a game_id, the latest game is used
+    assert client.get('/scoreboard').get_json()["player1_name"] == "Misty"
+
+
+def test_battle_unknown_game(client):
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    response = client.post('/battle',
+                           data=json.dumps({"pokemon1": 9, "pokemon2": 6, "game_id": "nope"}),
+                           content_type='application/json')
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Game not found"
+
+    for game_id in ([1], {"a": 1}, 1):
+        response = client.post('/battle',
+                               data=json.dumps({"pokemon1": 9, "pokemon2": 6, "game_id": game_id}),
+                               content_type='application/json')
+        assert response.status_code == 400
+        assert response.get_json()["message"] == "'game_id' should be a string."
+
+
+def test_matchup_endpoint(client, requests_mock):
+    """Tests /matchup answers without touching the scoreboard."""
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+
+    response = client.get('/matchup/6/9')
+    assert response.status_code == 200
+    assert response.get_json() == {"pokemon1": "charizard", "pokemon2": "blastoise",
+                                   "p1_score": 0, "p2_score": 1, "winner": "blastoise",
+                                   "ruleset": "standard"}
+    assert client.get('/scoreboard').get_json() == {"message": "No game started."}
+
+
+def test_battle_with_event_ruleset(client, requests_mock):
+    """Tests whether /battle uses the rule set picked in the request."""
+    MOCK_RATTATA = {"name": "rattata", "id": 19,
+                    "types": [{"slot": 1, "type": {"name": "normal", "url": "..."}}]}
+    MOCK_GASTLY = {"name": "gastly", "id": 92,
+                   "types": [{"slot": 1, "type": {"name": "ghost", "url": "..."}}]}
+    requests_mock.get(f"{POKEAPI_URL}19/", json=MOCK_RATTATA, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}92/", json=MOCK_GASTLY, status_code=200)
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+
+    standard = client.post('/battle', data=json.dumps({"pokemon1": 19, "pokemon2": 92}),
+                           content_type='application/json').get_json()
+    event = client.post('/battle', data=json.dumps({"pokemon1": 19, "pokemon2": 92,
+                                                    "ruleset": "event"}),
+                        content_type='application/json').get_json()
+    unknown = client.post('/battle', data=json.dumps({"pokemon1": 19, "pokemon2": 92,
+                                                      "ruleset": "nope"}),
+                          content_type='application/json')
+
+    assert standard["round_winner"] == "Nobody (tie)"
+    assert event["round_winner"] == "Ash"
+    assert unknown.status_code == 400
+    assert sorted(client.get('/rulesets').get_json()["rulesets"]) == ["event", "standard"]
+
+
+def test_metrics_endpoint(client, requests_mock):
+    """Tests whether /metrics exposes stage timings and upstream counters."""
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD, status_code=200)
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE, status_code=200)
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    client.post('/battle', data=json.dumps({"pokemon1": 6, "pokemon2": 9}),
+                content_type='application/json')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    for stage in ("fetch", "create_data", "determine_winner", "serialize"):
+        assert f'pokemon_battle_battle_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'pokemon_battle_pokeapi_responses_total{status="200"}' in text
+    assert 'pokemon_battle_http_responses_total{endpoint="/battle",status="200"}' in text
+    assert "pokemon_battle_http_requests_in_flight" in text
+
+
+def test_profile_endpoint(client):
+    response = client.post('/debug/profile', data=json.dumps({"requests": 2}),
+                           content_type='application/json')
+    assert response.get_json()["active"] is True
+    client.get('/scoreboard')
+    client.get('/scoreboard')
+
+    report = client.get('/debug/profile').get_json()
+    assert report["profiled_requests"] == 2
+    # Each worker process profiles its own requests
+    assert report["worker"] == os.getpid()
+    assert report["functions"]
+
+
+def test_profile_endpoint_rejects_non_object_body(client):
+    for body in ("[1]", '"text"', "3"):
+        response = client.post('/debug/profile', data=body, content_type='application/json')
+        assert response.status_code == 400
+
+
+def test_open_circuit_fails_fast_with_retry_after(client, requests_mock):
+    """Tests whether a 429 with Retry-After opens the circuit for that long."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    requests_mock.get(f"{POKEAPI_URL}6/", status_code=429, headers={"Retry-After": "120"})
+
+    response = client.post('/battle', data=json.dumps({"pokemon1": 6, "pokemon2": 6}),
+                           content_type='application/json')
+    assert response.status_code == 503
+    calls = requests_mock.call_count
+
+    response = client.post('/battle', data=json.dumps({"pokemon1": 6, "pokemon2": 6}),
+                           content_type='application/json')
+    assert response.status_code == 503
+    assert 115 <= int(response.headers["Retry-After"]) <= 120
+    assert requests_mock.call_count == calls  # Failed fast, no upstream call
+
+    status = client.get('/upstream/status').get_json()
+    assert status["circuit_breaker"]["state"] == "open"
+    assert status["circuit_breaker"]["rejected"] == 1
+
+
+def test_scoreboard_etag_and_not_modified(client, requests_mock):
+    """Tests whether /scoreboard answers 304 until the scores change."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    response = client.get('/scoreboard')
+    etag = response.headers["ETag"]
+    assert response.get_json()["player1_score"] == 0
+
+    response = client.get('/scoreboard', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE)
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD)
+    client.post('/battle', data=json.dumps({"pokemon1": 9, "pokemon2": 6}),
+                content_type='application/json')
+
+    response = client.get('/scoreboard', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["player1_score"] == 1
+
+
+def test_scoreboard_long_poll(client, requests_mock):
+    """Tests whether ?wait= holds the request until a battle is scored."""
+    client.post('/start', data=json.dumps({"player1_name": "Ash",
+                "player2_name": "Gary"}), content_type='application/json')
+    etag = client.get('/scoreboard').headers["ETag"]
+
+    response = client.get('/scoreboard?wait=0.1', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE)
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD)
+    battle = threading.Timer(0.2, lambda: app.test_client().post(
+        '/battle', data=json.dumps({"pokemon1": 9, "pokemon2": 6}),
+        content_type='application/json'))
+    battle.start()
+    response = client.get('/scoreboard?wait=10', headers={"If-None-Match": etag})
+    battle.join()
+    assert response.status_code == 200
+    assert response.get_json()["player1_score"] == 1
+
+    assert client.get('/scoreboard?wait=soon').status_code == 400
+
+
+def test_scoreboard_stream_pushes_changes(client, requests_mock):
+    """Tests whether /scoreboard/stream sends the scoreboard, then each change."""
+    start = client.post('/start', data=json.dumps({"player1_name": "Ash",
+                        "player2_name": "Gary"}), content_type='application/json')
+    game_id = start.get_json()["game_id"]
+    assert client.get('/scoreboard/stream?game_id=missing').status_code == 404
+
+    response = client.get(f'/scoreboard/stream?game_id={game_id}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert b'"player1_score":0' in next(events)
+
+    requests_mock.get(f"{POKEAPI_URL}9/", json=MOCK_BLASTOISE)
+    requests_mock.get(f"{POKEAPI_URL}6/", json=MOCK_CHARIZARD)
+    client.post('/battle', data=json.dumps({"pokemon1": 9, "pokemon2": 6}),
+                content_type='application/json')
+    event = next(events).decode()
+    response.close()
+    assert event.startswith("id: ")
+    data = json.loads(event.split("data: ", 1)[1])
+    assert data["game_id"] == game_id
+    assert data["version"] == 1
+    assert data["scoreboard"]["player1_score"] == 1
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi_app
+from pokeapi_client import PokemonNotFound
+from app import SCOREBOARD_STORE, POKEMON_CACHE
+
+MOCK_POKEMON = {
+    6: {"name": "charizard", "types": [{"slot": 1, "type": {"name": "fire"}},
+                                       {"slot": 2, "type": {"name": "flying"}}]},
+    9: {"name": "blastoise", "types": [{"slot": 1, "type": {"name": "water"}}]},
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_upstream(monkeypatch):
+    SCOREBOARD_STORE.reset()
+    POKEMON_CACHE.clear()
+    calls = []
+
+    async def fetch_pokemon_json(pokemon_id, fields=None):
+        calls.append(pokemon_id)
+        if pokemon_id not in MOCK_POKEMON:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        return MOCK_POKEMON[pokemon_id]
+
+    monkeypatch.setattr(asgi_app.ASYNC_POKEAPI_CLIENT, "fetch_pokemon_json",
+                        fetch_pokemon_json)
+    yield calls
+    SCOREBOARD_STORE.reset()
+    POKEMON_CACHE.clear()
+
+
+def call(method, path, payload=None):
+    """Drives the ASGI app once and returns (status, decoded JSON body)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': []}
+    asyncio.run(asgi_app.app(scope, receive, send))
+    return messages[0]['status'], json.loads(messages[1]['body'])
+
+
+def test_asgi_battle_flow(fake_upstream):
+    status, data = call('POST', '/start', {"player1_name": "Ash", "player2_name": "Gary"})
+    assert status == 200
+    assert data["players"] == "Ash vs Gary"
+
+    status, data = call('POST', '/battle', {"pokemon1": 9, "pokemon2": 6})
+    assert status == 200
+    assert data["round_winner"] == "Ash"
+    assert "Winner: Blastoise." in data["results"][-1]
+    assert sorted(fake_upstream) == [6, 9]
+
+    status, data = call('GET', '/scoreboard')
+    assert data["player1_score"] == 1
+
+
+def test_asgi_errors_match_wsgi_app():
+    assert call('POST', '/battle', {"pokemon1": 9, "pokemon2": 6})[0] == 403
+
+    call('POST', '/start', {"player1_name": "Ash", "player2_name": "Gary"})
+    assert call('POST', '/battle', {"pokemon1": "9"})[0] == 400
+    assert call('POST', '/battle', {"pokemon1": 9, "pokemon2": 6, "game_id": [1]})[0] == 400
+
+    status, data = call('POST', '/battle', {"pokemon1": 9, "pokemon2": 9999})
+    assert status == 404
+    assert data["error"] == "Pokemon with id 9999 not found."
+
+    assert call('GET', '/battle')[0] == 405
+    assert call('GET', '/missing')[0] == 404
+
+
+def test_asgi_scoreboard_not_modified():
+    call('POST', '/start', {"player1_name": "Ash", "player2_name": "Gary"})
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def get_scoreboard(headers):
+        scope = {'type': 'http', 'method': 'GET', 'path': '/scoreboard',
+                 'query_string': b'wait=0.05', 'headers': headers}
+        await asgi_app.app(scope, None, send)
+        return dict(messages[-2]['headers'])
+
+    headers = asyncio.run(get_scoreboard([]))
+    assert messages[-2]['status'] == 200
+    asyncio.run(get_scoreboard([(b'if-none-match', headers[b'etag'])]))
+    assert messages[-2]['status'] == 304
+    assert messages[-1]['body'] == b''
+
+
+def test_asgi_scoreboard_stream():
+    call('POST', '/start', {"player1_name": "Ash", "player2_name": "Gary"})
+    messages = []
+
+    async def main():
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+            if len(messages) == 3:
+                disconnect.set()
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/scoreboard/stream',
+                 'query_string': b'', 'headers': []}
+        stream = asyncio.ensure_future(asgi_app.app(scope, receive, send))
+        await asyncio.sleep(0.05)
+        await asyncio.to_thread(call, 'POST', '/battle', {"pokemon1": 9, "pokemon2": 6})
+        await asyncio.wait_for(stream, 5)
+
+    asyncio.run(main())
+    assert dict(messages[0]['headers'])[b'content-type'] == b'text/event-stream'
+    assert b'"player1_score":0' in messages[1]['body']
+    assert b'"player1_score":1' in messages[2]['body']
+    assert asgi_app.wsgi.SCOREBOARD_EVENTS.stats()["subscribers"] == 0
@@ -0,0 +1,137 @@
+import json
+
+import app as app_module
+from battle_log import BattleLog, LogTail, list_segments, read_events, replay
+
+MOCK_CHARIZARD = {"name": "charizard",
+                  "types": [{"slot": 1, "type": {"name": "fire"}},
+                            {"slot": 2, "type": {"name": "flying"}}]}
+MOCK_BLASTOISE = {"name": "blastoise", "types": [{"slot": 1, "type": {"name": "water"}}]}
+
+
+def test_append_rotate_and_read(tmp_path):
+    log = BattleLog(str(tmp_path), max_segment_bytes=200)
+    for i in range(10):
+        assert log.append({"type": "battle", "game_id": f"g{i % 2}", "winner": 1}) == i
+        log.flush()
+    assert len(list_segments(str(tmp_path))) > 1
+
+    assert [e["offset"] for e in log.read(3, limit=4)] == [3, 4, 5, 6]
+    assert [e["offset"] for e in log.read(0, game_id="g1")] == [1, 3, 5, 7, 9]
+    log.close()
+
+
+def test_reopen_continues_offsets_and_cuts_torn_write(tmp_path):
+    log = BattleLog(str(tmp_path))
+    log.append({"type": "battle", "game_id": "g", "winner": 0})
+    log.append({"type": "battle", "game_id": "g", "winner": 0})
+    log.close()
+    _, path = list_segments(str(tmp_path))[-1]
+    with open(path, "a") as f:
+        f.write('{"type": "bat')  # Crashed mid-write
+
+    reopened = BattleLog(str(tmp_path))
+    assert reopened.next_offset == 2
+    assert reopened.append({"type": "battle", "game_id": "g", "winner": 2}) == 2
+    reopened.close()
+    assert [e["offset"] for e in read_events(str(tmp_path))] == [0, 1, 2]
+
+
+def test_shared_logs_interleave_offsets(tmp_path):
+    # Two processes appending to one directory
+    first = BattleLog(str(tmp_path), max_segment_bytes=300, shared=True)
+    second = BattleLog(str(tmp_path), max_segment_bytes=300, shared=True)
+    for i in range(6):
+        log = first if i % 2 else second
+        assert log.append({"type": "battle", "game_id": "g", "winner": i % 3}) is None
+        log.flush()
+    assert first.next_offset == second.next_offset == 6
+
+    _, path = list_segments(str(tmp_path))[-1]
+    with open(path, "a") as f:
+        f.write('{"type": "bat')  # A worker died mid-write
+    first.append({"type": "battle", "game_id": "g", "winner": 1})
+    first.close()
+    second.close()
+    events = list(read_events(str(tmp_path)))
+    assert [e["offset"] for e in events] == list(range(7))
+    assert len(list_segments(str(tmp_path))) > 1
+
+
+def test_log_tail_returns_new_events_only(tmp_path):
+    log = BattleLog(str(tmp_path), max_segment_bytes=200, shared=True)
+    tail = LogTail(str(tmp_path), offset=1)
+    assert tail.read() == []
+    for i in range(3):
+        log.append({"type": "battle", "game_id": "g", "winner": 1})
+    log.flush()
+    assert [e["offset"] for e in tail.read()] == [1, 2]
+
+    _, path = list_segments(str(tmp_path))[-1]
+    with open(path, "ab") as f:
+        f.write(b'{"offset": 3, "type"')  # Another worker is writing it
+    assert tail.read() == []
+    with open(path, "ab") as f:
+        f.write(b': "battle", "game_id": "g", "winner": 0}\n')
+    for i in range(6):  # Across segment rotations
+        log.append({"type": "battle", "game_id": "g", "winner": 2})
+        log.flush()
+    assert [e["offset"] for e in tail.read(limit=4)] == [3, 4, 5, 6]
+    assert [e["offset"] for e in tail.read()] == [7, 8, 9]
+    log.close()
+
+
+def test_log_tail_follows_one_event_at_a_time(tmp_path):
+    log = BattleLog(str(tmp_path), max_segment_bytes=200, shared=True)
+    for i in range(5):
+        log.append({"type": "battle", "game_id": "g", "winner": 1})
+        log.flush()
+    tail = LogTail(str(tmp_path))
+    events = tail.follow()
+    assert next(events)["offset"] == 0
+    assert next(events)["offset"] == 1
+    assert tail.offset == 2  # Nothing read past the events taken
+    events.close()
+    assert [e["offset"] for e in tail.follow()] == [2, 3, 4]
+    log.close()
+
+
+def test_replay_rebuilds_scoreboards():
+    events = [
+        {"type": "game_started", "game_id": "a", "player1_name": "Ash", "player2_name": "Gary"},
+        {"type": "battle", "game_id": "a", "winner": 1},
+        {"type": "battle", "game_id": "a", "winner": 0},
+        {"type": "battle", "game_id": "a", "winner": 2},
+        {"type": "battle", "game_id": "a", "winner": 1},
+    ]
+    assert replay(events) == {"a": {"player1_name": "Ash", "player2_name": "Gary",
+                                    "player1_score": 2, "player2_score": 1}}
+
+
+def test_history_endpoint_and_replay_match_store(tmp_path, monkeypatch, requests_mock):
+    log = BattleLog(str(tmp_path))
+    monkeypatch.setattr(app_module, "BATTLE_LOG", log)
+    app_module.POKEMON_CACHE.clear()
+    requests_mock.get(f"{app_module.POKEAPI_URL}6/", json=MOCK_CHARIZARD)
+    requests_mock.get(f"{app_module.POKEAPI_URL}9/", json=MOCK_BLASTOISE)
+    client = app_module.app.test_client()
+
+    game_id = client.post('/start', json={"player1_name": "Ash",
+                                          "player2_name": "Gary"}).get_json()["game_id"]
+    client.post('/battle', json={"game_id": game_id, "pokemon1": 6, "pokemon2": 9})
+    client.post(f'/battles?game_id={game_id}',
+                json=[{"pokemon1": 9, "pokemon2": 6}, {"pokemon1": 6, "pokemon2": 6}]).get_data()
+
+    lines = [json.loads(line) for line in
+             client.get('/history?limit=2').get_data(as_text=True).splitlines()]
+    assert [e["type"] for e in lines[:-1]] == ["game_started", "battle"]
+    assert lines[-1] == {"next_offset": 2}
+    assert lines[1]["pokemon1_id"] == 6 and lines[1]["winner"] == 2
+
+    lines = client.get('/history?offset=2').get_data(as_text=True).splitlines()
+    assert json.loads(lines[-1]) == {"next_offset": 4}
+    assert client.get('/history?limit=0').status_code == 400
+
+    rebuilt = replay(log.read(game_id=game_id))[game_id]
+    assert rebuilt == app_module.SCOREBOARD_STORE.get(game_id)
+    log.close()
@@ -1,5 +1,7 @@
+import pytest
 from battle_logic import BattleLogic
-from type_rules import StandardTypeRule
+from pokemon_data_factory import Pokemon, PokemonFactory
+from type_rules import StandardTypeRule, EventTypeRule
 
 # We instantiate the battle logic object once for testing
 # Using the default ruleset
@@ -52,3 +54,65 @@ def test_determine_winner_tie_by_no_advantage():
     results = battle_system.determine_winner(
         "snorlax", p1_types, "arbok", p2_types)
     assert "No type advantage found. It's a technical draw!" in results[0]
+
+
+def reference_determine_winner(rules, p1_types, p2_types):
+    # Straightforward scoring over the raw rule dict, used as the oracle
+    p1_score = p2_score = 0
+    for p1_type in p1_types:
+        for p2_type in p2_types:
+            if p2_type in rules.get(p1_type, []):
+                p1_score += 1
+            elif p1_type in rules.get(p2_type, []):
+                p2_score += 1
+    return p1_score, p2_score
+
+
+def all_type_combinations(rules):
+    types = sorted({t for k, v in rules.items() for t in (k, *v)} | {"fake"})
+    singles = [[t] for t in types]
+    return singles + [[a, b] for a in types for b in types if a != b]
+
+
+def test_compiled_matrix_matches_rules():
+    rules = StandardTypeRule().get_advantages()
+    for p1_types in all_type_combinations(rules):
+        for p2_types in all_type_combinations(rules):
+            assert battle_system.score_matchup(p1_types, p2_types) == \
+                reference_determine_winner(rules, p1_types, p2_types)
+
+
+def test_compiled_matrix_matches_event_rules():
+    standard_before = {k: list(v) for k, v in StandardTypeRule().get_advantages().items()}
+    rules = EventTypeRule().get_advantages()
+    event_system = BattleLogic(rule_set=EventTypeRule())
+
+    assert event_system.is_strong_against("normal", "ghost") == True
+    assert StandardTypeRule().get_advantages() == standard_before
+    assert battle_system.is_strong_against("normal", "ghost") == False
+    for p1_types in all_type_combinations(rules):
+        for p2_types in all_type_combinations(rules):
+            assert event_system.score_matchup(p1_types, p2_types) == \
+                reference_determine_winner(rules, p1_types, p2_types)
+
+
+def test_evaluate_builds_narrative_on_demand():
+    result = battle_system.evaluate(Pokemon.create("charizard", ["fire", "flying"]),
+                                    Pokemon.create("bulbasaur", ["grass", "poison"]))
+    assert (result.p1_score, result.p2_score) == (2, 0)
+    assert result.winner == 1
+    assert result.narrative() == battle_system.determine_winner(
+        "charizard", ["fire", "flying"], "bulbasaur", ["grass", "poison"])
+
+
+def test_factory_returns_immutable_record():
+    raw_data = {"name": "charizard", "types": [{"slot": 1, "type": {"name": "fire"}},
+                                               {"slot": 2, "type": {"name": "flying"}}]}
+    pokemon = PokemonFactory.create_data(raw_data)
+    assert pokemon == Pokemon.create("charizard", ["fire", "flying"])
+    assert pokemon.display_name == "Charizard"
+    assert pokemon.types == ("fire", "flying")
+    assert pokemon.type_display_names == ("Fire", "Flying")
+    assert pokemon.to_dict() == {"name": "charizard", "types": ["fire", "flying"]}
+    with pytest.raises(AttributeError):
+        pokemon.name = "blastoise"
@@ -0,0 +1,119 @@
+import app as app_module
+from battle_log import BattleLog, LogTail
+from battle_stats import BattleStats, RankIndex
+
+CHARIZARD = ("charizard", ("fire", "flying"))
+BLASTOISE = ("blastoise", ("water",))
+VENUSAUR = ("venusaur", ("grass", "poison"))
+
+
+def test_rank_index_orders_by_score_then_arrival():
+    index = RankIndex()
+    for key in ["a", "b", "b", "c", "c", "a"]:
+        index.increment(key)
+    index.increment("c")
+    # b reached 2 wins before a did
+    assert index.top(2) == [("c", 3), ("b", 2)]
+    assert index.top(10) == [("c", 3), ("b", 2), ("a", 2)]
+    assert index.rank("c") == 1
+    assert index.rank("a") == 2
+    assert index.rank("unknown") is None
+
+
+def test_rank_index_counts_higher_scores():
+    index = RankIndex()
+    for key in range(300):
+        for _ in range(key % 37):
+            index.increment(key)
+    for key in range(300):
+        score = key % 37
+        expected = 1 + sum(1 for other in range(300) if other % 37 > score) if score else None
+        assert index.rank(key) == expected
+
+
+def test_leaderboard_and_stats_agree_on_tied_ranks():
+    stats = BattleStats()
+    stats.record(9, BLASTOISE, 6, CHARIZARD, 1)
+    stats.record(3, VENUSAUR, 6, CHARIZARD, 1)
+    board = stats.leaderboard("pokemon", 2)
+    assert [(entry["pokemon_id"], entry["rank"]) for entry in board] == [(9, 1), (3, 1)]
+    assert stats.pokemon(3)["rank"] == 1
+
+
+def test_stats_per_pokemon_type_and_player():
+    stats = BattleStats()
+    stats.record(9, BLASTOISE, 6, CHARIZARD, 1, ("Ash", "Gary"))
+    stats.record(6, CHARIZARD, 3, VENUSAUR, 1, ("Ash", "Gary"))
+    stats.record(3, VENUSAUR, 3, VENUSAUR, 0, ("Misty", "Brock"))
+
+    charizard = stats.pokemon(6)
+    assert (charizard["wins"], charizard["losses"], charizard["battles"]) == (1, 1, 2)
+    assert charizard["win_rate"] == 0.5
+    assert stats.pokemon(25) is None
+    assert stats.leaderboard("players", 1)[0]["name"] == "Ash"
+    assert stats.leaderboard("players", 5)[0]["wins"] == 2
+    types = {entry["name"]: entry for entry in stats.leaderboard("types", 10)}
+    assert types["water"]["wins"] == 1 and "grass" not in types
+    assert stats.pokemon(3)["ties"] == 2
+
+
+def test_load_events_rebuilds_counters():
+    stats = BattleStats()
+    stats.load_events([
+        {"type": "game_started", "game_id": "g", "player1_name": "Ash", "player2_name": "Gary"},
+        {"type": "battle", "game_id": "g", "pokemon1_id": 9, "pokemon1": "blastoise",
+         "pokemon1_types": ["water"], "pokemon2_id": 6, "pokemon2": "charizard",
+         "pokemon2_types": ["fire", "flying"], "winner": 1},
+    ])
+    assert stats.pokemon(9)["wins"] == 1
+    assert stats.leaderboard("players")[0]["name"] == "Ash"
+
+
+def test_leaderboard_endpoints(monkeypatch, requests_mock):
+    monkeypatch.setattr(app_module, "BATTLE_STATS", BattleStats())
+    app_module.POKEMON_CACHE.clear()
+    requests_mock.get(f"{app_module.POKEAPI_URL}6/", json={
+        "name": "charizard", "types": [{"slot": 1, "type": {"name": "fire"}}]})
+    requests_mock.get(f"{app_module.POKEAPI_URL}9/", json={
+        "name": "blastoise", "types": [{"slot": 1, "type": {"name": "water"}}]})
+    client = app_module.app.test_client()
+    client.post('/start', json={"player1_name": "Ash", "player2_name": "Gary"})
+    client.post('/battle', json={"pokemon1": 9, "pokemon2": 6})
+    client.post('/battles', json=[{"pokemon1": 9, "pokemon2": 6}]).get_data()
+
+    board = client.get('/leaderboard').get_json()
+    assert board["battles"] == 2
+    assert board["leaderboard"][0] == {
+        "rank": 1, "pokemon_id": 9, "name": "blastoise", "wins": 2, "losses": 0,
+        "ties": 0, "battles": 2, "win_rate": 1.0}
+    assert client.get('/leaderboard?category=players').get_json()["leaderboard"][0]["name"] == "Ash"
+    assert client.get('/leaderboard?category=moves').status_code == 400
+    for limit in ("²", "abc", "0", "101", "-1"):
+        assert client.get(f'/leaderboard?limit={limit}').status_code == 400
+    assert client.get('/stats/pokemon/6').get_json()["losses"] == 2
+    assert client.get('/stats/pokemon/25').status_code == 404
+
+
+def test_workers_follow_each_others_battles(tmp_path, monkeypatch):
+    log = BattleLog(str(tmp_path), shared=True)
+    other_worker = BattleLog(str(tmp_path), shared=True)
+    monkeypatch.setattr(app_module, "BATTLE_LOG", log)
+    monkeypatch.setattr(app_module, "BATTLE_LOG_TAIL", LogTail(str(tmp_path)))
+    monkeypatch.setattr(app_module, "BATTLE_STATS", BattleStats())
+    game_id = app_module.SCOREBOARD_STORE.create_game("Ash", "Gary")
+    app_module.SCOREBOARD_STORE.record_win(game_id, 2)
+    battle = {"type": "battle", "game_id": game_id, "player1_name": "Ash",
+              "player2_name": "Gary", "pokemon1_id": 6, "pokemon1": "charizard",
+              "pokemon2_id": 9, "pokemon2": "blastoise", "winner": 2}
+    other_worker.append(dict(battle, source="other"))
+    log.append(dict(battle, source=app_module.PROCESS_ID))  # Counted when played
+    other_worker.close()
+    log.flush()
+    published = app_module.SCOREBOARD_EVENTS.stats()["published"]
+
+    assert app_module.follow_battle_log() == 1
+    assert app_module.BATTLE_STATS.leaderboard("players")[0]["name"] == "Gary"
+    assert app_module.BATTLE_STATS.battles == 1
+    assert app_module.SCOREBOARD_EVENTS.stats()["published"] == published + 1
+    assert app_module.follow_battle_log() == 0
+    log.close()
@@ -0,0 +1,28 @@
+import pytest
+
+from benchmarks.run_benchmarks import main
+from benchmarks.stub_pokeapi import StubPokeAPI
+from pokeapi_client import PokeAPIClient
+
+
+def test_stub_pokeapi_serves_pokemon_and_404():
+    with StubPokeAPI(max_id=10) as stub:
+        client = PokeAPIClient(stub.base_url)
+        assert client.fetch_pokemon_json(4)["name"] == "stubmon-4"
+        with pytest.raises(ValueError, match="Pokemon with id 11 not found."):
+            client.fetch_pokemon_json(11)
+        assert stub.requests == 2
+
+
+def test_benchmark_report_smoke(tmp_path):
+    output = tmp_path / "bench.json"
+    report = main(["--iterations", "10", "--requests", "4", "--concurrency", "2",
+                   "--memory-requests", "2", "--upstream-latency-ms", "0",
+                   "--payload-kb", "1", "--output", str(output)])
+    assert output.exists()
+    assert set(report["hot_path"]) >= {"determine_winner_ops", "create_data_ops"}
+    assert report["parse"]["fields_parse_ops"] > 0
+    for cache_mode in ("cold", "warm"):
+        level = report["endpoint"][cache_mode][0]
+        assert level["errors"] == 0
+        assert level["p99_ms"] >= level["p50_ms"]
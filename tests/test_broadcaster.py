@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+
+from broadcaster import KEEPALIVE_FRAME, Broadcaster, sse_frame
+
+
+def parse_frames(chunk):
+    """(id, event, data) of every event in a chunk, skipping comments."""
+    events = []
+    for frame in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines()
+                      if not line.startswith(":"))
+        if fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_frame_format():
+    assert sse_frame("scoreboard", {"b": 1, "a": 2}, 7) == \
+        b'id: 7\nevent: scoreboard\ndata: {"a":2,"b":1}\n\n'
+
+
+def test_events_are_encoded_once_and_filtered_by_topic():
+    broadcaster = Broadcaster()
+    cursor = broadcaster.cursor()
+    broadcaster.publish("game1", "scoreboard", {"n": 1})
+    broadcaster.publish("game2", "scoreboard", {"n": 2})
+
+    frames, next_cursor, lagged = broadcaster.read(cursor, "game2")
+    assert [parse_frames(f) for f in frames] == [[("1", "scoreboard", {"n": 2})]]
+    assert (next_cursor, lagged) == (2, False)
+    all_frames, _, _ = broadcaster.read(cursor)
+    assert all_frames[1] is frames[0]  # Shared by every subscriber
+    assert broadcaster.read(next_cursor) == ([], 2, False)
+
+
+def test_slow_subscribers_skip_to_a_snapshot():
+    broadcaster = Broadcaster(history=2, keepalive=0.01)
+    stream = broadcaster.subscribe(snapshot=lambda: sse_frame("snapshot", {}))
+    assert parse_frames(next(stream)) == [(None, "snapshot", {})]
+
+    for n in range(5):
+        broadcaster.publish(None, "scoreboard", {"n": n})
+    events = parse_frames(next(stream))
+    # Only the last two are kept, followed by the current state
+    assert [event[1:] for event in events] == [
+        ("scoreboard", {"n": 3}), ("scoreboard", {"n": 4}), ("snapshot", {})]
+    assert next(stream) == KEEPALIVE_FRAME
+    assert broadcaster.stats()["lagged"] == 1
+    assert broadcaster.stats()["subscribers"] == 1
+    stream.close()
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+def test_close_ends_waiting_subscriptions():
+    broadcaster = Broadcaster(keepalive=30)
+    stream = broadcaster.subscribe()
+    chunks = []
+    reader = threading.Thread(target=lambda: chunks.extend(stream))
+    reader.start()
+    broadcaster.close()
+    reader.join(timeout=2)
+    assert not reader.is_alive() and chunks == []
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+def test_reconnecting_client_resumes_after_last_event_id():
+    broadcaster = Broadcaster()
+    first = broadcaster.publish(None, "scoreboard", {"n": 1})
+    broadcaster.publish(None, "scoreboard", {"n": 2})
+    assert broadcaster.cursor(str(first)) == 1
+    assert broadcaster.cursor("99") == 2  # From before a restart
+    assert broadcaster.cursor("junk") == 2
+
+
+def test_threaded_subscriber_wakes_up_on_publish():
+    broadcaster = Broadcaster(keepalive=5)
+    stream = broadcaster.subscribe("game1")
+    threading.Timer(0.05, broadcaster.publish, ("game1", "scoreboard", {"n": 1})).start()
+    assert parse_frames(next(stream))[0][2] == {"n": 1}
+
+
+def test_async_subscribers_share_each_event():
+    broadcaster = Broadcaster(keepalive=5)
+
+    async def first_event(stream):
+        async for chunk in stream:
+            await stream.aclose()
+            return parse_frames(chunk)[0][2]
+
+    async def main():
+        subscribers = [asyncio.ensure_future(first_event(broadcaster.subscribe_async()))
+                       for _ in range(100)]
+        await asyncio.sleep(0.01)
+        assert broadcaster.stats()["subscribers"] == 100
+        threading.Thread(target=broadcaster.publish,
+                         args=(None, "scoreboard", {"n": 1})).start()
+        return await asyncio.gather(*subscribers)
+
+    assert asyncio.run(main()) == [{"n": 1}] * 100
+    assert broadcaster.stats()["subscribers"] == 0
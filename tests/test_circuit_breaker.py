@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from benchmarks.stub_pokeapi import StubPokeAPI
+from circuit_breaker import (CircuitBreaker, CircuitOpenError, RateLimitedError,
+                             TokenBucket, parse_retry_after)
+from pokeapi_client import PokeAPIClient
+
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.15)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()  # The one trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_call_reopens_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.1)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["opened"] == 2
+
+
+def test_token_bucket_delays_then_rejects():
+    bucket = TokenBucket(rate=10, burst=2, max_wait=0.15)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert 0 < bucket.reserve() <= 0.1
+    with pytest.raises(RateLimitedError) as error:
+        bucket.reserve()  # Would have to wait ~0.2s
+    assert error.value.retry_after > 0.15
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("30") == 30.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_client_stops_calling_failing_stub():
+    with StubPokeAPI(error_rate=1.0) as stub:
+        client = PokeAPIClient(stub.base_url, retries=0, circuit_breaker=CircuitBreaker(
+            failure_threshold=3, reset_timeout=0.2))
+        for _ in range(3):
+            with pytest.raises(Exception) as error:
+                client.fetch_pokemon_json(1)
+            assert not isinstance(error.value, CircuitOpenError)
+        with pytest.raises(CircuitOpenError):
+            client.fetch_pokemon_json(1)
+        assert stub.requests == 3
+
+        # The stub recovers: after reset_timeout one trial call closes the circuit
+        stub.error_rate = 0.0
+        time.sleep(0.25)
+        assert client.fetch_pokemon_json(1)["name"] == "stubmon-1"
+        assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_honors_retry_after_from_stub():
+    with StubPokeAPI(error_rate=1.0, error_status=429, retry_after=60) as stub:
+        client = PokeAPIClient(stub.base_url, circuit_breaker=CircuitBreaker())
+        with pytest.raises(Exception):
+            client.fetch_pokemon_json(1)
+        # 429 isn't retried in the call; the circuit stays open for a minute
+        assert stub.requests == 1
+        with pytest.raises(CircuitOpenError) as error:
+            client.fetch_pokemon_json(1)
+        assert 55 < error.value.retry_after <= 60
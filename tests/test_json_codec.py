@@ -0,0 +1,72 @@
+import datetime
+import json
+
+import pytest
+from flask import Flask, jsonify, request
+
+import json_codec
+from json_codec import FastJSONProvider, dumps, loads, loads_fields
+
+# Shaped like a PokeAPI document: keys sorted, and "name" / "types" keys
+# nested in other fields before and after the top-level ones
+DOCUMENT = {
+    "abilities": [{"ability": {"name": "static", "url": "..."}}],
+    "moves": [{"move": {"name": f"move-{i}", "url": "..."},
+               "version_group_details": [{"version_group": {"name": "red-blue"}}]}
+              for i in range(50)],
+    "name": "pikachu",
+    "past_types": [{"generation": {"name": "generation-v"},
+                    "types": [{"slot": 1, "type": {"name": "normal"}}]}],
+    "sprites": {"note": "a string with \"name\": [brackets] {and braces}"},
+    "stats": [{"stat": {"name": "hp"}}],
+    "types": [{"slot": 1, "type": {"name": "electric", "url": "..."}}],
+    "weight": 60,
+}
+EXPECTED = {"name": "pikachu", "types": DOCUMENT["types"]}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "orjson", None)
+    elif json_codec.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_dumps_and_loads_round_trip(backend):
+    data = {"b": [1, 2.5, None, True], "a": "Pokémon"}
+    encoded = dumps(data, sort_keys=True)
+    assert encoded == '{"a":"Pokémon","b":[1,2.5,null,true]}'.encode("utf-8")
+    assert loads(encoded) == data
+    assert dumps({1: "one"}) == b'{"1":"one"}'
+    assert dumps(2 ** 70) == b"1180591620717411303424"  # Too big for orjson
+    with pytest.raises(ValueError):
+        loads(b"{not json")
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_loads_fields_reads_only_top_level_keys(backend, indent):
+    raw = json.dumps(DOCUMENT, indent=indent).encode()
+    assert loads_fields(raw, ("name", "types")) == EXPECTED
+    assert loads_fields(raw, ("name", "missing")) == {"name": "pikachu"}
+
+
+def test_loads_fields_falls_back_to_a_full_parse(backend):
+    # The fields are at the start: walking back from the end costs too much
+    reordered = dict(EXPECTED, **{k: v for k, v in DOCUMENT.items() if k not in EXPECTED})
+    raw = json.dumps(reordered)
+    assert loads_fields(raw, ("name", "types")) == EXPECTED
+    assert loads_fields("[1, 2]", ("name",)) == {}
+
+
+def test_flask_provider(backend):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route("/echo", methods=["POST"])
+    def echo():
+        return jsonify([request.get_json(), {"day": datetime.date(2024, 1, 2)}])
+
+    response = app.test_client().post("/echo", json={"b": 1, "a": [2]})
+    assert response.data == b'[{"a":[2],"b":1},{"day":"Tue, 02 Jan 2024 00:00:00 GMT"}]\n'
@@ -0,0 +1,45 @@
+from battle_logic import BattleLogic
+from pokemon_data_factory import Pokemon
+from matchup_index import MatchupIndex, type_combinations
+from type_rules import TypeAdvantageRule
+
+
+class TinyRule(TypeAdvantageRule):
+    def get_advantages(self) -> dict:
+        return {"water": ["fire"], "fire": ["grass"], "grass": ["water"]}
+
+
+def test_index_matches_battle_logic():
+    battle_system = BattleLogic()
+    index = MatchupIndex.build(battle_system)
+    combos = type_combinations(len(battle_system.strength))
+    for p1_ids in combos:
+        for p2_ids in combos:
+            assert index.lookup_ids(p1_ids, p2_ids) == \
+                battle_system.score_ids(p1_ids, p2_ids)
+
+
+def test_index_handles_unknown_types():
+    battle_system = BattleLogic()
+    index = MatchupIndex.build(battle_system)
+    result = index.evaluate(battle_system, Pokemon.create("skarmory", ["steel", "flying"]),
+                            Pokemon.create("forretress", ["bug", "steel"]))
+    assert (result.p1_score, result.p2_score) == (1, 0)
+    result = index.evaluate(battle_system, Pokemon.create("magnemite", ["electric", "steel"]),
+                            Pokemon.create("skarmory", ["steel", "flying"]))
+    assert (result.p1_score, result.p2_score) == (1, 0)
+
+
+def test_saved_index_is_rebuilt_when_rules_change(tmp_path):
+    path = str(tmp_path / "matchups.bin")
+    standard = BattleLogic()
+    saved = MatchupIndex.load_or_build(standard, path)
+
+    reloaded = MatchupIndex.load_or_build(standard, path)
+    assert reloaded.scores == saved.scores
+
+    tiny = BattleLogic(rule_set=TinyRule())
+    rebuilt = MatchupIndex.load_or_build(tiny, path)
+    assert rebuilt.matches(tiny)
+    assert MatchupIndex.load(path).matches(tiny)
+    assert not MatchupIndex.load(path).matches(standard)
@@ -0,0 +1,37 @@
+from metrics import MetricsRegistry, RequestProfiler
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(prefix="test_")
+    counter = registry.counter("requests_total", "Requests.")
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    counter.inc(endpoint="/battle", status=200)
+    counter.inc(endpoint="/battle", status=200)
+    histogram.observe(0.05, stage="fetch")
+    histogram.observe(0.5, stage="fetch")
+    registry.add_collector(lambda: [("cache_size", "gauge", "Size.", {(): 3})])
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{endpoint="/battle",status="200"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="fetch",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{stage="fetch"} 2' in text
+    assert "test_cache_size 3" in text
+
+
+def test_profiler_window():
+    profiler = RequestProfiler()
+    assert profiler.begin_request() is None  # off by default
+
+    profiler.start(requests=2)
+    for _ in range(3):
+        profile = profiler.begin_request()
+        sum(range(1000))
+        profiler.end_request(profile)
+
+    report = profiler.report()
+    assert report["profiled_requests"] == 2
+    assert not report["active"]
+    assert report["functions"]
@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+import pokeapi_client
+from pokeapi_client import AsyncPokeAPIClient, PokeAPIClient, PokemonNotFound
+
+BASE_URL = "https://pokeapi.test/api/v2/pokemon/"
+MOCK_PIKACHU = {
+    "name": "pikachu",
+    "types": [{"slot": 1, "type": {"name": "electric", "url": "..."}}]
+}
+
+
+def test_fetch_success_uses_timeout(requests_mock):
+    client = PokeAPIClient(BASE_URL, timeout=2.5, connect_timeout=1.0)
+    requests_mock.get(f"{BASE_URL}25/", json=MOCK_PIKACHU)
+
+    assert client.fetch_pokemon_json(25) == MOCK_PIKACHU
+    assert requests_mock.last_request.timeout == (1.0, 2.5)
+
+
+def test_fetch_not_found_raises_pokemon_not_found(requests_mock):
+    client = PokeAPIClient(BASE_URL)
+    requests_mock.get(f"{BASE_URL}9999/", status_code=404)
+
+    with pytest.raises(PokemonNotFound, match="Pokemon with id 9999 not found."):
+        client.fetch_pokemon_json(9999)
+
+
+def test_malformed_body_is_an_upstream_error(requests_mock):
+    client = PokeAPIClient(BASE_URL)
+    for body in (b'{"name": "pika', b'\xff\xfe', b'[1, 2]', b'{"id": 25}'):
+        requests_mock.get(f"{BASE_URL}25/", content=body)
+        with pytest.raises(requests.exceptions.InvalidJSONError):
+            client.fetch_pokemon_json(25, ("name", "types"))
+
+
+def test_fetch_server_error_raises_request_exception(requests_mock):
+    client = PokeAPIClient(BASE_URL)
+    requests_mock.get(f"{BASE_URL}25/", status_code=500)
+
+    with pytest.raises(requests.exceptions.RequestException):
+        client.fetch_pokemon_json(25)
+
+
+def test_session_is_pooled_with_retries():
+    client = PokeAPIClient(BASE_URL, retries=3, pool_size=8)
+    adapter = client.session.get_adapter(BASE_URL)
+
+    assert adapter.max_retries.total == 3
+    assert 503 in adapter.max_retries.status_forcelist
+    assert adapter._pool_maxsize == 8
+
+
+def test_fetch_parses_only_the_requested_fields(requests_mock):
+    client = PokeAPIClient(BASE_URL)
+    requests_mock.get(f"{BASE_URL}25/", json=dict(MOCK_PIKACHU, id=25, moves=[]))
+
+    assert client.fetch_pokemon_json(25, ("name", "types")) == MOCK_PIKACHU
+
+
+def fetch_async(handler, pokemon_id=25, fields=None, **client_options):
+    """Runs one native AsyncPokeAPIClient call against a mock transport."""
+    client = AsyncPokeAPIClient(PokeAPIClient(BASE_URL, **client_options),
+                                transport=httpx.MockTransport(handler))
+
+    async def main():
+        try:
+            return await client.fetch_pokemon_json(pokemon_id, fields)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_async_fetch_goes_through_httpx():
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, json=dict(MOCK_PIKACHU, id=25))
+
+    assert fetch_async(handler, fields=("name", "types")) == MOCK_PIKACHU
+    assert requested == [f"{BASE_URL}25/"]
+
+
+def test_async_fetch_errors_match_the_sync_client():
+    with pytest.raises(PokemonNotFound, match="Pokemon with id 25 not found."):
+        fetch_async(lambda request: httpx.Response(404))
+    with pytest.raises(requests.exceptions.InvalidJSONError):
+        fetch_async(lambda request: httpx.Response(200, content=b'{"name": "pika'))
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_async(lambda request: httpx.Response(500), backoff_factor=0)
+
+
+def test_async_fetch_retries_with_backoff(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+    monkeypatch.setattr(pokeapi_client.asyncio, "sleep", sleep)
+    statuses = iter([502, 500, 200])
+
+    def handler(request):
+        status = next(statuses)
+        return httpx.Response(status, json=MOCK_PIKACHU if status == 200 else None)
+
+    assert fetch_async(handler, retries=2, backoff_factor=0.5) == MOCK_PIKACHU
+    assert delays == [0.5, 1.0]
+
+
+def test_async_fetch_waits_retry_after_without_a_breaker(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+    monkeypatch.setattr(pokeapi_client.asyncio, "sleep", sleep)
+    statuses = iter([429, 503, 200])
+
+    def handler(request):
+        status = next(statuses)
+        if status != 200:
+            return httpx.Response(status, headers={"Retry-After": "3"})
+        return httpx.Response(200, json=MOCK_PIKACHU)
+
+    assert fetch_async(handler, retries=2, backoff_factor=0.1) == MOCK_PIKACHU
+    assert delays == [3.0, 3.0]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import app as app_module
+from pokedex_snapshot import PokedexSnapshot, build_snapshot, open_snapshot
+from pokemon_data_factory import Pokemon
+
+DUMPS = [
+    {"id": 6, "name": "charizard", "sprites": {}, "moves": [],
+     "types": [{"slot": 1, "type": {"name": "fire", "url": "..."}},
+               {"slot": 2, "type": {"name": "flying", "url": "..."}}]},
+    {"id": 9, "name": "blastoise",
+     "types": [{"slot": 1, "type": {"name": "water", "url": "..."}}]},
+    {"id": 4, "name": "charmander",
+     "types": [{"slot": 1, "type": {"name": "fire", "url": "..."}}]},
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    dump_dir = tmp_path / "dumps"
+    dump_dir.mkdir()
+    for dump in DUMPS:
+        (dump_dir / f"{dump['id']}.json").write_text(json.dumps(dump))
+    path = str(tmp_path / "pokedex.bin")
+    assert build_snapshot(str(dump_dir), path) == 3
+    snapshot = PokedexSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def test_snapshot_lookup(snapshot):
+    assert snapshot.get(6) == Pokemon.create("charizard", ["fire", "flying"])
+    assert snapshot.get(9).to_dict() == {"name": "blastoise", "types": ["water"]}
+    assert snapshot.get(5) is None
+    assert list(snapshot.ids()) == [4, 6, 9]
+    assert snapshot.types == ["fire", "flying", "water"]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_snapshot.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        PokedexSnapshot(str(path))
+
+
+def test_open_snapshot_needs_an_existing_file(snapshot, tmp_path):
+    assert open_snapshot(None) is None
+    assert open_snapshot("") is None
+    with pytest.raises(FileNotFoundError):
+        open_snapshot(str(tmp_path / "missing.bin"))
+    opened = open_snapshot(snapshot.path)
+    assert opened.get(6).name == "charizard"
+    opened.close()
+
+
+def test_load_pokemon_data_prefers_snapshot(snapshot, monkeypatch, requests_mock):
+    monkeypatch.setattr(app_module, "POKEDEX_SNAPSHOT", snapshot)
+    requests_mock.get(f"{app_module.POKEAPI_URL}25/",
+                      json={"name": "pikachu",
+                            "types": [{"slot": 1, "type": {"name": "electric"}}]})
+
+    assert app_module.load_pokemon_data(9).name == "blastoise"
+    assert requests_mock.call_count == 0
+    # IDs missing from the snapshot fall back to the live API
+    assert app_module.load_pokemon_data(25).name == "pikachu"
+    assert requests_mock.call_count == 1
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+
+import pytest
+import requests
+from pokeapi_client import PokemonNotFound
+from pokemon_cache import PokemonCache
+from pokemon_data_factory import Pokemon
+
+SQUIRTLE = Pokemon.create("squirtle", ["water"])
+
+
+def make_loader(calls):
+    def loader(pokemon_id):
+        calls.append(pokemon_id)
+        if pokemon_id == 9999:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        return SQUIRTLE
+    return loader
+
+
+def test_get_or_load_calls_loader_once():
+    calls = []
+    cache = PokemonCache()
+    assert cache.get_or_load(7, make_loader(calls)) == SQUIRTLE
+    assert cache.get_or_load(7, make_loader(calls)) == SQUIRTLE
+    assert calls == [7]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_not_found_is_cached():
+    calls = []
+    cache = PokemonCache()
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Pokemon with id 9999 not found."):
+            cache.get_or_load(9999, make_loader(calls))
+    assert calls == [9999]
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_other_value_errors_are_not_cached():
+    calls = []
+    cache = PokemonCache()
+
+    def loader(pokemon_id):
+        calls.append(pokemon_id)
+        if len(calls) == 1:
+            raise ValueError("Unterminated string")  # Not a 404
+        return SQUIRTLE
+
+    with pytest.raises(ValueError):
+        cache.get_or_load(7, loader)
+    assert cache.get_or_load(7, loader) == SQUIRTLE
+    assert calls == [7, 7]
+    assert cache.stats()["negative_hits"] == 0
+
+
+def test_lru_eviction():
+    cache = PokemonCache(max_size=2)
+    cache.set(1, SQUIRTLE)
+    cache.set(2, SQUIRTLE)
+    cache.get(1)  # 1 becomes the most recently used
+    cache.set(3, SQUIRTLE)
+    assert cache.get(2) is None
+    assert cache.get(1) == SQUIRTLE
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiration():
+    cache = PokemonCache(ttl=-1)
+    cache.set(7, SQUIRTLE)
+    assert cache.get(7) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    path = str(tmp_path / "pokemon.sqlite")
+    PokemonCache(disk_path=path).set(7, SQUIRTLE)
+
+    calls = []
+    restarted = PokemonCache(disk_path=path)
+    assert restarted.get_or_load(7, make_loader(calls)) == SQUIRTLE
+    assert calls == []
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_stale_entry_served_when_reload_fails():
+    cache = PokemonCache(ttl=-1, stale_ttl=3600)
+    cache.set(7, SQUIRTLE)
+
+    def failing_loader(pokemon_id):
+        raise requests.exceptions.ConnectionError("PokeAPI is down")
+
+    assert cache.get_or_load(7, failing_loader) == SQUIRTLE
+    assert cache.stats()["stale_hits"] == 1
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.get_or_load(8, failing_loader)
+
+
+class ThreadRecordingDb:
+    """Wraps a SQLite connection, recording the threads that use it."""
+
+    def __init__(self, db):
+        self.db = db
+        self.threads = set()
+
+    def execute(self, *args):
+        self.threads.add(threading.get_ident())
+        return self.db.execute(*args)
+
+    def commit(self):
+        self.threads.add(threading.get_ident())
+        return self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def test_async_lookups_use_the_disk_tier_off_the_event_loop(tmp_path):
+    cache = PokemonCache(stale_ttl=3600, disk_path=str(tmp_path / "pokemon.sqlite"))
+    cache.set(9, SQUIRTLE)
+    cache.ttl = -1
+    cache.set(8, SQUIRTLE)  # Expired, but may be served stale
+    cache._entries.clear()
+    db = cache._db = ThreadRecordingDb(cache._db)
+
+    async def loader(pokemon_id):
+        if pokemon_id == 8:
+            raise requests.exceptions.ConnectionError("PokeAPI is down")
+        return SQUIRTLE
+
+    async def main():
+        assert await cache.get_or_load_async(7, loader) == SQUIRTLE  # miss, then set
+        assert await cache.get_or_load_async(8, loader) == SQUIRTLE  # stale
+        assert await cache.get_or_load_async(9, loader) == SQUIRTLE  # disk hit
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+    assert db.threads and loop_thread not in db.threads
+    assert cache.stats()["stale_hits"] == 1 and cache.stats()["disk_hits"] == 1
@@ -0,0 +1,107 @@
+import threading
+
+from circuit_breaker import CircuitOpenError, RateLimitedError
+from prefetcher import AccessLog, Prefetcher, parse_id_list
+
+import app as app_module
+from app import app
+
+
+def test_parse_id_list():
+    assert parse_id_list("1-3, 25,") == [1, 2, 3, 25]
+    assert parse_id_list(None) == []
+
+
+def test_access_log_persists_top_ids(tmp_path):
+    path = str(tmp_path / "access.json")
+    log = AccessLog(path)
+    for pokemon_id in (25, 6, 25, 9, 25, 6):
+        log.record(pokemon_id)
+    log.flush()
+    log.record(9)
+    log.record(9)
+    log.flush()
+
+    restarted = AccessLog(path)
+    assert restarted.top(2) == [25, 9]
+    assert restarted.counts()[6] == 2
+
+
+def test_prefetcher_loads_with_bounded_concurrency():
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, peak
+    loaded = []
+    rate_limited = [True]
+
+    def lookup(pokemon_id):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        try:
+            if pokemon_id == 3 and rate_limited[0]:
+                rate_limited[0] = False
+                raise RateLimitedError("slow down", 0.01)
+            if pokemon_id == 4:
+                raise ValueError("Pokemon with id 4 not found.")
+            loaded.append(pokemon_id)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    prefetcher = Prefetcher(lookup, list(range(1, 21)) + [1], concurrency=3).start()
+    assert prefetcher.done.wait(5)
+    status = prefetcher.status()
+    assert status["ready"] is True
+    assert status["total"] == 20
+    assert status["loaded"] == 19 and status["not_found"] == 1
+    assert 3 in loaded  # Retried after the rate limit
+    assert in_flight[1] <= 3
+
+
+def test_prefetcher_gives_up_when_circuit_opens():
+    def lookup(pokemon_id):
+        raise CircuitOpenError("open", 30)
+
+    prefetcher = Prefetcher(lookup, range(1, 50), concurrency=1).start()
+    assert prefetcher.done.wait(5)
+    assert prefetcher.status()["skipped"] == 49
+
+
+def test_stop_skips_the_rest_and_waits_for_lookups_in_flight():
+    started, release = threading.Event(), threading.Event()
+    loaded = []
+
+    def lookup(pokemon_id):
+        started.set()
+        release.wait(5)
+        loaded.append(pokemon_id)
+
+    prefetcher = Prefetcher(lookup, range(1, 50), concurrency=1).start()
+    assert started.wait(5)
+    assert prefetcher.stop(timeout=0.1) is False  # The first lookup is still running
+    assert prefetcher.ready
+    release.set()
+    assert prefetcher.stop(timeout=5) is True
+    assert loaded == [1]
+    assert prefetcher.status()["skipped"] == 48
+
+
+def test_ready_endpoint():
+    # No warm-up configured in the tests, so the app is ready right away
+    response = app.test_client().get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
+
+
+def test_ready_endpoint_answers_503_during_warm_up(monkeypatch):
+    release = threading.Event()
+    warmup = Prefetcher(lambda pokemon_id: release.wait(5), [1, 2], timeout=10).start()
+    monkeypatch.setattr(app_module, "WARMUP", warmup)
+    try:
+        response = app.test_client().get('/ready')
+        assert response.status_code == 503
+        assert response.get_json()["ready"] is False
+    finally:
+        release.set()
+    assert warmup.done.wait(5)
+    assert app.test_client().get('/ready').status_code == 200
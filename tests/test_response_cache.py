@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+
+from response_cache import ChangeNotifier, ResponseCache, etag_matches
+
+
+def test_body_is_serialized_once_per_version():
+    loads = []
+    cache = ResponseCache(lambda payload: json.dumps(payload).encode())
+    state = {"score": 0, "version": 0}
+
+    def load():
+        loads.append(state["version"])
+        return dict(score=state["score"]), state["version"]
+
+    first = cache.get("game", 0, load)
+    assert cache.get("game", 0, load) is first
+    assert first.etag == '"game-0"'
+    assert json.loads(first.body) == {"score": 0}
+
+    state.update(score=1, version=1)
+    second = cache.get("game", 1, load)
+    assert second.etag == '"game-1"'
+    assert json.loads(second.body) == {"score": 1}
+    assert loads == [0, 1]
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+def test_least_recently_used_resources_are_dropped():
+    cache = ResponseCache(lambda payload: b"{}", max_entries=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get(key, 0, lambda: ({}, 0))
+    assert cache.stats()["size"] == 2
+    cache.get("a", 0, lambda: ({}, 0))
+    assert cache.stats()["hits"] == 2  # "a" was kept, "b" was dropped
+
+
+def test_etag_matching():
+    assert etag_matches('"game-1"', '"game-1"')
+    assert etag_matches('"game-0", W/"game-1"', '"game-1"')
+    assert etag_matches('*', '"game-1"')
+    assert not etag_matches('"game-0"', '"game-1"')
+    assert not etag_matches(None, '"game-1"')
+
+
+def test_waiters_wake_up_on_notify():
+    notifier = ChangeNotifier()
+    sequence = notifier.sequence
+    assert notifier.wait(sequence, 0.01) is False
+
+    threading.Timer(0.05, notifier.notify).start()
+    assert notifier.wait(sequence, 5) is True
+    # A change made before waiting isn't missed
+    assert notifier.wait(sequence, 0) is True
+
+
+def test_async_waiters_wake_up_on_notify():
+    notifier = ChangeNotifier()
+
+    async def main():
+        sequence = notifier.sequence
+        assert await notifier.wait_async(sequence, 0.01) is False
+        waiters = [asyncio.ensure_future(notifier.wait_async(sequence, 5))
+                   for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # Writers run on other threads
+        threading.Thread(target=notifier.notify).start()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == [True, True, True]
@@ -0,0 +1,74 @@
+import json
+import os
+
+from rule_registry import RuleRegistry
+from type_rules import StandardTypeRule, EventTypeRule
+
+
+def write_rules(path, data, mtime):
+    path.write_text(json.dumps(data))
+    os.utime(path, (mtime, mtime))
+
+
+def test_event_rule_leaves_standard_rules_untouched():
+    EventTypeRule().get_advantages()
+    assert "normal" not in StandardTypeRule().get_advantages()
+
+
+def test_registry_loads_and_reloads_rule_files(tmp_path):
+    registry = RuleRegistry()
+    registry.register("standard", StandardTypeRule())
+    rule_file = tmp_path / "halloween.json"
+    write_rules(rule_file, {"extends": "standard",
+                            "advantages": {"ghost": ["psychic", "normal"]}}, 1000)
+
+    registry.load_directory(str(tmp_path))
+    halloween = registry.get("halloween")
+    assert halloween.battle_system.is_strong_against("ghost", "normal")
+    assert halloween.battle_system.is_strong_against("fire", "grass")
+    assert registry.get() is registry.get("standard")
+
+    # Unchanged files are not recompiled
+    assert registry.reload() == []
+    assert registry.get("halloween") is halloween
+
+    write_rules(rule_file, {"ghost": ["normal"]}, 2000)
+    assert registry.reload() == ["halloween"]
+    assert not registry.get("halloween").battle_system.is_strong_against("fire", "grass")
+    # The previously compiled engine is not modified by the swap
+    assert halloween.battle_system.is_strong_against("fire", "grass")
+
+    rule_file.unlink()
+    assert registry.reload() == ["halloween"]
+    assert registry.get("halloween") is None
+
+
+def test_broken_rule_file_keeps_previous_version(tmp_path):
+    registry = RuleRegistry()
+    rule_file = tmp_path / "event.json"
+    write_rules(rule_file, {"normal": ["ghost"]}, 1000)
+    registry.load_directory(str(tmp_path))
+
+    rule_file.write_text("{ not json")
+    os.utime(rule_file, (2000, 2000))
+    assert registry.reload() == []
+    assert registry.get("event").battle_system.is_strong_against("normal", "ghost")
+
+
+def test_file_extending_a_changed_file_is_recompiled(tmp_path):
+    registry = RuleRegistry()
+    # "a_event" sorts before its base, so the base must still compile first
+    write_rules(tmp_path / "z_base.json", {"fire": ["grass"]}, 1000)
+    registry.load_directory(str(tmp_path))
+    write_rules(tmp_path / "a_event.json", {"extends": "z_base",
+                                            "advantages": {"ghost": ["normal"]}}, 1000)
+    assert registry.reload() == ["a_event"]
+    assert registry.get("a_event").battle_system.is_strong_against("fire", "grass")
+
+    write_rules(tmp_path / "z_base.json", {"water": ["fire"]}, 2000)
+    assert registry.reload() == ["z_base", "a_event"]
+    event = registry.get("a_event").battle_system
+    assert event.is_strong_against("water", "fire")
+    assert not event.is_strong_against("fire", "grass")
+    assert event.is_strong_against("ghost", "normal")
+    assert registry.reload() == []
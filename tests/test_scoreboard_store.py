@@ -0,0 +1,96 @@
+import sqlite3
+import threading
+
+import pytest
+
+from scoreboard_store import InMemoryScoreboardStore, SQLiteScoreboardStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryScoreboardStore()
+    return SQLiteScoreboardStore(str(tmp_path / "scoreboard.sqlite"))
+
+
+def test_games_are_independent(store):
+    game1 = store.create_game("Ash", "Gary")
+    game2 = store.create_game("Misty", "Brock")
+
+    store.record_win(game1, 1)
+    store.record_win(game2, 2)
+    store.record_win(game2, 2)
+
+    assert store.get(game1)["player1_score"] == 1
+    assert store.get(game2) == {"player1_name": "Misty", "player2_name": "Brock",
+                                "player1_score": 0, "player2_score": 2}
+    assert store.latest_game_id() == game2
+    assert store.get("missing") is None
+    assert store.add_scores("missing", 1, 0) is None
+
+
+def test_concurrent_increments_are_not_lost(store):
+    game_id = store.create_game("Ash", "Gary")
+
+    def play():
+        for _ in range(200):
+            store.record_win(game_id, 1)
+            store.add_scores(game_id, 0, 2)
+
+    threads = [threading.Thread(target=play) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    scoreboard = store.get(game_id)
+    assert scoreboard["player1_score"] == 1600
+    assert scoreboard["player2_score"] == 3200
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "scoreboard.sqlite")
+    game_id = SQLiteScoreboardStore(path).create_game("Ash", "Gary")
+
+    other_process_view = SQLiteScoreboardStore(path)
+    other_process_view.record_win(game_id, 2)
+
+    assert SQLiteScoreboardStore(path).get(game_id)["player2_score"] == 1
+
+
+def test_in_memory_store_drops_oldest_games():
+    store = InMemoryScoreboardStore(max_games=2)
+    first = store.create_game("Ash", "Gary")
+    store.create_game("Misty", "Brock")
+    store.create_game("Jessie", "James")
+    assert store.get(first) is None
+
+
+def test_version_changes_with_the_scores(store):
+    game_id = store.create_game("Ash", "Gary")
+    assert store.version(game_id) == 0
+
+    store.record_win(game_id, 1)
+    store.add_scores(game_id, 0, 0)  # Nothing changed
+    scoreboard, version = store.get_versioned(game_id)
+    assert scoreboard["player1_score"] == 1
+    assert version == store.version(game_id) == 1
+    assert store.version("missing") is None
+    assert store.get_versioned("missing") == (None, None)
+
+
+def test_sqlite_store_adds_version_to_old_databases(tmp_path):
+    path = str(tmp_path / "scoreboard.sqlite")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE games (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+               "id TEXT UNIQUE NOT NULL, player1_name TEXT, player2_name TEXT, "
+               "player1_score INTEGER NOT NULL DEFAULT 0, "
+               "player2_score INTEGER NOT NULL DEFAULT 0)")
+    db.execute("INSERT INTO games (id, player1_name, player2_name) VALUES ('old', 'Ash', 'Gary')")
+    db.commit()
+    db.close()
+
+    store = SQLiteScoreboardStore(path)
+    store.record_win("old", 2)
+    assert store.get_versioned("old") == ({"player1_name": "Ash", "player2_name": "Gary",
+                                           "player1_score": 0, "player2_score": 1}, 1)
@@ -0,0 +1,139 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from server import (PooledWSGIServer, is_long_lived, open_listener, parse_bind,
+                    shared_state_env)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_parse_bind_and_state_paths(tmp_path):
+    assert parse_bind("127.0.0.1:8000") == ("127.0.0.1", 8000)
+    assert parse_bind(":8000") == ("0.0.0.0", 8000)
+    assert parse_bind("[::1]:8000") == ("::1", 8000)
+    env = shared_state_env(str(tmp_path))
+    assert all(path.startswith(str(tmp_path)) for path in env.values())
+
+
+def test_pooled_server_drains_requests_in_flight():
+    started, release = threading.Event(), threading.Event()
+
+    def app(environ, start_response):
+        if environ["PATH_INFO"] == "/slow":
+            started.set()
+            release.wait(5)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"ok"]
+
+    listener = open_listener("127.0.0.1", 0)
+    server = PooledWSGIServer(app, listener, threads=2)
+    serving = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+    serving.start()
+    base_url = "http://127.0.0.1:%d" % listener.getsockname()[1]
+    assert requests.get(base_url + "/fast", timeout=5).text == "ok"
+
+    responses = []
+    slow = threading.Thread(target=lambda: responses.append(
+        requests.get(base_url + "/slow", timeout=5)))
+    slow.start()
+    assert started.wait(5)
+    server.shutdown()
+    serving.join(5)
+    assert not serving.is_alive()
+    assert not server.wait_idle(0.05)  # /slow is still being served
+    release.set()
+    assert server.wait_idle(5)
+    slow.join(5)
+    assert responses[0].text == "ok"
+    listener.close()
+
+
+def test_streams_do_not_take_the_request_threads():
+    release = threading.Event()
+
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        if environ["PATH_INFO"] == "/scoreboard/stream":
+            def stream():
+                yield b"open\n"
+                release.wait(10)
+            return stream()
+        return [b"ok"]
+
+    assert is_long_lived("/scoreboard/stream?game_id=1")
+    assert is_long_lived("/scoreboard?game_id=1&wait=30")
+    assert not is_long_lived("/scoreboard?game_id=1")
+    listener = open_listener("127.0.0.1", 0)
+    server = PooledWSGIServer(app, listener, threads=2, stream_threads=4)
+    serving = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+    serving.start()
+    base_url = "http://127.0.0.1:%d" % listener.getsockname()[1]
+    streams = []
+    try:
+        # More spectators than request threads
+        for _ in range(4):
+            stream = requests.get(base_url + "/scoreboard/stream", stream=True, timeout=5)
+            assert next(stream.iter_lines()) == b"open"
+            streams.append(stream)
+        assert requests.post(base_url + "/battle", timeout=2).text == "ok"
+        # Past stream_threads, new streams are turned away instead of queued
+        assert requests.get(base_url + "/scoreboard/stream", timeout=2).status_code == 503
+        assert requests.post(base_url + "/battle", timeout=2).text == "ok"
+    finally:
+        release.set()
+        for stream in streams:
+            stream.close()
+        server.shutdown()
+        serving.join(5)
+        assert server.wait_idle(5)
+        listener.close()
+
+
+def test_workers_share_scoreboards_and_stop_on_sigterm(tmp_path):
+    port = free_port()
+    env = {key: value for key, value in os.environ.items()
+           if key not in shared_state_env("") and key not in ("WARMUP_IDS", "RULESETS_DIR")}
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--bind", f"127.0.0.1:{port}", "--workers", "2",
+         "--threads", "2", "--state-dir", str(tmp_path / "state")],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                if requests.get(base_url + "/ready", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            assert time.monotonic() < deadline, "server didn't start"
+            time.sleep(0.1)
+
+        game_id = requests.post(base_url + "/start", json={
+            "player1_name": "Ash", "player2_name": "Gary"}).json()["game_id"]
+        # New connections go to either worker; all of them see the game
+        for _ in range(10):
+            scoreboard = requests.get(f"{base_url}/scoreboard?game_id={game_id}").json()
+            assert scoreboard["player1_name"] == "Ash"
+
+        # And the simulation jobs
+        response = requests.post(base_url + "/simulations", json={"roster": [1, 4], "trials": 10})
+        assert response.status_code == 202
+        for _ in range(10):
+            assert requests.get(base_url + response.headers["Location"]).status_code == 200
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=20) == 0
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import pytest
+from pokeapi_client import PokemonNotFound
+from pokemon_cache import PokemonCache
+from pokemon_data_factory import Pokemon
+from single_flight import SingleFlight
+
+SQUIRTLE = Pokemon.create("squirtle", ["water"])
+
+
+def run_concurrently(count, target):
+    """Starts count threads on target together; returns their results or errors."""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+    single_flight = SingleFlight()
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return SQUIRTLE
+
+    results = run_concurrently(8, lambda: single_flight.do(7, slow))
+    assert results == [SQUIRTLE] * 8
+    assert len(calls) == 1
+    assert single_flight.stats() == {"leaders": 1, "shared": 7}
+
+
+def test_error_is_raised_in_every_waiter():
+    single_flight = SingleFlight()
+
+    def failing():
+        time.sleep(0.2)
+        raise ValueError("Pokemon with id 9999 not found.")
+
+    results = run_concurrently(4, lambda: single_flight.do(9999, failing))
+    assert all(isinstance(r, ValueError) for r in results)
+    # The next call starts a new execution
+    assert single_flight.do(9999, lambda: SQUIRTLE) == SQUIRTLE
+
+
+def test_forked_child_forgets_calls_in_flight():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return SQUIRTLE
+
+    leader = threading.Thread(target=single_flight.do, args=(7, slow))
+    leader.start()
+    assert started.wait(5)
+    pid = os.fork()
+    if pid == 0:
+        # The leader thread doesn't exist here: a follower would wait forever
+        signal.alarm(5)
+        single_flight.after_fork()
+        os._exit(0 if single_flight.do(7, lambda: "child") == "child" else 1)
+    release.set()
+    leader.join()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_async_calls_share_one_execution():
+    calls = []
+    single_flight = SingleFlight()
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return SQUIRTLE
+
+    async def main():
+        return await asyncio.gather(*(single_flight.do_async(7, slow) for _ in range(5)))
+
+    assert asyncio.run(main()) == [SQUIRTLE] * 5
+    assert len(calls) == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return SQUIRTLE
+
+    async def main():
+        first = asyncio.ensure_future(single_flight.do_async(7, slow))
+        await asyncio.sleep(0)  # The first caller starts the call
+        others = [asyncio.ensure_future(single_flight.do_async(7, slow)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()  # Its client disconnected
+        results = await asyncio.gather(*others)
+        assert first.cancelled()
+        return results
+
+    assert asyncio.run(main()) == [SQUIRTLE] * 3
+    assert calls == [1]
+
+
+def test_cache_coalesces_concurrent_misses(tmp_path):
+    calls = []
+    cache = PokemonCache(single_flight=SingleFlight(lock_dir=str(tmp_path / "locks")))
+
+    def loader(pokemon_id):
+        calls.append(pokemon_id)
+        time.sleep(0.2)
+        if pokemon_id == 9999:
+            raise PokemonNotFound(f"Pokemon with id {pokemon_id} not found.")
+        return SQUIRTLE
+
+    assert run_concurrently(6, lambda: cache.get_or_load(7, loader)) == [SQUIRTLE] * 6
+    results = run_concurrently(3, lambda: cache.get_or_load(9999, loader))
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == [7, 9999]
+    with pytest.raises(ValueError):
+        cache.get_or_load(9999, loader)
@@ -0,0 +1,216 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from battle_logic import BattleLogic
+from matchup_index import MatchupIndex
+from pokemon_data_factory import Pokemon
+import tournament
+from tournament import (MAX_TRIAL_ENTRANTS, SimulationJobs, SimulationQueueFull,
+                        SQLiteSimulationJobs, TournamentSimulator, wilson_interval)
+
+import app as app_module
+from app import app, POKEAPI_URL, POKEMON_CACHE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+battle_system = BattleLogic()
+matchup_index = MatchupIndex.build(battle_system)
+# Water beats everyone else, rock beats both fire types
+ROSTER = [Pokemon.create("charmander", ["fire"]), Pokemon.create("squirtle", ["water"]),
+          Pokemon.create("vulpix", ["fire"]), Pokemon.create("geodude", ["rock", "ground"])]
+ROSTER_IDS = [4, 7, 37, 74]
+
+
+@pytest.mark.parametrize("tournament_format", ["round_robin", "single_elimination", "swiss"])
+def test_every_format_crowns_one_champion_per_trial(tournament_format):
+    simulator = TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS,
+                                    tournament_format)
+    report = simulator.run(500, processes=1, seed=42)
+    assert sum(entrant["titles"] for entrant in report["entrants"]) == 500
+    squirtle = report["entrants"][0]
+    assert squirtle["name"] == "squirtle"
+    assert squirtle["title_rate"] == 1.0
+    assert squirtle["match_win_rate"] == 1.0
+    vulpix = next(e for e in report["entrants"] if e["name"] == "vulpix")
+    low, high = vulpix["match_win_rate_ci95"]
+    assert low <= vulpix["match_win_rate"] <= high < 0.5
+
+
+def test_process_pool_runs_every_trial():
+    simulator = TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS, "swiss")
+    progress = []
+    report = simulator.run(400, processes=2, seed=7,
+                           progress=lambda done, total: progress.append(done))
+    assert progress[-1] == 400
+    assert report["seed"] == 7
+    assert sum(e["titles"] for e in report["entrants"]) == 400
+    assert report["entrants"][0]["name"] == "squirtle"
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError, match="Unknown tournament format"):
+        TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS, "ladder")
+    with pytest.raises(ValueError, match="between 2 and"):
+        TournamentSimulator(battle_system, matchup_index, ROSTER[:1], ROSTER_IDS[:1])
+    with pytest.raises(ValueError, match="times the roster size"):
+        TournamentSimulator.check(ROSTER * 64, "round_robin", MAX_TRIAL_ENTRANTS // 256 + 1)
+
+
+def test_pool_workers_do_not_import_the_main_script(tmp_path):
+    # Like `python app.py`: a script with start-up work runs a simulation
+    imports = tmp_path / "imports"
+    script = tmp_path / "main.py"
+    script.write_text(f"""
+import sys
+sys.path.insert(0, {ROOT!r})
+with open({str(imports)!r}, "a") as f:
+    f.write("x")
+
+if __name__ == '__main__':
+    from tests.test_tournament import ROSTER, ROSTER_IDS, battle_system, matchup_index
+    from tournament import TournamentSimulator
+    simulator = TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS)
+    print(simulator.run(100, processes=2, seed=1)["trials"])
+""")
+    output = subprocess.run([sys.executable, str(script)], cwd=str(tmp_path),
+                            capture_output=True, text=True, timeout=60)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == "100"
+    assert imports.read_text() == "x"
+
+
+def test_pool_failure_is_raised(tmp_path, monkeypatch):
+    failing = tmp_path / "failing_pool.py"
+    failing.write_text("import sys\nsys.exit(3)\n")
+    monkeypatch.setattr(tournament, "POOL_SCRIPT", str(failing))
+    simulator = TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS)
+    with pytest.raises(RuntimeError, match="status 3"):
+        simulator.run(100, processes=2)
+
+
+def test_simulation_jobs_queue_is_bounded():
+    jobs = SimulationJobs(processes=1, max_pending=1)
+    release = threading.Event()
+
+    def build_simulator():
+        release.wait(5)
+        return TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS)
+
+    first = jobs.submit(build_simulator, 10)
+    with pytest.raises(SimulationQueueFull):
+        jobs.submit(build_simulator, 10)
+    release.set()
+    for _ in range(100):
+        if jobs.get(first["id"])["status"] == "done":
+            break
+        time.sleep(0.05)
+    assert jobs.get(first["id"])["status"] == "done"
+    assert jobs.submit(build_simulator, 10)["status"] == "queued"
+
+
+def wait_for_status(jobs, job_id, status):
+    for _ in range(100):
+        if jobs.get(job_id)["status"] == status:
+            break
+        time.sleep(0.05)
+    return jobs.get(job_id)
+
+
+def test_shared_jobs_take_turns_across_workers(tmp_path):
+    # Two workers sharing the state directory
+    path = str(tmp_path / "simulations.sqlite")
+    worker1 = SQLiteSimulationJobs(path, processes=1, max_pending=2)
+    worker2 = SQLiteSimulationJobs(path, processes=1, max_pending=2)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_simulator():
+        started.set()
+        release.wait(5)
+        return TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS)
+
+    first = worker1.submit(slow_simulator, 10)
+    assert started.wait(5)
+    second = worker2.submit(
+        lambda: TournamentSimulator(battle_system, matchup_index, ROSTER, ROSTER_IDS), 10)
+    with pytest.raises(SimulationQueueFull):
+        worker1.submit(slow_simulator, 10)
+    # Only one simulation runs at a time, whichever worker took it
+    assert worker1.get(second["id"])["status"] == "queued"
+    assert worker2.get(first["id"])["status"] == "running"
+    release.set()
+    job = wait_for_status(worker1, second["id"], "done")
+    assert job["result"]["entrants"][0]["name"] == "squirtle"
+    assert wait_for_status(worker2, first["id"], "done")["progress"] == 1.0
+    assert worker1.get("unknown") is None
+
+
+def test_shared_jobs_of_a_dead_worker_fail(tmp_path):
+    jobs = SQLiteSimulationJobs(str(tmp_path / "simulations.sqlite"), processes=1,
+                                max_pending=1)
+    release = threading.Event()
+    job = jobs.submit(lambda: release.wait(5), 10)
+    assert wait_for_status(jobs, job["id"], "running")["status"] == "running"
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    jobs._connection().execute("UPDATE jobs SET pid = ? WHERE id = ?", (exited.pid, job["id"]))
+
+    job = jobs.get(job["id"])
+    assert job["status"] == "failed"
+    assert "exited" in job["error"]
+    # It no longer takes a place in the queue
+    release.set()
+    assert jobs.submit(lambda: None, 10)["status"] == "queued"
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-3)
+    assert high == pytest.approx(0.5962, abs=1e-3)
+    assert wilson_interval(0, 0) == [0.0, 0.0]
+
+
+def test_simulation_job_endpoint(requests_mock):
+    POKEMON_CACHE.clear()
+    client = app.test_client()
+    requests_mock.get(f"{POKEAPI_URL}6/", json={
+        "name": "charizard", "types": [{"slot": 1, "type": {"name": "fire"}},
+                                       {"slot": 2, "type": {"name": "flying"}}]})
+    requests_mock.get(f"{POKEAPI_URL}9/", json={
+        "name": "blastoise", "types": [{"slot": 1, "type": {"name": "water"}}]})
+    response = client.post('/simulations', data=json.dumps(
+        {"roster": [6, 9, 6], "format": "single_elimination", "trials": 200, "seed": 1}),
+        content_type='application/json')
+    assert response.status_code == 202
+    job_id = response.get_json()["id"]
+    assert response.headers["Location"] == f"/simulations/{job_id}"
+
+    for _ in range(100):
+        job = client.get(f'/simulations/{job_id}').get_json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert job["result"]["entrants"][0]["name"] == "blastoise"
+
+    assert client.get('/simulations/unknown').status_code == 404
+    response = client.post('/simulations', data=json.dumps({"roster": [6], "trials": 10}),
+                           content_type='application/json')
+    assert response.status_code == 400
+    response = client.post('/simulations', data=json.dumps(
+        {"roster": [6] * 256, "trials": MAX_TRIAL_ENTRANTS // 256 + 1}),
+        content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_simulation_endpoint_answers_429_when_the_queue_is_full(monkeypatch):
+    monkeypatch.setattr(app_module, "SIMULATION_JOBS", SimulationJobs(max_pending=0))
+    response = app.test_client().post('/simulations', data=json.dumps(
+        {"roster": [6, 9], "trials": 10}), content_type='application/json')
+    assert response.status_code == 429
+    assert response.get_json()["error"] == "Too many simulations."
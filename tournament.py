@@ -0,0 +1,554 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import pickle
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: shared jobs are off
+    fcntl = None
+
+FORMATS = ("round_robin", "single_elimination", "swiss")
+MAX_ENTRANTS = 256
+MAX_TRIALS = 1000000
+# Bounds the work of one simulation: trials x roster size
+MAX_TRIAL_ENTRANTS = 10000000
+# z for a 95% confidence interval
+Z_95 = 1.959964
+
+
+class MatchTable:
+    """
+    Precomputed scores of every ordered pair of roster entrants, flattened
+    into bytes: (p1_score, p2_score) at (i * size + j) * 2 when entrant i
+    is Pokémon 1. Small and picklable, so it is sent to each worker once.
+    """
+
+    def __init__(self, size: int, scores: bytes):
+        self.size = size
+        self.scores = scores
+
+    @classmethod
+    def build(cls, battle_system, matchup_index, roster):
+        """roster: Pokemon records, in entrant order."""
+        size = len(roster)
+        type_ids = [battle_system.record_type_ids(pokemon) for pokemon in roster]
+        scores = bytearray(size * size * 2)
+        for i, p1_ids in enumerate(type_ids):
+            for j, p2_ids in enumerate(type_ids):
+                pair = matchup_index.lookup_ids(p1_ids, p2_ids)
+                if pair is None:
+                    pair = battle_system.score_ids(p1_ids, p2_ids)
+                position = (i * size + j) * 2
+                scores[position:position + 2] = bytes(pair)
+        return cls(size, bytes(scores))
+
+    def play(self, a, b, rng) -> int:
+        """
+        Plays entrant a against entrant b and returns the winner. Sides are
+        drawn at random (Pokémon 1 wins mutual advantages) and a tie is
+        decided by a coin flip.
+        """
+        if rng.random() < 0.5:
+            a, b = b, a
+        position = (a * self.size + b) * 2
+        p1_score = self.scores[position]
+        p2_score = self.scores[position + 1]
+        if p1_score > p2_score:
+            return a
+        if p2_score > p1_score:
+            return b
+        return a if rng.random() < 0.5 else b
+
+
+def _leader(wins, rng) -> int:
+    """Entrant with the most wins, ties broken at random."""
+    best = max(wins)
+    return rng.choice([i for i, w in enumerate(wins) if w == best])
+
+
+def round_robin(table: MatchTable, rng, wins, matches) -> int:
+    """Everyone plays everyone once; the most wins takes the title."""
+    tournament_wins = [0] * table.size
+    for a in range(table.size):
+        for b in range(a + 1, table.size):
+            winner = table.play(a, b, rng)
+            tournament_wins[winner] += 1
+            matches[a] += 1
+            matches[b] += 1
+    for i, count in enumerate(tournament_wins):
+        wins[i] += count
+    return _leader(tournament_wins, rng)
+
+
+def single_elimination(table: MatchTable, rng, wins, matches) -> int:
+    """Random seeding; byes go through when the field isn't a power of two."""
+    alive = list(range(table.size))
+    rng.shuffle(alive)
+    while len(alive) > 1:
+        next_round = []
+        if len(alive) % 2:
+            next_round.append(alive.pop())  # bye
+        for a, b in zip(alive[::2], alive[1::2]):
+            winner = table.play(a, b, rng)
+            wins[winner] += 1
+            matches[a] += 1
+            matches[b] += 1
+            next_round.append(winner)
+        alive = next_round
+        rng.shuffle(alive)
+    return alive[0]
+
+
+def swiss(table: MatchTable, rng, wins, matches) -> int:
+    """
+    ceil(log2(n)) rounds; each round pairs entrants with similar records,
+    avoiding rematches when possible. A bye counts as a win.
+    """
+    size = table.size
+    tournament_wins = [0] * size
+    played = set()
+    for _ in range(max(1, math.ceil(math.log2(size)))):
+        order = list(range(size))
+        rng.shuffle(order)
+        order.sort(key=lambda i: -tournament_wins[i])
+        if len(order) % 2:
+            # The lowest ranked entrant sits out
+            tournament_wins[order.pop()] += 1
+        while order:
+            a = order.pop(0)
+            partner = next((k for k, b in enumerate(order)
+                            if (min(a, b), max(a, b)) not in played), 0)
+            b = order.pop(partner)
+            played.add((min(a, b), max(a, b)))
+            winner = table.play(a, b, rng)
+            tournament_wins[winner] += 1
+            matches[a] += 1
+            matches[b] += 1
+    for i, count in enumerate(tournament_wins):
+        wins[i] += count
+    return _leader(tournament_wins, rng)
+
+
+TOURNAMENTS = {
+    "round_robin": round_robin,
+    "single_elimination": single_elimination,
+    "swiss": swiss,
+}
+
+
+def run_trials(table: MatchTable, tournament_format: str, trials: int, seed: int):
+    """
+    Plays `trials` randomized tournaments. Returns the per-entrant lists
+    (titles, match wins, matches played).
+    """
+    rng = random.Random(seed)
+    tournament = TOURNAMENTS[tournament_format]
+    titles = [0] * table.size
+    wins = [0] * table.size
+    matches = [0] * table.size
+    for _ in range(trials):
+        titles[tournament(table, rng, wins, matches)] += 1
+    return titles, wins, matches
+
+
+# Set in each pool worker by _init_worker, so the table is sent only once
+_WORKER_TABLE = None
+
+
+def _init_worker(table):
+    global _WORKER_TABLE
+    _WORKER_TABLE = table
+
+
+def _run_chunk(args):
+    tournament_format, trials, seed = args
+    return trials, run_trials(_WORKER_TABLE, tournament_format, trials, seed)
+
+
+# Runs the process pool (see _run_in_pool)
+POOL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tournament_pool.py")
+
+
+def _run_in_pool(table: MatchTable, chunks, processes: int):
+    """
+    Yields (trials, counts) for each chunk, run on a pool of `processes`
+    workers. The pool is started by the tournament_pool.py script, not by
+    this process: multiprocessing workers re-import the script their parent
+    was started from, and under `python app.py` each of them would replay
+    the app's start-up (warm-up, log replay, SQLite opens).
+    """
+    with subprocess.Popen([sys.executable, POOL_SCRIPT],
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE) as process:
+        try:
+            pickle.dump((table, chunks, processes), process.stdin)
+            process.stdin.close()
+            while True:
+                try:
+                    result = pickle.load(process.stdout)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                yield result
+        except BaseException:
+            process.kill()
+            raise
+    if process.returncode != 0:
+        raise RuntimeError(f"The simulation pool exited with status {process.returncode}.")
+
+
+class SimulationQueueFull(Exception):
+    """SimulationJobs already has max_pending jobs queued or running."""
+
+
+def wilson_interval(successes: int, total: int, z: float = Z_95):
+    """Wilson score interval of a binomial proportion."""
+    if total == 0:
+        return [0.0, 0.0]
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return [max(0.0, center - margin), min(1.0, center + margin)]
+
+
+class TournamentSimulator:
+    """
+    Monte Carlo estimate of each entrant's chance to win a tournament.
+    The roster's matchups are scored once into a MatchTable; trials are
+    split into chunks and run on a process pool, each with its own seed.
+    """
+
+    def __init__(self, battle_system, matchup_index, roster, pokemon_ids,
+                 tournament_format: str = "round_robin"):
+        """
+        roster: Pokemon records, one per entrant (the same species may
+        enter twice); pokemon_ids: their IDs, for the report.
+        """
+        self.check(roster, tournament_format)
+        self.roster = roster
+        self.pokemon_ids = pokemon_ids
+        self.tournament_format = tournament_format
+        self.table = MatchTable.build(battle_system, matchup_index, roster)
+
+    @staticmethod
+    def check(roster, tournament_format, trials: int = 1):
+        """
+        Raises ValueError for an unknown format, a roster of the wrong size
+        or more than MAX_TRIAL_ENTRANTS trials x entrants.
+        """
+        if tournament_format not in TOURNAMENTS:
+            raise ValueError(f"Unknown tournament format '{tournament_format}'. "
+                             f"Use one of: {', '.join(FORMATS)}.")
+        if not 2 <= len(roster) <= MAX_ENTRANTS:
+            raise ValueError(f"A roster needs between 2 and {MAX_ENTRANTS} Pokémon.")
+        if trials * len(roster) > MAX_TRIAL_ENTRANTS:
+            raise ValueError(f"'trials' times the roster size should be at most "
+                             f"{MAX_TRIAL_ENTRANTS}.")
+
+    def run(self, trials: int, processes: int = None, seed: int = None,
+            progress=None) -> dict:
+        """
+        processes: pool size (default: CPU count); 1 runs in this process.
+        progress: optional callable(completed_trials, total_trials).
+        """
+        if not 1 <= trials <= MAX_TRIALS:
+            raise ValueError(f"'trials' should be between 1 and {MAX_TRIALS}.")
+        self.check(self.roster, self.tournament_format, trials)
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        processes = processes or os.cpu_count() or 1
+        chunk_size = max(1, min(1000, trials // (processes * 8) or 1))
+        chunks = [(self.tournament_format, min(chunk_size, trials - start), seed + i)
+                  for i, start in enumerate(range(0, trials, chunk_size))]
+
+        size = self.table.size
+        totals = [[0] * size, [0] * size, [0] * size]
+        completed = 0
+        started = time.perf_counter()
+
+        def merge(done, counts):
+            nonlocal completed
+            for total, values in zip(totals, counts):
+                for i, value in enumerate(values):
+                    total[i] += value
+            completed += done
+            if progress is not None:
+                progress(completed, trials)
+
+        if processes == 1:
+            for tournament_format, count, chunk_seed in chunks:
+                merge(count, run_trials(self.table, tournament_format, count, chunk_seed))
+        else:
+            for count, counts in _run_in_pool(self.table, chunks, processes):
+                merge(count, counts)
+
+        return self._report(trials, seed, totals, time.perf_counter() - started)
+
+    def _report(self, trials, seed, totals, elapsed) -> dict:
+        titles, wins, matches = totals
+        entrants = []
+        for i, pokemon in enumerate(self.roster):
+            entrants.append({
+                "pokemon_id": self.pokemon_ids[i],
+                "name": pokemon.name,
+                "titles": titles[i],
+                "title_rate": titles[i] / trials,
+                "title_rate_ci95": wilson_interval(titles[i], trials),
+                "match_wins": wins[i],
+                "matches": matches[i],
+                "match_win_rate": wins[i] / matches[i] if matches[i] else 0.0,
+                "match_win_rate_ci95": wilson_interval(wins[i], matches[i]),
+            })
+        entrants.sort(key=lambda entrant: entrant["title_rate"], reverse=True)
+        return {
+            "format": self.tournament_format,
+            "trials": trials,
+            "seed": seed,
+            "elapsed_seconds": elapsed,
+            "entrants": entrants,
+        }
+
+
+class SimulationJobs:
+    """
+    Runs simulations in the background for the HTTP API and keeps their
+    progress and results. Jobs run one at a time (each already uses every
+    core), at most max_pending of them queued or running; the oldest
+    finished ones are forgotten past max_jobs.
+    """
+
+    def __init__(self, max_jobs: int = 100, processes: int = None,
+                 max_pending: int = 8):
+        self.max_jobs = max_jobs
+        self.processes = processes
+        self.max_pending = max_pending
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix="simulation")
+
+    def submit(self, build_simulator, trials: int, seed: int = None) -> dict:
+        """
+        Queues a job; build_simulator() is called on the job thread (it may
+        look Pokémon up) and returns a TournamentSimulator.
+        Returns the job's initial state; raises SimulationQueueFull when
+        max_pending jobs are already waiting for their turn or running.
+        """
+        job = {"id": uuid.uuid4().hex, "status": "queued", "completed_trials": 0,
+               "total_trials": trials, "progress": 0.0,
+               "submitted_at": time.time(), "result": None, "error": None}
+        self._add(job)
+        self._executor.submit(self._run, job["id"], build_simulator, trials, seed)
+        return dict(job)
+
+    def get(self, job_id):
+        """Returns a copy of the job's state, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def close(self):
+        """Releases the backend's resources (see ScoreboardStore.close)."""
+
+    def _add(self, job):
+        with self._lock:
+            pending = sum(1 for other in self._jobs.values()
+                          if other["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise SimulationQueueFull(
+                    f"{pending} simulations are already queued or running.")
+            self._jobs[job["id"]] = job
+            finished = [job_id for job_id, other in self._jobs.items()
+                        if other["status"] in ("done", "failed")]
+            for job_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[job_id]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _turn(self):
+        """Held while a job runs; the single job thread already takes turns."""
+        return contextlib.nullcontext()
+
+    def _run(self, job_id, build_simulator, trials, seed):
+        def progress(completed, total):
+            self._update(job_id, completed_trials=completed, progress=completed / total)
+
+        with self._turn():
+            self._update(job_id, status="running")
+            try:
+                result = build_simulator().run(trials, self.processes, seed, progress)
+            except Exception as e:
+                self._update(job_id, status="failed", error=str(e))
+                return
+            self._update(job_id, status="done", result=result)
+
+
+class SQLiteSimulationJobs(SimulationJobs):
+    """
+    SimulationJobs shared by the worker processes of one machine: the jobs
+    are kept in a SQLite table, so any worker reports on any job, and a lock
+    file (fcntl) lets a single simulation run at a time across all of them.
+    A job runs in the worker that took it; if that worker dies, the job is
+    reported as failed.
+    """
+
+    COLUMNS = ("id", "status", "completed_trials", "total_trials", "progress",
+               "submitted_at", "result", "error")
+
+    def __init__(self, path: str, max_jobs: int = 100, processes: int = None,
+                 max_pending: int = 8, timeout: float = 5.0):
+        if fcntl is None:
+            raise ValueError("Shared simulation jobs need fcntl (POSIX only).")
+        super().__init__(max_jobs, processes, max_pending)
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self._local = threading.local()
+        db = self._connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "id TEXT UNIQUE NOT NULL, status TEXT NOT NULL, "
+            "completed_trials INTEGER NOT NULL, total_trials INTEGER NOT NULL, "
+            "progress REAL NOT NULL, submitted_at REAL NOT NULL, "
+            "result TEXT, error TEXT, pid INTEGER NOT NULL)")
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            # Autocommit mode, as in SQLiteScoreboardStore
+            db = sqlite3.connect(self.path, timeout=self.timeout,
+                                 isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, job_id):
+        db = self._connection()
+        self._fail_orphans(db)
+        row = db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?",
+                         (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        self._local = threading.local()
+        if db is not None:
+            db.close()
+
+    def _add(self, job):
+        db = self._connection()
+        self._fail_orphans(db)
+        # The count and the insert are one transaction, so workers submitting
+        # at the same time can't go past max_pending together
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            pending = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+            if pending >= self.max_pending:
+                raise SimulationQueueFull(
+                    f"{pending} simulations are already queued or running.")
+            db.execute(f"INSERT INTO jobs ({', '.join(self.COLUMNS)}, pid) "
+                       f"VALUES ({', '.join('?' * (len(self.COLUMNS) + 1))})",
+                       tuple(job[column] for column in self.COLUMNS) + (os.getpid(),))
+            db.execute(
+                "DELETE FROM jobs WHERE seq IN (SELECT seq FROM jobs "
+                "WHERE status IN ('done', 'failed') ORDER BY seq LIMIT "
+                "max(0, (SELECT COUNT(*) FROM jobs) - ?))", (self.max_jobs,))
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _update(self, job_id, **fields):
+        if fields.get("result") is not None:
+            fields["result"] = json.dumps(fields["result"])
+        self._connection().execute(
+            f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+            tuple(fields.values()) + (job_id,))
+
+    @contextlib.contextmanager
+    def _turn(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _fail_orphans(db):
+        """Marks the unfinished jobs of workers that no longer exist as failed."""
+        rows = db.execute("SELECT DISTINCT pid FROM jobs "
+                          "WHERE status IN ('queued', 'running')").fetchall()
+        for (pid,) in rows:
+            if not _process_exists(pid):
+                db.execute("UPDATE jobs SET status = 'failed', error = ? "
+                           "WHERE pid = ? AND status IN ('queued', 'running')",
+                           ("The worker running the simulation exited.", pid))
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def create_simulation_jobs(path: str = None, **options) -> SimulationJobs:
+    """Returns the shared SQLite backend when a path is given, else the in-memory one."""
+    if path:
+        return SQLiteSimulationJobs(path, **options)
+    return SimulationJobs(**options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Estimate tournament win rates for a roster of Pokémon IDs.")
+    parser.add_argument("roster", type=int, nargs="+", help="Pokémon IDs")
+    parser.add_argument("--format", choices=FORMATS, default="round_robin")
+    parser.add_argument("--trials", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--ruleset", default=None, help="rule set name (default: standard)")
+    args = parser.parse_args(argv)
+
+    # Uses the app's lookup (snapshot, cache, PokeAPI) and rule sets
+    import app as app_module
+    rule_set = app_module.RULE_REGISTRY.get(args.ruleset)
+    if rule_set is None:
+        parser.error(f"unknown rule set '{args.ruleset}'")
+    roster = [app_module.get_pokemon_data(pokemon_id) for pokemon_id in args.roster]
+    simulator = TournamentSimulator(rule_set.battle_system, rule_set.matchup_index,
+                                    roster, args.roster, args.format)
+    report = simulator.run(args.trials, args.processes, args.seed)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+# Process pool of a tournament simulation, started by TournamentSimulator.run
+# as its own script: its workers import this file and tournament.py, never
+# the app that asked for the simulation.
+#
+# Reads (table, chunks, processes) pickled on stdin and writes one pickled
+# (trials, counts) per chunk on stdout, as the chunks finish.
+import multiprocessing
+import os
+import pickle
+import sys
+
+from tournament import _init_worker, _run_chunk
+
+
+def main():
+    table, chunks, processes = pickle.load(sys.stdin.buffer)
+    # Stray prints go to stderr, so they can't corrupt the results
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(table,)) as pool:
+        for result in pool.imap_unordered(_run_chunk, chunks):
+            pickle.dump(result, results)
+            results.flush()
+    results.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,12 @@
+import json
+import os
+
+try:
+    import yaml
+except ImportError:  # Optional: only needed for YAML rule files
+    yaml = None
+
+
 # The interface is implicit in Python, but the documentation makes it clear
 class TypeAdvantageRule:
     """
@@ -44,9 +53,66 @@ class EventTypeRule(TypeAdvantageRule):
     """
 
     def get_advantages(self) -> dict:
-        # Takes the default rules and adds the temporary rule
-        rules = StandardTypeRule().get_advantages()
+        # Takes a copy of the default rules and adds the temporary rule
+        # (the copy keeps the shared standard table untouched)
+        rules = {attacking: list(defending) for attacking, defending
+                 in StandardTypeRule().get_advantages().items()}
 
         # OCP: Extension. Adds the new rule without changing the Standard class.
         rules['normal'] = ['ghost']
         return rules
+
+
+# Concrete Implementation 3: Rules loaded from a file (Extension)
+
+
+class FileTypeRule(TypeAdvantageRule):
+    """
+    Reads the advantages from a JSON or YAML file, so new rule sets (e.g.
+    for an event) don't need a code change. The file is either a plain
+    {"attacking": ["defending", ...]} mapping, or
+    {"extends": "<rule set name>", "advantages": {...}} to add to (or
+    override entries of) another rule set.
+    """
+
+    def __init__(self, path: str, known_rules: dict = None):
+        """
+        known_rules: rule set name -> advantages dict, used to resolve "extends".
+        """
+        self.path = path
+        self.known_rules = known_rules or {}
+        self.extends = None  # name of the base rule set, once read
+
+    def read_file(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            if os.path.splitext(self.path)[1] in (".yaml", ".yml"):
+                if yaml is None:
+                    raise ValueError(
+                        f"{self.path}: install PyYAML to load YAML rule sets.")
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path}: a rule set must be a mapping.")
+        return data
+
+    def get_advantages(self) -> dict:
+        data = self.read_file()
+        if "advantages" not in data:
+            advantages, rules = data, {}
+        else:
+            advantages = data["advantages"]
+            base = data.get("extends")
+            if base is not None and base not in self.known_rules:
+                raise ValueError(f"{self.path}: unknown rule set '{base}' in 'extends'.")
+            self.extends = base
+            rules = {attacking: list(defending) for attacking, defending
+                     in self.known_rules.get(base, {}).items()}
+
+        for attacking, defending in advantages.items():
+            if not isinstance(defending, list) or \
+                    not all(isinstance(t, str) for t in defending):
+                raise ValueError(
+                    f"{self.path}: '{attacking}' must map to a list of type names.")
+            rules[attacking] = list(defending)
+        return rules